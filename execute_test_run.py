@@ -2,7 +2,6 @@ import asyncio
 import os
 import sys
 import re
-import httpx
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -19,8 +18,19 @@ load_dotenv(current_dir / ".env")
 
 from src.article_orchestrator import ArticleOrchestrator
 from src.wechat_publisher import WeChatPublisher
-from src.db_manager import DBManager
+from src.db_manager import DBManager, LeaseLostError, default_lease_owner
 from src.dependency_checker import check_and_install_dependencies
+from src.llm_client import close_llm_client
+from src.model_router import get_model_router, track_served_models
+from src.sectioned_writer import write_by_outline
+from src.chunked_layout import layout_in_chunks
+from src.structured_writer import write_structured
+from src.local_digest import extract_digest, polish_prompt
+from src.resilience import get_retry_metrics
+from src.adaptive_limiter import adaptive_report
+from src.article_stream import ArticleStreamWatcher
+from src.pipeline import Pipeline, Stage
+from src.config import Config
 
 def load_skill_file(filename):
     path = current_dir / "prompts" / filename
@@ -56,21 +66,54 @@ def load_settings():
                         conf[k] = v
     return conf
 
-async def call_llm(base_url, api_key, model, system_prompt, user_prompt, max_tokens=4000):
+async def call_llm(base_url, api_key, model, system_prompt, user_prompt, max_tokens=4000, stage=None):
+    """调用 LLM；model 可为带超时的备用模型列表，指定 stage (writer/digest/layout) 时使用响应缓存"""
     print(f"   [LLM] 调用模型: {model}")
-    async with httpx.AsyncClient(timeout=600.0) as client:
-        resp = await client.post(
-            f"{base_url}/chat/completions",
-            headers={"Authorization": f"Bearer {api_key}"},
-            json={
-                "model": model, "messages": [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
-                "temperature": 0.7, "max_tokens": max_tokens
-            }
+    return await get_model_router().chat(
+        base_url, api_key, model, system_prompt, user_prompt, max_tokens=max_tokens, stage=stage
+    )
+
+async def call_llm_stream(base_url, api_key, model, system_prompt, user_prompt, max_tokens=4000, watcher=None, stage=None):
+    """流式调用 LLM，token 增量实时推送给 watcher（未开启 LLM_STREAM 时退化为普通调用）"""
+    print(f"   [LLM] 流式调用模型: {model}")
+    watcher = watcher or ArticleStreamWatcher()
+    if not Config.LLM_STREAM:
+        text = await get_model_router().chat(
+            base_url, api_key, model, system_prompt, user_prompt, max_tokens=max_tokens, stage=stage
         )
-        resp.raise_for_status()
-        return resp.json()["choices"][0]["message"]["content"]
+        await watcher.feed(text)
+        await watcher.close()
+        return text
+
+    return await get_model_router().stream(
+        base_url, api_key, model, system_prompt, user_prompt, watcher, max_tokens=max_tokens, stage=stage
+    )
 
-async def main():
+def create_article_watcher():
+    """写作阶段的流式监听器：小节、配图占位符写完即输出进度"""
+    watcher = ArticleStreamWatcher(first_paragraphs=3)
+    watcher.on_paragraphs(lambda paragraphs: print(f"   [流式] 前 {len(paragraphs)} 段已生成"))
+    watcher.on_placeholder(lambda index: print(f"   [流式] 检测到配图占位符 {index}"))
+    watcher.on_section(lambda title, body: print(f"   [流式] 小节完成: {title} ({len(body)} 字)"))
+    return watcher
+
+async def run(resume_plan_id=None, batch=None, concurrency=None):
+    """执行写作流程，结束后释放 LLM 连接池并输出重试统计"""
+    try:
+        await main(resume_plan_id, batch, concurrency)
+    finally:
+        await close_llm_client()
+        if get_retry_metrics().has_retries():
+            print("\n[重试] 各接口统计：")
+            print(get_retry_metrics().report())
+        if adaptive_report():
+            print("\n[并发] 自适应并发：")
+            print(adaptive_report())
+        if get_model_router().hedge_report():
+            print("\n[对冲] 统计：")
+            print(get_model_router().hedge_report())
+
+async def main(resume_plan_id=None, batch=None, concurrency=None):
     # 0. 自检与环境准备
     check_and_install_dependencies()
 
@@ -122,22 +165,157 @@ async def main():
         db.close()
         return
 
-    # 自动获取待写计划
-    pending = db.get_pending_plans()
-    if not pending:
-        print("数据库中没有待写的选题计划。请先添加选题计划。")
-        db.close()
+    # 工作进程租约标识，多个进程/主机可同时运行而不会领取同一计划
+    owner = default_lease_owner()
+
+    if batch is not None:
+        try:
+            await run_batch(db, config, strategy_content, owner, limit=batch, concurrency=concurrency)
+        finally:
+            db.close()
         return
-    
-    topic_id, topic, target_date = pending[0]
+
+    # 选择要写的计划：指定续写 > 租约过期的 writing 计划 > 待写计划
+    if resume_plan_id is not None:
+        plan = await asyncio.to_thread(db.get_plan, resume_plan_id)
+        if not plan:
+            print(f"计划 {resume_plan_id} 不存在。")
+            db.close()
+            return
+        if plan[3] == 'published':
+            print(f"计划 {resume_plan_id} 已发布，无需续写。")
+            db.close()
+            return
+        claimed = await asyncio.to_thread(db.claim_plan, resume_plan_id, owner, Config.PLAN_LEASE_MINUTES)
+        if not claimed:
+            print(f"计划 {resume_plan_id} 正由其他工作进程写作（租约未过期）。")
+            db.close()
+            return
+        print(f"[RESUME] 续写计划 {resume_plan_id}: {claimed[1]}")
+    else:
+        claimed = await asyncio.to_thread(db.claim_next_plan, owner, Config.PLAN_LEASE_MINUTES)
+        if not claimed:
+            print("数据库中没有待写的选题计划。请先添加选题计划。")
+            db.close()
+            return
+
+    topic_id, topic, target_date = claimed
+    try:
+        await write_plan(db, config, strategy_content, topic_id, topic, owner)
+    finally:
+        db.close()
+
+async def write_plan(db, config, strategy_content, topic_id, topic, owner, orchestrator=None, publisher=None):
+    """按阶段图写作已领取的计划，阶段产出实时写入检查点并续租，返回草稿 ID"""
     print(f"[STRATEGY ALIGNMENT] 正在根据策略创作选题: {topic}")
-    
-    db.mark_as_writing(topic_id)
-    
-    # 1. 深度写作 (Claude Opus 4.5) - 注入策略语料
-    writer_system_template = load_skill_file("writer_agent.md")
-    # 核心修复：将策略和主题放入system prompt中，确保模型严格遵守
-    writer_system = f"""{writer_system_template}
+
+    # 从检查点恢复已完成阶段的产出
+    # 数据库读写是同步 sqlite3 调用，放到线程池执行，不阻塞其他计划的事件循环
+    checkpoint = await asyncio.to_thread(db.get_checkpoint, topic_id)
+    if checkpoint:
+        print(f"[RESUME] 已恢复检查点: {', '.join(checkpoint)}")
+        # 正文来自非结构化写作时没有 article_meta，不因此重写正文
+        if "markdown" in checkpoint:
+            checkpoint.setdefault("article_meta", {})
+
+    served = track_served_models()
+
+    def save_checkpoint_sync(outputs):
+        db.save_checkpoint(topic_id, **outputs)
+        db.save_served_models(topic_id, served)
+        return db.renew_lease(topic_id, owner, Config.PLAN_LEASE_MINUTES)
+
+    async def save_checkpoint(stage_name, outputs):
+        # 租约被接管后立即中止流水线，避免两个工作进程为同一计划各建一份草稿
+        if not await asyncio.to_thread(save_checkpoint_sync, outputs):
+            raise LeaseLostError(f"计划 {topic_id} 的租约已被其他工作进程接管，停止写作")
+
+    pipeline = build_pipeline(config, strategy_content, orchestrator, publisher, asset_tag=f"_{topic_id}")
+    try:
+        result = await pipeline.run({"topic": topic, **checkpoint}, on_stage_done=save_checkpoint)
+    except LeaseLostError:
+        raise
+    except Exception:
+        print(f"[RESUME] 已保存检查点，可运行 python execute_test_run.py --resume {topic_id} 继续")
+        raise
+    finally:
+        print(f"[耗时] 计划 {topic_id} 各阶段时间线:")
+        print(pipeline.report())
+
+    draft_id = result["draft_id"]
+    if not await asyncio.to_thread(db.mark_as_published, topic_id, draft_id, owner):
+        raise LeaseLostError(f"计划 {topic_id} 的租约已被其他工作进程接管，草稿 {draft_id} 未标记为已发布")
+    models = await asyncio.to_thread(db.get_served_models, topic_id)
+    if models:
+        print(f"[模型] 计划 {topic_id}: " + "，".join(f"{stage}={model}" for stage, model in models.items()))
+    print(f"策略对齐创作完成！预览 ID: {draft_id}")
+    return draft_id
+
+async def run_batch(db, config, strategy_content, owner, limit=None, concurrency=None):
+    """批量写作：以有限并发逐个领取并处理计划
+
+    每个 worker 循环原子领取下一个计划，直到没有可领取的计划或达到 limit；
+    可与其他进程/主机上的 worker 同时运行。
+    所有计划共享 LLM 连接池和同一组图片/发布客户端（共用 access_token），
+    单个计划失败不影响其他计划（失败计划保留检查点，租约过期后可续写）。
+    """
+    concurrency = max(1, concurrency or Config.BATCH_CONCURRENCY)
+    print(f"[BATCH] 工作进程 {owner}，并发数 {concurrency}" + (f"，最多 {limit} 个计划" if limit else ""))
+
+    orchestrator = ArticleOrchestrator()
+    publisher = WeChatPublisher()
+    results = []
+    # 已预留的领取名额：在 await 领取之前同步占位，并发 worker 合计不超过 limit
+    claimed = 0
+
+    async def worker():
+        nonlocal claimed
+        while not limit or claimed < limit:
+            claimed += 1
+            plan = await asyncio.to_thread(db.claim_next_plan, owner, Config.PLAN_LEASE_MINUTES)
+            if not plan:
+                claimed -= 1
+                return
+            topic_id, topic, target_date = plan
+            entry = [topic_id, topic, False, "进行中"]
+            results.append(entry)
+            try:
+                entry[3] = await write_plan(db, config, strategy_content, topic_id, topic, owner, orchestrator, publisher)
+                entry[2] = True
+            except Exception as e:
+                print(f"   [BATCH] 计划 {topic_id} 失败: {e}")
+                entry[3] = str(e)
+
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+
+    if not results:
+        print("数据库中没有待写的选题计划。请先添加选题计划。")
+        return []
+
+    succeeded = sum(1 for r in results if r[2])
+    print("\n" + "=" * 50)
+    print(f"[BATCH] 完成 {succeeded}/{len(results)}")
+    print("=" * 50)
+    for topic_id, topic, ok, detail in results:
+        status = "OK  " if ok else "FAIL"
+        print(f"   [{status}] {topic_id:<4} {topic} -> {detail}")
+    return results
+
+def build_pipeline(config, strategy_content, orchestrator=None, publisher=None, asset_tag=""):
+    """构建单篇文章的阶段图
+
+    配图只依赖主题，与写作同时开始；摘要只依赖正文，与排版并行；
+    草稿等待排版、摘要、封面全部就绪后创建。
+    批量模式下传入共享的 orchestrator / publisher，asset_tag 区分各计划的图片和调试文件。
+    """
+
+    structured = Config.WRITER_MODE == "structured"
+
+    async def write_stage(topic):
+        # 1. 深度写作 (Claude Opus 4.5) - 注入策略语料
+        writer_system_template = load_skill_file("writer_agent.md")
+        # 核心修复：将策略和主题放入system prompt中，确保模型严格遵守
+        writer_system = f"""{writer_system_template}
 
 【最高优先级 - 账号定位必须严格遵守】
 {strategy_content}
@@ -147,84 +325,144 @@ async def main():
 你必须100%围绕主题「{topic}」写作，禁止偏离。字数1500字以上。
 """
 
-    writer_user = f"""主题：{topic}
+        writer_user = f"""主题：{topic}
 
 请直接输出正文，不要有任何开场白。"""
 
-    full_markdown = await call_llm(config['WRITER_API_BASE_URL'], config['WRITER_API_KEY'], config['WRITER_MODEL'], writer_system, writer_user, max_tokens=8000)
-
-    # 保存原始markdown内容用于调试
-    with open(current_dir / "debug_article.md", "w", encoding="utf-8") as f:
-        f.write(f"# 主题: {topic}\n\n")
-        f.write(f"# 账号定位:\n{strategy_content}\n\n")
-        f.write(f"# 正文:\n{full_markdown}")
-
-    # 1.5 生成摘要 (50-100字) - 使用全文和专业摘要人设
-    print("   [LLM] 生成文章摘要 (使用 Layout Model)...")
-    summary_system = load_skill_file("summary_agent.md")
-    
-    if not full_markdown or len(full_markdown) < 100:
-        print("   [WARN] 文章内容过短，使用默认摘要")
-        digest = f"深度解析：{topic}"
-    else:
-        # 彻底隔离：只提取 # 正文: 之后的内容发送给摘要模型
-        pure_content = full_markdown
-        if "# 正文:" in full_markdown:
-            # 使用更鲁棒的正则切分
-            parts = re.split(r'#\s*正文:', full_markdown, flags=re.IGNORECASE)
-            if len(parts) > 1:
-                pure_content = parts[1].strip()
+        full_markdown = None
+        article_meta = {}
+        if structured:
+            # 一次调用返回正文、摘要和配图提示词
+            try:
+                full_markdown, article_meta = await write_structured(
+                    config['WRITER_API_BASE_URL'], config['WRITER_API_KEY'], config['WRITER_MODEL'], writer_system, topic
+                )
+                if article_meta.get("title"):
+                    print(f"   [写作] 建议标题: {article_meta['title']}")
+            except Exception as e:
+                print(f"   [WARN] 结构化写作失败，改为整篇写作: {e}")
+        if full_markdown is None and Config.WRITER_MODE == "sections":
+            # 先生成大纲，再并行写各小节
+            try:
+                full_markdown = await write_by_outline(
+                    config['WRITER_API_BASE_URL'], config['WRITER_API_KEY'], config['WRITER_MODEL'], writer_system, topic,
+                    on_section=lambda title, body: print(f"   [写作] 小节完成: {title or '开头'} ({len(body)} 字)")
+                )
+            except Exception as e:
+                print(f"   [WARN] 分节写作失败，改为整篇写作: {e}")
+        if full_markdown is None:
+            full_markdown = await call_llm_stream(config['WRITER_API_BASE_URL'], config['WRITER_API_KEY'], config['WRITER_MODEL'], writer_system, writer_user, max_tokens=8000, watcher=create_article_watcher(), stage="writer")
+
+        # 保存原始markdown内容用于调试
+        with open(current_dir / f"debug_article{asset_tag}.md", "w", encoding="utf-8") as f:
+            f.write(f"# 主题: {topic}\n\n")
+            f.write(f"# 账号定位:\n{strategy_content}\n\n")
+            f.write(f"# 正文:\n{full_markdown}")
+        if structured:
+            return full_markdown, article_meta
+        return full_markdown
+
+    async def digest_stage(topic, markdown, article_meta=None):
+        # 1.5 生成摘要 (50-100字) - 结构化写作已给出摘要时直接使用，否则用全文和专业摘要人设生成
+        if article_meta and article_meta.get("digest"):
+            digest = article_meta["digest"]
+            print("   [LLM] 使用写作阶段生成的摘要")
+            with open(current_dir / f"debug_digest{asset_tag}.txt", "w", encoding="utf-8") as f:
+                f.write(f"主题: {topic}\n")
+                f.write(f"摘要: {digest}")
+            return digest
+        summary_system = load_skill_file("summary_agent.md")
+        full_markdown = markdown
         
-        # 明确 Prompt 结构，只给正文，不给策略背景
-        digest_prompt = f"请根据以下文章正文，生成 50-100 字的微信推送摘要。\n\n【文章标题】：{topic}\n【文章内容】：\n{pure_content}"
-        
-        try:
-            # 切换到 LAYOUT_MODEL (Gemini) 进行摘要，它对内容识别更友好
-            digest = await call_llm(
-                config['CHERRY_API_BASE_URL'], 
-                config['CHERRY_API_KEY'], 
-                config['LAYOUT_MODEL'], 
-                summary_system, 
-                digest_prompt, 
-                max_tokens=500
-            )
+        if not full_markdown or len(full_markdown) < 100:
+            print("   [WARN] 文章内容过短，使用默认摘要")
+            digest = f"深度解析：{topic}"
+        elif Config.DIGEST_MODE == "local":
+            # 本地 TextRank 抽取，不调用模型
+            print("   [摘要] 本地抽取文章摘要...")
+            digest = extract_digest(full_markdown, title=topic)
+        else:
+            print("   [LLM] 生成文章摘要 (使用 Layout Model)...")
+            # 彻底隔离：只提取 # 正文: 之后的内容发送给摘要模型
+            pure_content = full_markdown
+            if "# 正文:" in full_markdown:
+                # 使用更鲁棒的正则切分
+                parts = re.split(r'#\s*正文:', full_markdown, flags=re.IGNORECASE)
+                if len(parts) > 1:
+                    pure_content = parts[1].strip()
             
-            # 精细清理
-            digest = re.sub(r'[#*`>]|\[IMAGE_PLACEHOLDER_\d+\]', '', digest)
-            digest = re.sub(r'\s+', ' ', digest).strip()
+            # 明确 Prompt 结构，只给正文，不给策略背景；polish 模式只给抽取出的关键句
+            if Config.DIGEST_MODE == "polish":
+                digest_prompt = polish_prompt(pure_content, topic)
+            else:
+                digest_prompt = f"请根据以下文章正文，生成 50-100 字的微信推送摘要。\n\n【文章标题】：{topic}\n【文章内容】：\n{pure_content}"
             
-            if len(digest) > 120:
-                digest = digest[:117] + "..."
-        except Exception as e:
-            print(f"   [ERROR] 摘要生成失败: {e}")
-            digest = f"深度解析：{topic}"
+            try:
+                # 切换到 LAYOUT_MODEL (Gemini) 进行摘要，它对内容识别更友好
+                digest = await call_llm(
+                    config['CHERRY_API_BASE_URL'], 
+                    config['CHERRY_API_KEY'], 
+                    config['LAYOUT_MODEL'], 
+                    summary_system, 
+                    digest_prompt, 
+                    max_tokens=500,
+                    stage="digest"
+                )
+                
+                # 精细清理
+                digest = re.sub(r'[#*`>]|\[IMAGE_PLACEHOLDER_\d+\]', '', digest)
+                digest = re.sub(r'\s+', ' ', digest).strip()
+                
+                if len(digest) > 120:
+                    digest = digest[:117] + "..."
+            except Exception as e:
+                print(f"   [ERROR] 摘要生成失败，改用本地抽取: {e}")
+                digest = extract_digest(pure_content, title=topic)
+
+        # 保存摘要调试内容
+        with open(current_dir / f"debug_digest{asset_tag}.txt", "w", encoding="utf-8") as f:
+            f.write(f"主题: {topic}\n")
+            f.write(f"摘要: {digest}")
+        return digest
+
+    async def images_stage(topic, article_meta=None):
+        # 2. 生成图片 - 电影写实风格
+        image_orchestrator = orchestrator or ArticleOrchestrator()
+        # 封面：电影感、宽画幅、写实风格
+        cover_prompt = f"Cinematic wide shot, {topic}, photorealistic, dramatic lighting, 2.35:1 aspect ratio, moody atmosphere, high contrast, professional photography, no text, --ar 2.35:1"
+        # 插图：写实风格、叙事感、配合文章内容
+        illustration_prompts = [
+            f"Cinematic scene, business transformation struggle, photorealistic, dramatic light, 4:3 ratio, no text, --ar 4:3",
+            f"Cinematic scene, organizational challenges, photorealistic, moody atmosphere, 4:3 ratio, no text, --ar 4:3",
+            f"Cinematic scene, future opportunity, photorealistic, hopeful lighting, 4:3 ratio, no text, --ar 4:3"
+        ]
+        # 结构化写作时使用与正文对应的提示词
+        if article_meta:
+            cover_prompt = article_meta.get("cover_prompt", cover_prompt)
+            illustration_prompts = article_meta.get("image_prompts", illustration_prompts)
+        return await image_orchestrator.generate_and_upload_all_images(
+            cover_prompt=cover_prompt,
+            illustration_prompts=illustration_prompts,
+            asset_tag=asset_tag
+        )
 
-    # 保存摘要调试内容
-    with open(current_dir / "debug_digest.txt", "w", encoding="utf-8") as f:
-        f.write(f"主题: {topic}\n")
-        f.write(f"摘要: {digest}")
+    async def layout_stage(topic, markdown, cdn_urls):
+        content_with_images = markdown
+        for i, url in enumerate(cdn_urls): content_with_images = content_with_images.replace(f"[IMAGE_PLACEHOLDER_{i}]", url)
 
-    # 2. 生成图片 - 电影写实风格
-    orchestrator = ArticleOrchestrator()
-    # 封面：电影感、宽画幅、写实风格
-    cover_prompt = f"Cinematic wide shot, {topic}, photorealistic, dramatic lighting, 2.35:1 aspect ratio, moody atmosphere, high contrast, professional photography, no text, --ar 2.35:1"
-    # 插图：写实风格、叙事感、配合文章内容
-    illustration_prompts = [
-        f"Cinematic scene, business transformation struggle, photorealistic, dramatic light, 4:3 ratio, no text, --ar 4:3",
-        f"Cinematic scene, organizational challenges, photorealistic, moody atmosphere, 4:3 ratio, no text, --ar 4:3",
-        f"Cinematic scene, future opportunity, photorealistic, hopeful lighting, 4:3 ratio, no text, --ar 4:3"
-    ]
-    thumb_media_id, cdn_urls = await orchestrator.generate_and_upload_all_images(
-        cover_prompt=cover_prompt,
-        illustration_prompts=illustration_prompts
-    )
+        # 3. 排版 - 默认按 pattern_editor.md 本地渲染，LAYOUT_MODE=llm 时交给排版模型
+        if Config.LAYOUT_MODE != "llm":
+            from src.html_renderer import render_markdown
+            final_html = render_markdown(content_with_images, style="default", title=topic)
+            with open(current_dir / f"debug_article{asset_tag}.html", "w", encoding="utf-8") as f:
+                f.write(final_html)
+            return final_html
 
-    # 3. 排版 (必须设置 max_tokens=8000)
-    layout_system = load_skill_file("pattern_editor.md")
-    content_with_images = full_markdown
-    for i, url in enumerate(cdn_urls): content_with_images = content_with_images.replace(f"[IMAGE_PLACEHOLDER_{i}]", url)
+        # 排版模型 (每块输出上限见 LAYOUT_CHUNK_MAX_TOKENS)
+        layout_system = load_skill_file("pattern_editor.md")
 
-    layout_user = f"""请将以下Markdown文章转换为微信公众号HTML格式。
+        def build_layout_user(chunk):
+            return f"""请将以下Markdown文章转换为微信公众号HTML格式。
 
 【关键要求】
 1. 金句（> 引用格式）：必须添加装饰框，左边框4px #007AFF，背景#f8f9fa，圆角8px，左对齐
@@ -234,34 +472,68 @@ async def main():
 5. 直接输出HTML代码块，不要任何解释
 
 文章内容：
-{content_with_images}"""
-    final_html = await call_llm(config['CHERRY_API_BASE_URL'], config['CHERRY_API_KEY'], config['LAYOUT_MODEL'], layout_system, layout_user, max_tokens=8000)
-    if "```html" in final_html: final_html = final_html.split("```html")[1].split("```")[0].strip()
-
-    # 4. 清理 HTML - 保留金句装饰框，去除空白装饰框
-    # 去除开头的 h1/h2 标题
-    final_html = re.sub(r'<h1[^>]*>.*?</h1>', '', final_html, flags=re.DOTALL | re.IGNORECASE)
-    final_html = re.sub(r'<h2[^>]*>.*?</h2>', '', final_html, flags=re.DOTALL | re.IGNORECASE)
-    # 去除 blockquote 前后多余的空格
-    final_html = re.sub(r'>\s+', '>', final_html)
-    final_html = re.sub(r'\s+<', '<', final_html)
-    # 去除多余空行
-    final_html = re.sub(r'\n\s*\n', '\n', final_html)
-    # 去除首尾空格
-    final_html = final_html.strip()
-    # 只去除完全空白或只有空格的 blockquote（保留有内容的金句）
-    final_html = re.sub(r'<blockquote[^>]*>\s*</blockquote>', '', final_html, flags=re.IGNORECASE)
-
-    # 保存HTML调试内容
-    with open(current_dir / "debug_article.html", "w", encoding="utf-8") as f:
-        f.write(final_html)
-
-    publisher = WeChatPublisher()
-    draft_id = await publisher.create_draft(title=topic, content=final_html, digest=digest, thumb_media_id=thumb_media_id)
-    
-    db.mark_as_published(topic_id, draft_id)
-    print(f"策略对齐创作完成！预览 ID: {draft_id}")
-    db.close()
+{chunk}"""
+        # 按二级标题分块并行排版，每块单独重试
+        final_html = await layout_in_chunks(config['CHERRY_API_BASE_URL'], config['CHERRY_API_KEY'], config['LAYOUT_MODEL'], layout_system, content_with_images, build_user=build_layout_user)
+
+        # 4. 清理 HTML - 保留金句装饰框，去除空白装饰框
+        # 去除开头的 h1/h2 标题
+        final_html = re.sub(r'<h1[^>]*>.*?</h1>', '', final_html, flags=re.DOTALL | re.IGNORECASE)
+        final_html = re.sub(r'<h2[^>]*>.*?</h2>', '', final_html, flags=re.DOTALL | re.IGNORECASE)
+        # 去除 blockquote 前后多余的空格
+        final_html = re.sub(r'>\s+', '>', final_html)
+        final_html = re.sub(r'\s+<', '<', final_html)
+        # 去除多余空行
+        final_html = re.sub(r'\n\s*\n', '\n', final_html)
+        # 去除首尾空格
+        final_html = final_html.strip()
+        # 只去除完全空白或只有空格的 blockquote（保留有内容的金句）
+        final_html = re.sub(r'<blockquote[^>]*>\s*</blockquote>', '', final_html, flags=re.IGNORECASE)
+
+        # 保存HTML调试内容
+        with open(current_dir / f"debug_article{asset_tag}.html", "w", encoding="utf-8") as f:
+            f.write(final_html)
+        return final_html
+
+    async def draft_stage(topic, html, digest, thumb_media_id):
+        draft_publisher = publisher or WeChatPublisher()
+        return await draft_publisher.create_draft(title=topic, content=html, digest=digest, thumb_media_id=thumb_media_id)
+
+    if structured:
+        # 结构化写作：配图提示词和摘要来自写作结果，配图在写作完成后开始
+        stages = [
+            Stage("write", write_stage, inputs=["topic"], outputs=["markdown", "article_meta"]),
+            Stage("images", images_stage, inputs=["topic", "article_meta"], outputs=["thumb_media_id", "cdn_urls"]),
+            Stage("digest", digest_stage, inputs=["topic", "markdown", "article_meta"], outputs=["digest"]),
+        ]
+    else:
+        stages = [
+            Stage("write", write_stage, inputs=["topic"], outputs=["markdown"]),
+            Stage("images", images_stage, inputs=["topic"], outputs=["thumb_media_id", "cdn_urls"]),
+            Stage("digest", digest_stage, inputs=["topic", "markdown"], outputs=["digest"]),
+        ]
+    return Pipeline(stages + [
+        Stage("layout", layout_stage, inputs=["topic", "markdown", "cdn_urls"], outputs=["html"]),
+        Stage("draft", draft_stage, inputs=["topic", "html", "digest", "thumb_media_id"], outputs=["draft_id"]),
+    ])
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    import argparse
+    parser = argparse.ArgumentParser(description="公众号写作助手 - 按选题计划写作")
+    parser.add_argument("--resume", type=int, metavar="PLAN_ID", help="从检查点续写指定计划")
+    parser.add_argument("--batch", type=int, nargs="?", const=0, metavar="N", help="批量写作所有待写计划（可指定只写前 N 个）")
+    parser.add_argument("--concurrency", type=int, metavar="K", help="批量模式的并发计划数（默认读取 BATCH_CONCURRENCY）")
+    parser.add_argument("--layout", choices=["local", "llm"], help="排版方式：local 本地渲染，llm 使用排版模型（默认读取 LAYOUT_MODE）")
+    parser.add_argument("--writer-mode", choices=["single", "sections", "structured"], help="写作方式：single 整篇写作，sections 大纲 + 分节并行写作，structured 一次返回正文、摘要和配图提示词（默认读取 WRITER_MODE）")
+    parser.add_argument("--digest", choices=["llm", "local", "polish"], help="摘要方式：llm 全文交给模型，local 本地抽取，polish 抽取关键句后由模型润色（默认读取 DIGEST_MODE）")
+    parser.add_argument("--no-cache", action="store_true", help="跳过 LLM 响应缓存，强制重新请求")
+    args = parser.parse_args()
+    if args.digest:
+        Config.override(DIGEST_MODE=args.digest)
+    if args.layout:
+        Config.override(LAYOUT_MODE=args.layout)
+    if args.writer_mode:
+        Config.override(WRITER_MODE=args.writer_mode)
+    if args.no_cache:
+        Config.override(LLM_CACHE=False)
+    asyncio.run(run(args.resume, args.batch, args.concurrency))
@@ -26,6 +26,9 @@ def load_settings():
         "CHERRY_API_BASE_URL": Config.CHERRY_API_BASE_URL,
         "WRITER_MODEL": Config.WRITER_MODEL,
         "LAYOUT_MODEL": Config.LAYOUT_MODEL,
+        "LAYOUT_MODE": Config.LAYOUT_MODE,
+        "WRITER_MODE": Config.WRITER_MODE,
+        "DIGEST_MODE": Config.DIGEST_MODE,
         "IMAGE_GEN_MODEL": Config.IMAGE_GEN_MODEL,
         "WECHAT_APP_ID": Config.WECHAT_APP_ID,
         "WECHAT_APP_SECRET": Config.WECHAT_APP_SECRET,
@@ -61,10 +64,12 @@ def load_style_template(style: str = "default") -> str:
     return load_prompt_file(style_map.get(style, "pattern_editor.md"))
 
 
-def save_to_resources(topic: str, html_content: str, image_urls: list = None) -> str:
-    import shutil
-    from pathlib import Path
-    
+def save_to_resources(topic: str, html_content: str, image_urls: list = None, images: list = None) -> str:
+    """保存文章和图片到 resources/<主题>/
+
+    images 为与 image_urls 对齐的图片缓冲（ImageBuffer），有缓冲的图片直接写入，
+    只有缺少缓冲的图片才按 URL 重新下载。
+    """
     resources_dir = os.path.join(current_dir, "resources")
     os.makedirs(resources_dir, exist_ok=True)
     
@@ -80,25 +85,42 @@ def save_to_resources(topic: str, html_content: str, image_urls: list = None) ->
     if image_urls:
         images_dir = os.path.join(article_dir, "images")
         os.makedirs(images_dir, exist_ok=True)
+        images = images or []
         
-        import httpx
-        from urllib.parse import urlparse
-        try:
-            with httpx.Client(timeout=30.0) as client:
-                for idx, url in enumerate(image_urls):
-                    try:
-                        resp = client.get(url)
-                        if resp.status_code == 200:
-                            parsed = urlparse(url)
-                            ext = os.path.splitext(parsed.path)[1].lstrip('.')[:4] or 'png'
-                            img_path = os.path.join(images_dir, f"image_{idx}.{ext}")
-                            with open(img_path, 'wb') as img_f:
-                                img_f.write(resp.content)
-                            print(f"   已保存图片：images/image_{idx}.{ext}")
-                    except Exception as e:
-                        print(f"   [WARN] 保存图片 {idx} 失败：{e}")
-        except Exception as e:
-            print(f"   [WARN] 下载图片失败：{e}")
+        pending = []
+        for idx, url in enumerate(image_urls):
+            image = images[idx] if idx < len(images) else None
+            if image is None:
+                pending.append((idx, url))
+                continue
+            try:
+                ext = os.path.splitext(image.filename)[1].lstrip('.') or 'png'
+                image.save(os.path.join(images_dir, f"image_{idx}.{ext}"))
+                print(f"   已保存图片：images/image_{idx}.{ext}")
+            except Exception as e:
+                print(f"   [WARN] 保存图片 {idx} 失败：{e}")
+        
+        if pending:
+            import httpx
+            from urllib.parse import urlparse
+            try:
+                with httpx.Client(timeout=30.0) as client:
+                    for idx, url in pending:
+                        if not url:
+                            continue
+                        try:
+                            resp = client.get(url)
+                            if resp.status_code == 200:
+                                parsed = urlparse(url)
+                                ext = os.path.splitext(parsed.path)[1].lstrip('.')[:4] or 'png'
+                                img_path = os.path.join(images_dir, f"image_{idx}.{ext}")
+                                with open(img_path, 'wb') as img_f:
+                                    img_f.write(resp.content)
+                                print(f"   已保存图片：images/image_{idx}.{ext}")
+                        except Exception as e:
+                            print(f"   [WARN] 保存图片 {idx} 失败：{e}")
+            except Exception as e:
+                print(f"   [WARN] 下载图片失败：{e}")
     
     meta_path = os.path.join(article_dir, "meta.txt")
     with open(meta_path, "w", encoding="utf-8") as f:
@@ -110,35 +132,62 @@ def save_to_resources(topic: str, html_content: str, image_urls: list = None) ->
     return article_dir
 
 
-async def call_llm(base_url, api_key, model, system_prompt, user_prompt, max_tokens=4000):
-    import httpx
-    async with httpx.AsyncClient(timeout=600.0) as client:
-        resp = await client.post(
-            f"{base_url}/chat/completions",
-            headers={"Authorization": f"Bearer {api_key}"},
-            json={
-                "model": model,
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                "temperature": 0.7,
-                "max_tokens": max_tokens
-            }
-        )
-        resp.raise_for_status()
-        return resp.json()["choices"][0]["message"]["content"]
-
-
-async def generate_article(topic, no_publish=False, article_content=None, style: str = "default"):
+async def call_llm(base_url, api_key, model, system_prompt, user_prompt, max_tokens=4000, stage=None):
+    """调用 LLM；model 可为带超时的备用模型列表，指定 stage (writer/digest/layout) 时使用响应缓存"""
+    from src.model_router import get_model_router
+    return await get_model_router().chat(
+        base_url, api_key, model, system_prompt, user_prompt, max_tokens=max_tokens, stage=stage
+    )
+
+
+async def call_llm_stream(base_url, api_key, model, system_prompt, user_prompt, max_tokens=4000, watcher=None, stage=None):
+    """流式调用 LLM，token 增量实时推送给 watcher
+
+    未开启 LLM_STREAM 时退化为普通调用，watcher 仍会收到完整文本。
+    """
+    from src.config import Config
+    from src.model_router import get_model_router
+    from src.article_stream import ArticleStreamWatcher
+
+    watcher = watcher or ArticleStreamWatcher()
+    if not Config.LLM_STREAM:
+        text = await call_llm(base_url, api_key, model, system_prompt, user_prompt, max_tokens=max_tokens, stage=stage)
+        await watcher.feed(text)
+        await watcher.close()
+        return text
+
+    return await get_model_router().stream(
+        base_url, api_key, model, system_prompt, user_prompt, watcher, max_tokens=max_tokens, stage=stage
+    )
+
+
+def create_article_watcher():
+    """写作阶段的流式监听器：小节、配图占位符写完即输出进度"""
+    from src.article_stream import ArticleStreamWatcher
+
+    watcher = ArticleStreamWatcher(first_paragraphs=3)
+    watcher.on_paragraphs(lambda paragraphs: print(f"   [流式] 前 {len(paragraphs)} 段已生成"))
+    watcher.on_placeholder(lambda index: print(f"   [流式] 检测到配图占位符 {index}"))
+    watcher.on_section(lambda title, body: print(f"   [流式] 小节完成：{title}（{len(body)} 字）"))
+    return watcher
+
+
+async def generate_article(topic, no_publish=False, article_content=None, style: str = "default", layout: str = None):
     """生成文章
-    
+
+    写作、配图、摘要、排版、发布按依赖关系并发执行：
+    配图只依赖主题，与写作同时开始；摘要与排版都只依赖正文，二者并行。
+
     Args:
         topic: 文章主题
         no_publish: 是否跳过微信发布
         article_content: 外部传入的文章内容（可选）
         style: 排版风格
+        layout: 排版方式，local（本地渲染）或 llm（排版模型），默认读取 LAYOUT_MODE
     """
+    from src.pipeline import Pipeline, PipelineError, Stage
+    from src.model_router import track_served_models
+
     print(f"\n开始生成文章：{topic}")
     print("-" * 50)
     
@@ -150,15 +199,14 @@ async def generate_article(topic, no_publish=False, article_content=None, style:
             print(f"[ERROR] 缺少配置：{key}")
             return
     
-    writer_prompt = load_prompt_file("writer_agent.md")
-    strategy = load_prompt_file("account_strategy.md")
-    
-    # 判断是否使用外部传入的文章内容
-    if article_content:
-        print("[1/4] 使用外部传入的文章内容...")
-        article = article_content
-        print(f"   完成！文章长度：{len(article)} 字")
-    else:
+    base_url = config.get("CHERRY_API_BASE_URL", "https://open.cherryin.ai/v1")
+    layout_model = config.get("LAYOUT_MODEL", "google/gemini-3-flash-preview")
+    layout_mode = layout or config.get("LAYOUT_MODE", "local")
+    structured = config.get("WRITER_MODE") == "structured" and not article_content
+
+    async def write_stage(topic):
+        writer_prompt = load_prompt_file("writer_agent.md")
+        strategy = load_prompt_file("account_strategy.md")
         system = f"""{writer_prompt}
 
 【最高优先级 - 账号定位必须严格遵守】
@@ -170,85 +218,153 @@ async def generate_article(topic, no_publish=False, article_content=None, style:
 """
         user = f"主题：{topic}\n\n请直接输出正文，不要有任何开场白。"
         
-        print("[1/4] 正在写作...")
+        if structured:
+            from src.structured_writer import write_structured
+            print("[写作] 结构化写作（正文 + 摘要 + 配图提示词）...")
+            try:
+                article, meta = await write_structured(
+                    base_url, config["CHERRY_API_KEY"], config["WRITER_MODEL"], system, topic
+                )
+                if meta.get("title"):
+                    print(f"   [写作] 建议标题：{meta['title']}")
+                print(f"   [写作] 完成！文章长度：{len(article)} 字")
+                return article, meta
+            except Exception as e:
+                print(f"   [WARN] 结构化写作失败，改为整篇写作：{e}")
+        
+        if config.get("WRITER_MODE") == "sections":
+            from src.sectioned_writer import write_by_outline
+            print("[写作] 分节并行写作...")
+            try:
+                article = await write_by_outline(
+                    base_url, config["CHERRY_API_KEY"], config["WRITER_MODEL"], system, topic,
+                    on_section=lambda title, body: print(f"   [写作] 小节完成：{title or '开头'}（{len(body)} 字）")
+                )
+                print(f"   [写作] 完成！文章长度：{len(article)} 字")
+                return article
+            except Exception as e:
+                print(f"   [WARN] 分节写作失败，改为整篇写作：{e}")
+        
+        print("[写作] 正在写作...")
         try:
-            article = await call_llm(
-                config.get("CHERRY_API_BASE_URL", "https://open.cherryin.ai/v1"),
+            article = await call_llm_stream(
+                base_url,
                 config["CHERRY_API_KEY"],
                 config["WRITER_MODEL"],
                 system,
                 user,
-                max_tokens=8000
+                max_tokens=8000,
+                watcher=create_article_watcher(),
+                stage="writer"
             )
-            print(f"   完成！文章长度：{len(article)} 字")
         except Exception as e:
             print(f"   [ERROR] 写作失败：{e}")
-            return
-    
-    # 生成摘要
-    print("[2/4] 生成摘要...")
-    summary_system = load_prompt_file("summary_agent.md")
-    
-    if not article or len(article) < 100:
-        print("   [WARN] 文章内容过短，使用默认摘要")
-        digest = f"深度解析：{topic}"
-    else:
-        pure_content = re.sub(r'\[IMAGE_PLACEHOLDER_\d+\]', '', article)
-        digest_prompt = f"请根据以下文章正文，生成 50-100 字的微信推送摘要。\n\n【文章标题】：{topic}\n【文章内容】：\n{pure_content}"
+            raise
+        print(f"   [写作] 完成！文章长度：{len(article)} 字")
+        return article
+
+    async def structured_write_stage(topic):
+        result = await write_stage(topic)
+        return result if isinstance(result, tuple) else (result, {})
+
+    async def digest_stage(topic, markdown, article_meta=None):
+        if article_meta and article_meta.get("digest"):
+            digest = article_meta["digest"]
+            with open(os.path.join(current_dir, "debug_digest.txt"), "w", encoding="utf-8") as f:
+                f.write(f"主题：{topic}\n摘要：{digest}")
+            print("[摘要] 使用写作阶段生成的摘要")
+            return digest
+        
+        from src.local_digest import extract_digest, polish_prompt
+        print("[摘要] 生成摘要...")
+        summary_system = load_prompt_file("summary_agent.md")
+        digest_mode = config.get("DIGEST_MODE", "llm")
         
+        if not markdown or len(markdown) < 100:
+            print("   [WARN] 文章内容过短，使用默认摘要")
+            digest = f"深度解析：{topic}"
+        elif digest_mode == "local":
+            digest = extract_digest(markdown, title=topic)
+            print("   [摘要] 本地抽取")
+        else:
+            if digest_mode == "polish":
+                # 只上传抽取出的关键句
+                digest_prompt = polish_prompt(markdown, topic)
+            else:
+                pure_content = re.sub(r'\[IMAGE_PLACEHOLDER_\d+\]', '', markdown)
+                digest_prompt = f"请根据以下文章正文，生成 50-100 字的微信推送摘要。\n\n【文章标题】：{topic}\n【文章内容】：\n{pure_content}"
+            
+            try:
+                digest = await call_llm(
+                    base_url,
+                    config["CHERRY_API_KEY"],
+                    layout_model,
+                    summary_system if summary_system else "你是一个专业的微信编辑，擅长从长文中提取核心要点，生成 50-100 字的推送摘要。",
+                    digest_prompt,
+                    max_tokens=500,
+                    stage="digest"
+                )
+                digest = re.sub(r'[#*`>]|\[IMAGE_PLACEHOLDER_\d+\]', '', digest)
+                digest = re.sub(r'\s+', ' ', digest).strip()
+                if len(digest) > 120:
+                    digest = digest[:117] + "..."
+            except Exception as e:
+                print(f"   [ERROR] 摘要生成失败，改用本地抽取：{e}")
+                digest = extract_digest(markdown, title=topic)
+        
+        with open(os.path.join(current_dir, "debug_digest.txt"), "w", encoding="utf-8") as f:
+            f.write(f"主题：{topic}\n摘要：{digest}")
+        print("   [摘要] 完成！")
+        return digest
+
+    async def images_stage(topic, article_meta=None):
+        print("[配图] 生成配图...")
         try:
-            digest = await call_llm(
-                config.get("CHERRY_API_BASE_URL", "https://open.cherryin.ai/v1"),
-                config["CHERRY_API_KEY"],
-                config.get("LAYOUT_MODEL", "google/gemini-3-flash-preview"),
-                summary_system if summary_system else "你是一个专业的微信编辑，擅长从长文中提取核心要点，生成 50-100 字的推送摘要。",
-                digest_prompt,
-                max_tokens=500
+            from src.article_orchestrator import ArticleOrchestrator
+            orchestrator = ArticleOrchestrator()
+            
+            cover_prompt = f"Cinematic wide shot, {topic}, photorealistic, dramatic lighting, 2.35:1, moody atmosphere, no text, --ar 2.35:1"
+            illustration_prompts = [
+                f"Cinematic scene, {topic}, photorealistic, dramatic light, 4:3, no text, --ar 4:3",
+                f"Cinematic scene, business context, photorealistic, moody, 4:3, no text, --ar 4:3",
+                f"Cinematic scene, future opportunity, photorealistic, hopeful, 4:3, no text, --ar 4:3"
+            ]
+            # 结构化写作时使用与正文对应的提示词
+            meta = article_meta or {}
+            cover_prompt = meta.get("cover_prompt", cover_prompt)
+            illustration_prompts = meta.get("image_prompts", illustration_prompts)
+            
+            # 保留下载的图片缓冲，归档时直接写入，不再重新下载
+            kept = {}
+            thumb_media_id, cdn_urls = await orchestrator.generate_and_upload_all_images(
+                cover_prompt=cover_prompt,
+                illustration_prompts=illustration_prompts,
+                keep_images=kept
             )
-            digest = re.sub(r'[#*`>]|\[IMAGE_PLACEHOLDER_\d+\]', '', digest)
-            digest = re.sub(r'\s+', ' ', digest).strip()
-            if len(digest) > 120:
-                digest = digest[:117] + "..."
+            print("   [配图] 完成！图片已上传微信素材库")
+            if "cover" in kept:
+                kept.pop("cover").close()
+            return thumb_media_id, cdn_urls, [kept.get(i) for i in range(len(cdn_urls))]
         except Exception as e:
-            print(f"   [ERROR] 摘要生成失败：{e}")
-            digest = f"深度解析：{topic}"
-    
-    with open(os.path.join(current_dir, "debug_digest.txt"), "w", encoding="utf-8") as f:
-        f.write(f"主题：{topic}\n摘要：{digest}")
-    
-    # 生成图片
-    print("[3/4] 生成配图...")
-    try:
-        from src.article_orchestrator import ArticleOrchestrator
-        orchestrator = ArticleOrchestrator()
-        
-        cover_prompt = f"Cinematic wide shot, {topic}, photorealistic, dramatic lighting, 2.35:1, moody atmosphere, no text, --ar 2.35:1"
-        illustration_prompts = [
-            f"Cinematic scene, {topic}, photorealistic, dramatic light, 4:3, no text, --ar 4:3",
-            f"Cinematic scene, business context, photorealistic, moody, 4:3, no text, --ar 4:3",
-            f"Cinematic scene, future opportunity, photorealistic, hopeful, 4:3, no text, --ar 4:3"
-        ]
-        
-        thumb_media_id, cdn_urls = await orchestrator.generate_and_upload_all_images(
-            cover_prompt=cover_prompt,
-            illustration_prompts=illustration_prompts
-        )
-        print("   完成！图片已上传微信素材库")
-        
+            print(f"   [WARN] 图片生成失败：{e}")
+            return None, [], []
+
+    async def layout_stage(topic, markdown, cdn_urls):
+        print("[排版] HTML 排版...")
+        article = markdown
         for i, url in enumerate(cdn_urls):
             article = article.replace(f"[IMAGE_PLACEHOLDER_{i}]", url)
-    except Exception as e:
-        print(f"   [WARN] 图片生成失败：{e}")
-        thumb_media_id = None
-        cdn_urls = []
-    
-    # 排版
-    print("[4/4] HTML 排版...")
-    try:
-        layout_prompt = load_style_template(style)
-        content_with_images = article
-        
-        layout_user = f"""请将以下 Markdown 文章转换为微信公众号 HTML 格式。
+        if layout_mode != "llm":
+            from src.html_renderer import render_markdown
+            html_content = render_markdown(article, style=style, title=topic)
+            print("   [排版] 完成！（本地渲染）")
+            return html_content
+        try:
+            from src.chunked_layout import layout_in_chunks
+            layout_prompt = load_style_template(style)
+            
+            def build_layout_user(chunk):
+                return f"""请将以下 Markdown 文章转换为微信公众号 HTML 格式。
 
 【关键要求】
 1. 金句（> 引用格式）：必须添加装饰框
@@ -258,31 +374,104 @@ async def generate_article(topic, no_publish=False, article_content=None, style:
 5. 直接输出 HTML 代码块
 
 文章内容：
-{content_with_images}"""
-        
-        html_content = await call_llm(
-            config.get("CHERRY_API_BASE_URL", "https://open.cherryin.ai/v1"),
-            config["CHERRY_API_KEY"],
-            config.get("LAYOUT_MODEL", "google/gemini-3-flash-preview"),
-            layout_prompt,
-            layout_user,
-            max_tokens=8000
-        )
-        
-        if "```html" in html_content:
-            html_content = html_content.split("```html")[1].split("```")[0].strip()
-        
-        html_content = re.sub(r'<h1[^>]*>.*?</h1>', '', html_content, flags=re.DOTALL | re.IGNORECASE)
-        html_content = re.sub(r'<h2[^>]*>.*?</h2>', '', html_content, flags=re.DOTALL | re.IGNORECASE)
-        html_content = re.sub(r'<blockquote[^>]*>\s*</blockquote>', '', html_content, flags=re.IGNORECASE)
-        print("   完成！")
-    except Exception as e:
-        print(f"   [WARN] 排版失败：{e}")
-        html_content = f"<h1>{topic}</h1><p>{article}</p>"
-    
-    # 保存文章和图片
-    resource_dir = save_to_resources(topic, html_content, cdn_urls)
-    print(f"\n[INFO] 文章已保存到：{resource_dir}")
+{chunk}"""
+            
+            html_content = await layout_in_chunks(
+                base_url,
+                config["CHERRY_API_KEY"],
+                layout_model,
+                layout_prompt,
+                article,
+                build_user=build_layout_user,
+                style=style
+            )
+            
+            html_content = re.sub(r'<h1[^>]*>.*?</h1>', '', html_content, flags=re.DOTALL | re.IGNORECASE)
+            html_content = re.sub(r'<h2[^>]*>.*?</h2>', '', html_content, flags=re.DOTALL | re.IGNORECASE)
+            html_content = re.sub(r'<blockquote[^>]*>\s*</blockquote>', '', html_content, flags=re.IGNORECASE)
+            print("   [排版] 完成！")
+        except Exception as e:
+            print(f"   [WARN] 排版失败：{e}")
+            html_content = f"<h1>{topic}</h1><p>{article}</p>"
+        return html_content
+
+    async def save_stage(topic, html, cdn_urls, images):
+        # 保存文章和图片（图片直接使用配图阶段的缓冲）；下载和写文件是阻塞操作，
+        # 放到线程池执行，不拖住同时进行的发布阶段
+        try:
+            resource_dir = await asyncio.to_thread(save_to_resources, topic, html, cdn_urls, images)
+        finally:
+            for image in images:
+                if image is not None:
+                    image.close()
+        print(f"\n[INFO] 文章已保存到：{resource_dir}")
+        return resource_dir
+
+    async def publish_stage(topic, html, digest, thumb_media_id):
+        print("\n正在创建微信草稿...")
+        try:
+            from src.wechat_publisher import WeChatPublisher
+            publisher = WeChatPublisher()
+            draft_id = await publisher.create_draft(
+                title=topic,
+                content=html,
+                digest=digest,
+                thumb_media_id=thumb_media_id
+            )
+            print(f"\n[SUCCESS] 文章生成完成！")
+            print(f"   微信草稿 ID: {draft_id}")
+            print(f"   登录 https://mp.weixin.qq.com/ 查看草稿")
+            return draft_id
+        except Exception as e:
+            print(f"   [ERROR] 发布失败：{e}")
+            return None
+
+    if structured:
+        # 结构化写作：配图提示词和摘要来自写作结果，配图在写作完成后开始
+        stages = [
+            Stage("write", structured_write_stage, inputs=["topic"], outputs=["markdown", "article_meta"]),
+            Stage("images", images_stage, inputs=["topic", "article_meta"], outputs=["thumb_media_id", "cdn_urls", "images"]),
+            Stage("digest", digest_stage, inputs=["topic", "markdown", "article_meta"], outputs=["digest"]),
+        ]
+    else:
+        stages = [
+            Stage("write", write_stage, inputs=["topic"], outputs=["markdown"]),
+            Stage("images", images_stage, inputs=["topic"], outputs=["thumb_media_id", "cdn_urls", "images"]),
+            Stage("digest", digest_stage, inputs=["topic", "markdown"], outputs=["digest"]),
+        ]
+    stages += [
+        Stage("layout", layout_stage, inputs=["topic", "markdown", "cdn_urls"], outputs=["html"]),
+        Stage("save", save_stage, inputs=["topic", "html", "cdn_urls", "images"], outputs=["resource_dir"]),
+    ]
+    if not no_publish:
+        stages.append(Stage("publish", publish_stage, inputs=["topic", "html", "digest", "thumb_media_id"], outputs=["draft_id"]))
+
+    initial = {"topic": topic}
+    # 判断是否使用外部传入的文章内容
+    if article_content:
+        print("[写作] 使用外部传入的文章内容...")
+        print(f"   完成！文章长度：{len(article_content)} 字")
+        initial["markdown"] = article_content
+
+    pipeline = Pipeline(stages)
+    served = track_served_models()
+    try:
+        context = await pipeline.run(initial)
+    except PipelineError as e:
+        print(f"[ERROR] {e}")
+        return
+    finally:
+        print("\n[耗时] 各阶段时间线：")
+        print(pipeline.report())
+    
+    # 记录实际服务各阶段的模型
+    if served:
+        models_line = "，".join(f"{stage}={model}" for stage, model in served.items())
+        print(f"[模型] {models_line}")
+        resource_dir = context.get("resource_dir")
+        if resource_dir:
+            with open(os.path.join(resource_dir, "meta.txt"), "a", encoding="utf-8") as f:
+                f.write(f"模型：{models_line}\n")
     
     # 记录风格使用
     try:
@@ -293,24 +482,27 @@ async def generate_article(topic, no_publish=False, article_content=None, style:
     
     if no_publish:
         print("\n[INFO] 已跳过微信发布")
-        return
-    
-    # 发布到微信
-    print("\n正在创建微信草稿...")
+
+
+async def run_article(topic, **kwargs):
+    """生成文章并在结束后释放 LLM 连接池、输出重试统计"""
+    from src.llm_client import close_llm_client
+    from src.resilience import get_retry_metrics
+    from src.adaptive_limiter import adaptive_report
+    from src.model_router import get_model_router
     try:
-        from src.wechat_publisher import WeChatPublisher
-        publisher = WeChatPublisher()
-        draft_id = await publisher.create_draft(
-            title=topic,
-            content=html_content,
-            digest=digest,
-            thumb_media_id=thumb_media_id
-        )
-        print(f"\n[SUCCESS] 文章生成完成！")
-        print(f"   微信草稿 ID: {draft_id}")
-        print(f"   登录 https://mp.weixin.qq.com/ 查看草稿")
-    except Exception as e:
-        print(f"   [ERROR] 发布失败：{e}")
+        await generate_article(topic, **kwargs)
+    finally:
+        await close_llm_client()
+        if get_retry_metrics().has_retries():
+            print("\n[重试] 各接口统计：")
+            print(get_retry_metrics().report())
+        if adaptive_report():
+            print("\n[并发] 自适应并发：")
+            print(adaptive_report())
+        if get_model_router().hedge_report():
+            print("\n[对冲] 统计：")
+            print(get_model_router().hedge_report())
 
 
 def load_article_from_file(filepath: str) -> str:
@@ -328,8 +520,19 @@ def main():
     parser.add_argument("--content", "-c", help="直接传入文章内容（Markdown 格式）")
     parser.add_argument("--from-file", "-f", help="从文件读取文章内容")
     parser.add_argument("--style", "-s", help="排版风格（默认：从配置文件读取）")
+    parser.add_argument("--layout", choices=["local", "llm"], help="排版方式：local 本地渲染，llm 使用排版模型（默认读取 LAYOUT_MODE）")
+    parser.add_argument("--writer-mode", choices=["single", "sections", "structured"], help="写作方式：single 整篇写作，sections 大纲 + 分节并行写作，structured 一次返回正文、摘要和配图提示词（默认读取 WRITER_MODE）")
+    parser.add_argument("--digest", choices=["llm", "local", "polish"], help="摘要方式：llm 全文交给模型，local 本地抽取，polish 抽取关键句后由模型润色（默认读取 DIGEST_MODE）")
+    parser.add_argument("--no-cache", action="store_true", help="跳过 LLM 响应缓存，强制重新请求")
     
     args = parser.parse_args()
+    from src.config import Config
+    if args.writer_mode:
+        Config.override(WRITER_MODE=args.writer_mode)
+    if args.digest:
+        Config.override(DIGEST_MODE=args.digest)
+    if args.no_cache:
+        Config.override(LLM_CACHE=False)
     
     print("=" * 50)
     print("   公众号写作助手 - 快速写作")
@@ -388,7 +591,7 @@ def main():
     print(f"排版风格：{style} ({style_source})")
     print("开始写作流程...\n")
     
-    asyncio.run(generate_article(topic, no_publish=args.no_publish, article_content=article_content, style=style))
+    asyncio.run(run_article(topic, no_publish=args.no_publish, article_content=article_content, style=style, layout=args.layout))
 
 
 if __name__ == "__main__":
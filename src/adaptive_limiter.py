@@ -0,0 +1,136 @@
+"""
+自适应并发控制 (AIMD)
+
+免费图片模型的承载能力没有文档且随时波动，固定并发数要么浪费吞吐、要么触发限流。
+这里按 TCP 拥塞控制的思路自动调整并发上限：
+
+- 加性增：请求在延迟目标内成功，上限每轮增加 1（每次成功 +1/上限）
+- 乘性减：遇到 429、超时、5xx 或错误载荷，上限乘以 IMAGE_AIMD_DECREASE
+  （同一轮中并发失败的请求只减一次）
+
+上限变化会输出到日志，snapshot() 提供当前上限、在途请求数和计数。
+
+使用方式：
+    from src.adaptive_limiter import get_adaptive_limiter
+
+    async with get_adaptive_limiter("image:" + model).slot():
+        await generate(...)
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from .config import Config
+from .resilience import is_retryable
+
+
+class AdaptiveLimiter:
+    """AIMD 并发上限"""
+
+    def __init__(self, name: str,
+                 initial: Optional[float] = None,
+                 min_limit: Optional[float] = None,
+                 max_limit: Optional[float] = None,
+                 latency_target: Optional[float] = None,
+                 decrease: Optional[float] = None):
+        self.name = name
+        self.min_limit = max(1.0, min_limit if min_limit is not None else Config.IMAGE_CONCURRENCY_MIN)
+        self.max_limit = max(self.min_limit, max_limit if max_limit is not None else Config.IMAGE_CONCURRENCY_MAX)
+        start = initial if initial is not None else Config.IMAGE_CONCURRENCY
+        self.limit = float(min(max(start, self.min_limit), self.max_limit))
+        self.latency_target = latency_target if latency_target is not None else Config.IMAGE_LATENCY_TARGET
+        self.decrease = decrease if decrease is not None else Config.IMAGE_AIMD_DECREASE
+
+        self.in_flight = 0
+        self.successes = 0
+        self.slow = 0
+        self.overloads = 0
+        self._last_decrease = 0.0
+        self._condition: Optional[asyncio.Condition] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_condition(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._condition = asyncio.Condition()
+            self._loop = loop
+        return self._condition
+
+    async def acquire(self):
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self):
+        condition = self._get_condition()
+        async with condition:
+            self.in_flight -= 1
+            condition.notify_all()
+
+    @asynccontextmanager
+    async def slot(self):
+        """占用一个并发名额，并按结果调整上限"""
+        await self.acquire()
+        started = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            if is_retryable(e):
+                self.on_overload(started)
+            raise
+        else:
+            self.on_success(time.monotonic() - started)
+        finally:
+            await self.release()
+
+    def on_success(self, latency: float):
+        self.successes += 1
+        if latency > self.latency_target:
+            self.slow += 1
+            return
+        self._set_limit(min(self.max_limit, self.limit + 1.0 / self.limit), "成功")
+
+    def on_overload(self, started: float):
+        self.overloads += 1
+        # 上次降低之前发出的请求属于同一轮，不重复降低
+        if started < self._last_decrease:
+            return
+        self._last_decrease = time.monotonic()
+        self._set_limit(max(self.min_limit, self.limit * self.decrease), "过载")
+
+    def _set_limit(self, value: float, reason: str):
+        before = int(self.limit)
+        self.limit = value
+        if int(value) != before:
+            print(f"   [并发] {self.name} 并发上限 {before} -> {int(value)}（{reason}）")
+
+    def snapshot(self) -> dict:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "successes": self.successes,
+            "slow": self.slow,
+            "overloads": self.overloads,
+        }
+
+    def report(self) -> str:
+        s = self.snapshot()
+        return (f"   {self.name}: 并发上限 {s['limit']}，成功 {s['successes']}（超时目标 {s['slow']}），"
+                f"过载 {s['overloads']}")
+
+
+# 全局单例（按名称区分，批量模式下所有文章共享）
+_adaptive_limiters: Dict[str, AdaptiveLimiter] = {}
+
+
+def get_adaptive_limiter(name: str) -> AdaptiveLimiter:
+    if name not in _adaptive_limiters:
+        _adaptive_limiters[name] = AdaptiveLimiter(name)
+    return _adaptive_limiters[name]
+
+
+def adaptive_report() -> str:
+    return "\n".join(limiter.report() for limiter in _adaptive_limiters.values())
@@ -1,8 +1,34 @@
 import asyncio
 import os
 import httpx
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Optional, Union
 from .config import Config
+from .adaptive_limiter import get_adaptive_limiter
+from .image_buffer import ImageBuffer, format_size
+from .image_cache import get_image_cache
+from .image_optimizer import COVER, ILLUSTRATION, optimize_image
+from .rate_limiter import get_rate_limiter
+from .upload_registry import get_upload_registry, upload_kind
+from .resilience import RETRYABLE_STATUS, RetryableError, call_with_retry
+from .wechat_token import get_token_manager
+
+# 生成图片尺寸（也是图片缓存键的一部分）
+IMAGE_SIZE = "1024x1024"
+
+def _describe_response(data) -> str:
+    """图片生成响应的日志摘要：b64_json 只记录长度，不输出内容"""
+    if not isinstance(data, dict):
+        return type(data).__name__
+    items = []
+    for item in data.get("data") or []:
+        if isinstance(item, dict) and item.get("b64_json"):
+            items.append(f"b64_json({format_size(len(item['b64_json']))})")
+        elif isinstance(item, dict) and item.get("url"):
+            items.append(f"url={item['url'][:80]}")
+    summary = f"data=[{', '.join(items)}]" if items else f"keys={sorted(data)}"
+    if "error" in data:
+        summary += f" error={str(data['error'])[:200]}"
+    return summary
 
 
 class ArticleOrchestrator:
@@ -24,49 +50,57 @@ class ArticleOrchestrator:
             # 图片生成使用独立的 API 地址
             "IMAGE_GEN_BASE_URL": Config.IMAGE_GEN_BASE_URL,
         }
-        self.upload_dir = os.path.join(os.path.dirname(__file__), "..", "images")
-        os.makedirs(self.upload_dir, exist_ok=True)
-
-        # 缓存access_token
-        self._token = None
-        self._token_expires = 0
+        # access_token 由进程级管理器统一获取和缓存（与发布器共享）
+        self.token_manager = get_token_manager(Config.WECHAT_APP_ID, Config.WECHAT_APP_SECRET)
 
     async def _get_access_token(self) -> str:
         """获取微信access_token"""
-        import time
-        if self._token and time.time() < self._token_expires:
-            return self._token
-
-        url = "https://api.weixin.qq.com/cgi-bin/token"
-        params = {
-            "grant_type": "client_credential",
-            "appid": self.settings.get("WECHAT_APP_ID"),
-            "secret": self.settings.get("WECHAT_APP_SECRET")
-        }
+        return await self.token_manager.get_token()
 
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            resp = await client.get(url, params=params)
-            data = resp.json()
-            if "access_token" in data:
-                self._token = data["access_token"]
-                self._token_expires = time.time() + data["expires_in"] - 300
-                return self._token
-            else:
-                raise Exception(f"获取token失败: {data}")
-
-    async def _upload_image_to_wechat(self, image_path: str, image_type: str = "image", is_permanent: bool = False, is_article_image: bool = False) -> dict:
+    async def _upload_image_to_wechat(self, image: Union[ImageBuffer, str], image_type: str = "image", is_permanent: bool = False, is_article_image: bool = False) -> dict:
         """上传图片到微信素材库
 
         Args:
-            image_path: 图片本地路径
+            image: 图片缓冲（ImageBuffer）或本地路径
             image_type: 素材类型 (image/thumb)
             is_permanent: 是否上传为永久素材
             is_article_image: 是否上传为图文消息图片（使用uploadimg接口）
 
-        优先使用 httpx，失败则使用 aiohttp 作为备用
+        access_token 失效时自动刷新并重试一次；
+        相同字节已上传过同一类型时直接返回登记的 media_id / url，不再上传
         """
-        token = await self._get_access_token()
+        if isinstance(image, str):
+            # 本地文件：读入缓冲后按同样方式上传
+            with open(image, 'rb') as f:
+                buffer = ImageBuffer(os.path.basename(image))
+                buffer.write(f.read())
+            try:
+                return await self._upload_image_to_wechat(buffer, image_type, is_permanent, is_article_image)
+            finally:
+                buffer.close()
+
+        registry = get_upload_registry() if self.config.WECHAT_UPLOAD_DEDUP else None
+        app_id = self.settings["WECHAT_APP_ID"]
+        kind = upload_kind(image_type, is_permanent, is_article_image)
+        sha256 = image.sha256()
+        if registry:
+            uploaded = await asyncio.to_thread(registry.lookup, app_id, sha256, kind)
+            if uploaded:
+                print(f"   [上传] 相同图片已上传过（{kind}，sha256:{sha256[:8]}），跳过上传")
+                return uploaded
+
+        result = await self.token_manager.call(
+            lambda token: self._post_image(token, image, image_type, is_permanent, is_article_image)
+        )
+        if registry:
+            await asyncio.to_thread(registry.record, app_id, sha256, kind, result, image.size)
+        return result
+
+    async def _post_image(self, token: str, image: ImageBuffer, image_type: str, is_permanent: bool, is_article_image: bool) -> dict:
+        """以指定 token 上传图片
 
+        优先使用 httpx，失败则使用 aiohttp 作为备用
+        """
         # 选择上传接口
         if is_article_image:
             # 图文消息图片接口 - 返回可直接使用的URL，不占用素材数量限制
@@ -78,18 +112,20 @@ class ArticleOrchestrator:
             # 临时素材
             url = f"https://api.weixin.qq.com/cgi-bin/media/upload?access_token={token}&type={image_type}"
 
-        # 根据图片类型设置content_type
-        content_type = 'image/png' if image_path.endswith('.png') else 'image/jpeg'
+        # content_type 和扩展名按图片实际格式设置
+        content_type = image.content_type
+
+        # 直接从缓冲区上传，不经过磁盘
+        media = image.getvalue()
 
         # 方法1: 尝试使用 httpx
         try:
             async with httpx.AsyncClient(timeout=60.0) as client:
-                with open(image_path, 'rb') as f:
-                    files = {'media': (os.path.basename(image_path), f, content_type)}
-                    resp = await client.post(url, files=files)
-                    result = resp.json()
-                    print(f"   [DEBUG] {'图文' if is_article_image else ('永久' if is_permanent else '临时')}图片上传结果: {result}")
-                    return result
+                files = {'media': (image.filename, media, content_type)}
+                resp = await client.post(url, files=files)
+                result = resp.json()
+                print(f"   [DEBUG] {'图文' if is_article_image else ('永久' if is_permanent else '临时')}图片上传结果: {result}")
+                return result
         except Exception as e:
             print(f"   [INFO] httpx 上传失败，尝试 aiohttp: {e}")
 
@@ -97,49 +133,138 @@ class ArticleOrchestrator:
         try:
             import aiohttp
             async with aiohttp.ClientSession() as session:
-                with open(image_path, 'rb') as f:
-                    data = aiohttp.FormData()
-                    data.add_field('media', f, filename=os.path.basename(image_path), content_type=content_type)
-                    async with session.post(url, data=data, timeout=aiohttp.ClientTimeout(total=60)) as resp:
-                        result = await resp.json()
-                        print(f"   [DEBUG] aiohttp {'图文' if is_article_image else ('永久' if is_permanent else '临时')}图片上传结果: {result}")
-                        return result
+                data = aiohttp.FormData()
+                data.add_field('media', media, filename=image.filename, content_type=content_type)
+                async with session.post(url, data=data, timeout=aiohttp.ClientTimeout(total=60)) as resp:
+                    result = await resp.json()
+                    print(f"   [DEBUG] aiohttp {'图文' if is_article_image else ('永久' if is_permanent else '临时')}图片上传结果: {result}")
+                    return result
         except Exception as e:
             raise Exception(f"图片上传失败 (httpx和aiohttp都失败): {e}")
 
     async def generate_and_upload_all_images(self,
                                             cover_prompt: str,
-                                            illustration_prompts: List[str]) -> Tuple[str, List[str]]:
+                                            illustration_prompts: List[str],
+                                            concurrency: int = None,
+                                            asset_tag: str = "",
+                                            keep_images: Optional[Dict] = None) -> Tuple[str, List[str]]:
         """
         1. Generate cover and illustrations via LLM API
-        2. Download them locally
-        3. Upload cover to WeChat (media_id)
-        4. Upload illustrations to WeChat (CDN URL)
+        2. Download them into memory buffers
+        3. Crop / resize / recompress them to WeChat limits (optional, needs Pillow)
+        4. Upload cover to WeChat (media_id)
+        5. Upload illustrations to WeChat (CDN URL)
         Returns: (thumb_media_id, [content_image_urls])
+
+        封面和每张插图各自是一条 生成 → 下载 → 上传 链路，
+        在信号量限制下并发执行；单张失败不影响其他图片，
+        cdn_urls 顺序与占位符顺序一致（生成失败的插图为空字符串）。
+        图片只保存在内存缓冲中（大图转存临时文件），不写入 images/ 目录；
+        asset_tag 附加在上传文件名后，便于区分并发的多篇文章。
+        传入 keep_images 字典时，缓冲按 "cover" / 插图序号 存入供调用方复用（如归档），
+        由调用方负责 close()；否则上传后立即释放。
         """
-        print("[图片] 正在生成封面...")
+        limit = concurrency or self.config.IMAGE_CONCURRENCY
+        semaphore = asyncio.Semaphore(max(1, limit))
+        print(f"[图片] 并发生成封面和 {len(illustration_prompts)} 张插图（并发上限 {limit}）...")
+
+        results = await asyncio.gather(
+            self._process_cover(cover_prompt, semaphore, asset_tag, keep_images),
+            *[self._process_illustration(i, prompt, len(illustration_prompts), semaphore, asset_tag, keep_images)
+              for i, prompt in enumerate(illustration_prompts)],
+            return_exceptions=True
+        )
+
+        generation = get_adaptive_limiter(f"image:{self.settings.get('IMAGE_GEN_MODEL', 'qwen/qwen-image(free)')}")
+        print(f"[图片] 生成接口当前并发上限 {generation.snapshot()['limit']}")
+
+        thumb_media_id = results[0]
+        if isinstance(thumb_media_id, Exception):
+            print(f"   [WARN] 封面处理失败: {thumb_media_id}")
+            thumb_media_id = None
+
+        cdn_urls = []
+        for i, result in enumerate(results[1:]):
+            if isinstance(result, Exception):
+                print(f"   [WARN] 插图 {i+1} 处理失败: {result}")
+                result = ""
+            cdn_urls.append(result)
+
+        return thumb_media_id, cdn_urls
+
+    async def _process_cover(self, cover_prompt: str, semaphore: asyncio.Semaphore, asset_tag: str = "",
+                             keep_images: Optional[Dict] = None) -> str:
+        """封面链路：生成 → 下载 → 上传永久 thumb，失败回退为临时 thumb
+
+        图片缓存命中时跳过生成；缓存中已有永久 media_id 时上传也跳过
+        """
+        async with semaphore:
+            filename = f"cover{asset_tag}.png"
+            cached = await self._cached_image(cover_prompt)
+            if cached:
+                cover_image = cached.to_buffer(filename)
+                print(f"[图片] 封面命中图片缓存（第 {cached.uses} 次复用）：{cover_image.describe()}")
+                cache_key = cached.key
+                cover_image = await optimize_image(cover_image, COVER)
+            else:
+                print("[图片] 正在生成封面...")
+
+                # 调用图片生成API
+                generated = await self._generate_image(cover_prompt)
+
+                # 取得封面字节（URL 则下载到内存），裁剪压缩到 thumb 素材限制后缓存
+                cover_image = await self._load_image(generated, filename)
+                cover_image = await optimize_image(cover_image, COVER)
+                cache_key = await self._cache_image(cover_prompt, cover_image)
+            try:
+                if cached and cached.thumb_media_id:
+                    print(f"   封面复用缓存素材，media_id: {cached.thumb_media_id[:20]}...")
+                    return cached.thumb_media_id
+                thumb_media_id, permanent = await self._upload_cover(cover_image)
+                if permanent:
+                    await asyncio.to_thread(get_image_cache().set_assets, cache_key, thumb_media_id=thumb_media_id)
+                return thumb_media_id
+            finally:
+                self._release(cover_image, "cover", keep_images)
+
+    async def _cached_image(self, prompt: str):
+        """按 (生成模型, 提示词, 尺寸) 查询图片缓存（SQLite 读写在线程池中执行）"""
+        model = self.settings.get("IMAGE_GEN_MODEL", "qwen/qwen-image(free)")
+        return await asyncio.to_thread(get_image_cache().get, model, prompt, IMAGE_SIZE)
 
-        # 调用图片生成API
-        cover_url = await self._generate_image(cover_prompt)
+    async def _cache_image(self, prompt: str, image: ImageBuffer) -> Optional[str]:
+        """新生成的图片写入缓存，返回缓存键（未启用缓存时为 None）"""
+        model = self.settings.get("IMAGE_GEN_MODEL", "qwen/qwen-image(free)")
+        return await asyncio.to_thread(get_image_cache().put, model, prompt, IMAGE_SIZE, image)
 
-        # 下载封面
-        cover_path = os.path.join(self.upload_dir, "cover.png")
-        await self._download_image(cover_url, cover_path)
+    @staticmethod
+    def _release(image: ImageBuffer, key, keep_images: Optional[Dict]):
+        """上传结束后交给调用方保留，或直接释放缓冲"""
+        if keep_images is not None:
+            keep_images[key] = image
+        else:
+            image.close()
 
+    async def _upload_cover(self, cover_image: ImageBuffer) -> Tuple[Optional[str], bool]:
+        """上传封面为永久 thumb 素材，失败回退为临时 thumb；返回 (media_id, 是否永久素材)"""
         # 上传封面到微信 - 使用永久 thumb 素材获取 media_id
         print("[图片] 上传封面到微信（永久素材）...")
-        cover_result = await self._upload_image_to_wechat(cover_path, "thumb", is_permanent=True)
+        try:
+            cover_result = await self._upload_image_to_wechat(cover_image, "thumb", is_permanent=True)
+        except Exception as e:
+            cover_result = {"errcode": -1, "errmsg": str(e)}
 
         # 检查上传结果 - thumb 永久素材会返回 media_id
         if "media_id" in cover_result:
             thumb_media_id = cover_result["media_id"]
             print(f"   封面上传成功，media_id: {thumb_media_id[:20]}...")
+            return thumb_media_id, True
         elif "errcode" in cover_result:
             errcode = cover_result.get('errcode')
             errmsg = cover_result.get('errmsg', '未知错误')
             print(f"   [WARN] 永久素材上传失败，尝试临时素材: {errmsg}")
             # 备用：尝试使用临时素材
-            temp_result = await self._upload_image_to_wechat(cover_path, "thumb", is_permanent=False)
+            temp_result = await self._upload_image_to_wechat(cover_image, "thumb", is_permanent=False)
             if "media_id" in temp_result:
                 thumb_media_id = temp_result["media_id"]
                 print(f"   [INFO] 临时封面上传成功，media_id: {thumb_media_id[:20]}...")
@@ -150,26 +275,57 @@ class ArticleOrchestrator:
             print(f"   [WARN] 封面上传返回异常: {cover_result}")
             thumb_media_id = None
 
-        # 生成并上传插图
-        cdn_urls = []
-        for i, prompt in enumerate(illustration_prompts):
-            print(f"[图片] 正在生成插图 {i+1}/{len(illustration_prompts)}...")
+        return thumb_media_id, False
 
-            # 生成图片
-            img_url = await self._generate_image(prompt)
+    async def _process_illustration(self, i: int, prompt: str, total: int, semaphore: asyncio.Semaphore,
+                                    asset_tag: str = "", keep_images: Optional[Dict] = None) -> str:
+        """插图链路：生成 → 下载 → 上传图文图片，失败回退为原始图片URL
 
-            # 下载
-            img_path = os.path.join(self.upload_dir, f"illustration_{i}.png")
-            await self._download_image(img_url, img_path)
+        图片缓存命中时跳过生成；缓存中已有 CDN URL 时上传也跳过
+        """
+        async with semaphore:
+            filename = f"illustration_{i}{asset_tag}.png"
+            cached = await self._cached_image(prompt)
+            img_url, cache_key = "", None
+            if cached:
+                cache_key = cached.key
+                print(f"[图片] 插图 {i+1} 命中图片缓存（第 {cached.uses} 次复用）")
+                if cached.cdn_url:
+                    print(f"   插图 {i+1} 复用缓存URL: {cached.cdn_url[:50]}...")
+                    if keep_images is not None:
+                        keep_images[i] = cached.to_buffer(filename)
+                    return cached.cdn_url
+            else:
+                print(f"[图片] 正在生成插图 {i+1}/{total}...")
 
-            # 上传到微信 - 插图使用图文消息图片接口（返回可直接使用的URL）
-            print(f"[图片] 上传插图 {i+1} 到微信（图文图片）...")
-            result = await self._upload_image_to_wechat(img_path, "image", is_article_image=True)
+                # 生成图片；b64_json 没有原始URL，上传失败时留空
+                generated = await self._generate_image(prompt)
+                img_url = generated if isinstance(generated, str) else ""
+
+            # 取得图片字节（缓存字节，或 URL 下载到内存）
+            image = None
+            try:
+                if cached:
+                    image = await optimize_image(cached.to_buffer(filename), ILLUSTRATION)
+                else:
+                    image = await self._load_image(generated, filename)
+                    image = await optimize_image(image, ILLUSTRATION)
+                    cache_key = await self._cache_image(prompt, image)
+
+                # 上传到微信 - 插图使用图文消息图片接口（返回可直接使用的URL）
+                print(f"[图片] 上传插图 {i+1} 到微信（图文图片）...")
+                result = await self._upload_image_to_wechat(image, "image", is_article_image=True)
+            except Exception as e:
+                result = {"errcode": -1, "errmsg": str(e)}
+            finally:
+                if image is not None:
+                    self._release(image, i, keep_images)
 
             # 获取CDN URL - 图文图片接口会返回 url 字段
             if "url" in result:
                 cdn_url = result["url"]
                 print(f"   插图 {i+1} 上传成功，URL: {cdn_url[:50]}...")
+                await asyncio.to_thread(get_image_cache().set_assets, cache_key, cdn_url=cdn_url)
             elif "errcode" in result:
                 errcode = result.get('errcode')
                 errmsg = result.get('errmsg', '未知错误')
@@ -181,106 +337,140 @@ class ArticleOrchestrator:
                 cdn_url = img_url
                 print(f"   [WARN] 插图 {i+1} 返回异常，使用原始URL")
 
-            cdn_urls.append(cdn_url)
+            return cdn_url
 
-        return thumb_media_id, cdn_urls
+    async def _load_image(self, generated: Union[str, ImageBuffer], filename: str) -> ImageBuffer:
+        """取得生成图片的字节：URL 流式下载；b64_json 已在解析阶段解码，跳过下载"""
+        if isinstance(generated, ImageBuffer):
+            generated.name = filename
+            print(f"   [图片] 已解码 b64_json：{generated.describe()}")
+            return generated
+        image = await self._download_image(generated, filename)
+        print(f"   [图片] 已下载：{image.describe()}")
+        return image
 
-    async def _generate_image(self, prompt: str) -> str:
-        """调用LLM API生成图片
+    async def _generate_image(self, prompt: str) -> Union[str, ImageBuffer]:
+        """调用LLM API生成图片，返回图片 URL，或 b64_json 解码后的缓冲
 
-        优先使用 httpx，失败则使用 aiohttp 作为备用
+        请求前按模型限流排队，并发上限按 AIMD 自适应；
+        429 / 5xx / 超时 / 错误载荷按退避策略重试，接口持续故障时熔断
         """
         api_key = self.settings.get("CHERRY_API_KEY")
-        # 使用图片生成专用 API 地址
-        base_url = self.settings.get("IMAGE_GEN_BASE_URL", "https://open.cherryin.ai/v1/images/generations")
+        # 使用图片生成专用 API 地址（已经是完整URL）
+        url = self.settings.get("IMAGE_GEN_BASE_URL", "https://open.cherryin.ai/v1/images/generations")
         model = self.settings.get("IMAGE_GEN_MODEL", "qwen/qwen-image(free)")
+        headers = {"Authorization": f"Bearer {api_key}"}
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "n": 1,
+            "size": IMAGE_SIZE
+        }
 
-        # 直接使用 base_url（已经是完整URL）
-        api_urls = [base_url]
-
-        last_error = None
-        for url in api_urls:
-            # 方法1: 尝试使用 httpx
-            try:
-                async with httpx.AsyncClient(timeout=120.0) as client:
-                    resp = await client.post(
-                        url,
-                        headers={"Authorization": f"Bearer {api_key}"},
-                        json={
-                            "model": model,
-                            "prompt": prompt,
-                            "n": 1,
-                            "size": "1024x1024"
-                        }
-                    )
-                    print(f"  [DEBUG] httpx 响应状态: {resp.status_code}")
-                    data = resp.json()
-                    print(f"  [DEBUG] httpx 响应: {data}")
-                    # 兼容不同返回格式
-                    if "data" in data and len(data["data"]) > 0:
-                        return data["data"][0].get("url", "") or data["data"][0].get("b64_json", "")
-                    elif "url" in data:
-                        return data["url"]
-                    elif "image_url" in data:
-                        return data["image_url"]
-                    elif "error" in data:
-                        last_error = data["error"]
-                        print(f"  [INFO] API返回错误: {data['error']}")
-            except Exception as e:
-                last_error = e
-                print(f"  [INFO] {url} 失败: {e}")
-                continue
+        limiter = get_rate_limiter(model)
+        concurrency = get_adaptive_limiter(f"image:{model}")
 
-            # 方法2: 使用 aiohttp 作为备用
+        async def request():
+            await limiter.acquire()
             try:
-                import aiohttp
-                async with aiohttp.ClientSession() as session:
-                    async with session.post(
-                        url,
-                        headers={"Authorization": f"Bearer {api_key}"},
-                        json={
-                            "model": model,
-                            "prompt": prompt,
-                            "n": 1,
-                            "size": "1024x1024"
-                        },
-                        timeout=aiohttp.ClientTimeout(total=120)
-                    ) as resp:
-                        data = await resp.json()
-                        print(f"  [DEBUG] aiohttp 响应: {data}")
-                        if "data" in data and len(data["data"]) > 0:
-                            return data["data"][0].get("url", "") or data["data"][0].get("b64_json", "")
-                        elif "url" in data:
-                            return data["url"]
+                # 并发上限随接口表现自动调整 (AIMD)
+                async with concurrency.slot():
+                    status, data = await self._post_image_request(url, headers, payload)
+                    return self._parse_image_response(status, data)
             except Exception as e:
-                last_error = e
-                continue
+                limiter.observe(e)
+                raise
 
-        raise Exception(f"图片生成失败: {last_error}")
+        try:
+            return await call_with_retry(url, request, model=model)
+        except Exception as e:
+            raise Exception(f"图片生成失败: {e}")
+
+    @staticmethod
+    def _parse_image_response(status: int, data: dict) -> Union[str, ImageBuffer]:
+        """从响应中取出图片 URL，b64_json 直接解码为缓冲；错误载荷视为可重试的过载信号"""
+        # 兼容不同返回格式
+        if "data" in data and len(data["data"]) > 0:
+            item = data["data"][0]
+            if item.get("url"):
+                return item["url"]
+            if item.get("b64_json"):
+                return ImageBuffer.from_base64(item["b64_json"])
+            raise Exception(f"无法识别的响应: {_describe_response(data)}")
+        elif "url" in data:
+            return data["url"]
+        elif "image_url" in data:
+            return data["image_url"]
+        elif "error" in data:
+            summary = _describe_response(data)
+            print(f"  [INFO] API返回错误: {summary}")
+            if status < 400 or status in RETRYABLE_STATUS:
+                raise RetryableError(f"API返回错误: {summary}", status=status)
+            raise Exception(f"API返回错误: {summary}")
+        raise Exception(f"无法识别的响应: {_describe_response(data)}")
+
+    async def _post_image_request(self, url: str, headers: dict, payload: dict):
+        """发送一次图片生成请求，返回 (状态码, 响应 JSON)
+
+        优先使用 httpx，建立连接失败时改用 aiohttp；超时等其他错误直接抛出，
+        不在同一次尝试里重发（请求可能已在服务端生成图片）。可重试的状态码直接抛出，由调用方退避重试
+        """
+        # 方法1: 尝试使用 httpx
+        try:
+            async with httpx.AsyncClient(timeout=120.0) as client:
+                resp = await client.post(url, headers=headers, json=payload)
+        except httpx.ConnectError as e:
+            print(f"  [INFO] httpx 连接失败，尝试 aiohttp: {e}")
+        else:
+            if resp.status_code in RETRYABLE_STATUS:
+                resp.raise_for_status()
+            data = resp.json()
+            print(f"  [DEBUG] httpx 响应: {_describe_response(data)}")
+            return resp.status_code, data
 
-    async def _download_image(self, url: str, path: str):
-        """下载图片到本地
+        # 方法2: 使用 aiohttp 作为备用
+        import aiohttp
+        async with aiohttp.ClientSession() as session:
+            async with session.post(
+                url,
+                headers=headers,
+                json=payload,
+                timeout=aiohttp.ClientTimeout(total=120)
+            ) as resp:
+                if resp.status in RETRYABLE_STATUS:
+                    resp.raise_for_status()
+                data = await resp.json(content_type=None)
+                print(f"  [DEBUG] aiohttp 响应: {_describe_response(data)}")
+                return resp.status, data
+
+    async def _download_image(self, url: str, filename: str) -> ImageBuffer:
+        """下载图片到内存缓冲（超过 IMAGE_SPOOL_MAX_MB 时转存临时文件）
 
         优先使用 httpx，失败则使用 aiohttp 作为备用
         """
         # 方法1: 尝试使用 httpx
+        image = ImageBuffer(filename)
         try:
             async with httpx.AsyncClient(timeout=60.0) as client:
-                resp = await client.get(url)
-                resp.raise_for_status()
-                with open(path, 'wb') as f:
-                    f.write(resp.content)
-                return
+                async with client.stream("GET", url) as resp:
+                    resp.raise_for_status()
+                    async for chunk in resp.aiter_bytes():
+                        image.write(chunk)
+                return image
         except Exception as e:
+            image.close()
             print(f"  [INFO] httpx 下载失败，尝试 aiohttp: {e}")
 
         # 方法2: 使用 aiohttp 作为备用
+        image = ImageBuffer(filename)
         try:
             import aiohttp
             async with aiohttp.ClientSession() as session:
                 async with session.get(url, timeout=aiohttp.ClientTimeout(total=60)) as resp:
-                    data = await resp.read()
-                    with open(path, 'wb') as f:
-                        f.write(data)
+                    resp.raise_for_status()
+                    async for chunk in resp.content.iter_chunked(64 * 1024):
+                        image.write(chunk)
+            return image
         except Exception as e:
+            image.close()
             raise Exception(f"图片下载失败: {e}")
@@ -0,0 +1,149 @@
+"""
+文章流式监听器
+
+边接收写作模型的 token 增量边解析 Markdown，
+下游阶段可以订阅以下事件，无需等待整篇文章生成完毕：
+
+- on_placeholder(index)          检测到 [IMAGE_PLACEHOLDER_n]
+- on_section(title, body)        一个 H2 小节写完（遇到下一个 H2 或结束）
+- on_paragraphs(paragraphs)      前 N 个正文段落已完成（只触发一次）
+
+使用方式：
+    watcher = ArticleStreamWatcher(first_paragraphs=3)
+    watcher.on_placeholder(lambda i: print(f"占位符 {i}"))
+    article = await watcher.consume(get_llm_client().stream_chat(...))
+"""
+
+import asyncio
+import re
+from typing import AsyncIterable, Callable, List, Optional
+
+PLACEHOLDER_PATTERN = re.compile(r'\[IMAGE_PLACEHOLDER_(\d+)\]')
+H2_PATTERN = re.compile(r'^##\s+(.+?)\s*#*\s*$')
+
+
+class ArticleStreamWatcher:
+    """增量解析文章并分发事件"""
+
+    def __init__(self, first_paragraphs: int = 3):
+        self.first_paragraphs = first_paragraphs
+
+        self._placeholder_handlers: List[Callable] = []
+        self._section_handlers: List[Callable] = []
+        self._paragraph_handlers: List[Callable] = []
+
+        self._parts: List[str] = []
+        self._pending_line = ""
+        self._seen_placeholders = set()
+        self._section_title: Optional[str] = None
+        self._section_lines: List[str] = []
+        self._paragraph_lines: List[str] = []
+        self._paragraphs: List[str] = []
+        self._paragraphs_fired = False
+        self._closed = False
+
+    # ======== 订阅 ========
+
+    def on_placeholder(self, handler: Callable):
+        self._placeholder_handlers.append(handler)
+        return handler
+
+    def on_section(self, handler: Callable):
+        self._section_handlers.append(handler)
+        return handler
+
+    def on_paragraphs(self, handler: Callable):
+        self._paragraph_handlers.append(handler)
+        return handler
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    @property
+    def placeholders(self) -> List[int]:
+        return sorted(self._seen_placeholders)
+
+    # ======== 输入 ========
+
+    async def feed(self, delta: str):
+        """输入一段 token 增量"""
+        self._parts.append(delta)
+        self._pending_line += delta
+        while "\n" in self._pending_line:
+            line, self._pending_line = self._pending_line.split("\n", 1)
+            await self._handle_line(line)
+
+    async def close(self):
+        """输入结束，刷新未完成的行、段落和小节"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._pending_line:
+            line, self._pending_line = self._pending_line, ""
+            await self._handle_line(line)
+        await self._finish_paragraph()
+        await self._finish_section()
+        # 文章不足 N 段时仍通知订阅者
+        if not self._paragraphs_fired and self._paragraphs:
+            await self._fire_paragraphs()
+
+    async def consume(self, stream: AsyncIterable[str]) -> str:
+        """消费整个增量流，返回完整文本"""
+        async for delta in stream:
+            await self.feed(delta)
+        await self.close()
+        return self.text
+
+    # ======== 内部 ========
+
+    async def _emit(self, handlers: List[Callable], *args):
+        for handler in handlers:
+            result = handler(*args)
+            if asyncio.iscoroutine(result):
+                await result
+
+    async def _handle_line(self, line: str):
+        for match in PLACEHOLDER_PATTERN.finditer(line):
+            index = int(match.group(1))
+            if index not in self._seen_placeholders:
+                self._seen_placeholders.add(index)
+                await self._emit(self._placeholder_handlers, index)
+
+        stripped = line.strip()
+        heading = H2_PATTERN.match(stripped)
+        if heading:
+            await self._finish_paragraph()
+            await self._finish_section()
+            self._section_title = heading.group(1)
+            return
+
+        self._section_lines.append(line)
+
+        if not stripped or stripped.startswith("#"):
+            await self._finish_paragraph()
+            return
+        if PLACEHOLDER_PATTERN.sub("", stripped).strip():
+            self._paragraph_lines.append(stripped)
+
+    async def _finish_paragraph(self):
+        if not self._paragraph_lines:
+            return
+        self._paragraphs.append("\n".join(self._paragraph_lines))
+        self._paragraph_lines = []
+        if not self._paragraphs_fired and len(self._paragraphs) >= self.first_paragraphs:
+            await self._fire_paragraphs()
+
+    async def _fire_paragraphs(self):
+        self._paragraphs_fired = True
+        await self._emit(self._paragraph_handlers, list(self._paragraphs[:self.first_paragraphs]))
+
+    async def _finish_section(self):
+        if self._section_title is None:
+            self._section_lines = []
+            return
+        body = "\n".join(self._section_lines).strip()
+        title = self._section_title
+        self._section_title = None
+        self._section_lines = []
+        await self._emit(self._section_handlers, title, body)
@@ -0,0 +1,111 @@
+"""
+分块并行排版 - LAYOUT_MODE=llm 时按二级标题切分文章，各块同时交给排版模型
+
+整篇文章一次排版容易耗时数分钟，或在 max_tokens 处被悄悄截断。这里：
+
+- 按 H2 边界切分 Markdown，过短的块并入前一块
+- 各块使用同一份风格提示词并发排版，结果按原顺序拼接
+- 每块单独重试：输出为空或不完整（未以标签结尾）时只重做这一块，
+  次数用完后该块改用本地渲染，不影响其他块
+
+配置 (config/setting.txt)：
+    LAYOUT_CHUNK_MAX_TOKENS=4000   # 每块的输出上限
+    LAYOUT_CHUNK_ATTEMPTS=2        # 每块最多尝试次数
+    LAYOUT_CHUNK_MIN_CHARS=300     # 短于此字数的块并入前一块
+
+使用方式：
+    from src.chunked_layout import layout_in_chunks
+
+    html = await layout_in_chunks(base_url, api_key, Config.LAYOUT_MODEL, style_prompt, markdown,
+                                  build_user=lambda chunk: f"请转换：\n{chunk}", style="default")
+"""
+
+import asyncio
+import re
+from typing import Callable, List, Optional
+
+from .config import Config
+from .model_router import get_model_router
+
+H2_LINE = re.compile(r'^##\s+', re.MULTILINE)
+
+CHUNK_NOTE = """
+【分块说明】这是全文第 {index} / {total} 部分，其余部分会单独排版后拼接。
+只输出这一部分的 HTML 片段，不要输出 <html>、<head>、<body> 等外层标签，样式保持与整篇一致。"""
+
+RETRY_NOTE = "\n【注意】上一次输出不完整，请完整输出这一部分的全部内容。"
+
+
+def split_on_h2(markdown: str, min_chars: Optional[int] = None) -> List[str]:
+    """按二级标题切分 Markdown；开头部分单独成块，短于 min_chars 的块并入前一块"""
+    min_chars = Config.LAYOUT_CHUNK_MIN_CHARS if min_chars is None else min_chars
+    starts = [m.start() for m in H2_LINE.finditer(markdown)]
+    bounds = [0] + [s for s in starts if s > 0] + [len(markdown)]
+    pieces = [markdown[a:b].strip() for a, b in zip(bounds, bounds[1:])]
+
+    chunks: List[str] = []
+    for piece in pieces:
+        if not piece:
+            continue
+        if chunks and len(chunks[-1]) < min_chars:
+            chunks[-1] = f"{chunks[-1]}\n\n{piece}"
+        elif chunks and len(piece) < min_chars:
+            chunks[-1] = f"{chunks[-1]}\n\n{piece}"
+        else:
+            chunks.append(piece)
+    return chunks
+
+
+def extract_html(text: str) -> str:
+    """取出 ```html 代码块中的内容（没有代码块时原样返回）"""
+    if "```html" in text:
+        text = text.split("```html")[1].split("```")[0]
+    return text.strip()
+
+
+def is_complete(html: str) -> bool:
+    """粗略判断排版结果是否完整：非空且以标签结尾"""
+    return bool(html) and "<" in html and html.rstrip().endswith(">")
+
+
+async def layout_in_chunks(base_url: str, api_key: str, model: str, system_prompt: str, markdown: str,
+                           build_user: Callable[[str], str], style: str = "default",
+                           attempts: Optional[int] = None) -> str:
+    """分块并发排版，返回拼接后的 HTML
+
+    Args:
+        system_prompt: 风格提示词（load_style_template / pattern_*.md）
+        build_user: 由一块 Markdown 生成用户提示词（与整篇排版时相同的要求）
+        style: 某块重试用尽时本地渲染使用的风格
+    """
+    attempts = attempts or Config.LAYOUT_CHUNK_ATTEMPTS
+    chunks = split_on_h2(markdown)
+    total = len(chunks)
+    router = get_model_router()
+    if total > 1:
+        print(f"   [排版] 按小节分为 {total} 块并行排版")
+
+    async def layout_chunk(index: int, chunk: str) -> str:
+        user = build_user(chunk)
+        if total > 1:
+            user += CHUNK_NOTE.format(index=index + 1, total=total)
+        for attempt in range(1, attempts + 1):
+            try:
+                text = await router.chat(base_url, api_key, model, system_prompt,
+                                         user + (RETRY_NOTE if attempt > 1 else ""),
+                                         max_tokens=Config.LAYOUT_CHUNK_MAX_TOKENS, stage="layout")
+            except Exception as e:
+                reason = str(e) or type(e).__name__
+            else:
+                html = extract_html(text)
+                if is_complete(html):
+                    return html
+                reason = "输出不完整"
+            print(f"   [排版] 第 {index + 1} 块第 {attempt} 次排版失败（{reason}）")
+
+        from .html_renderer import render_markdown
+        print(f"   [排版] 第 {index + 1} 块改用本地渲染")
+        return render_markdown(chunk, style=style)
+
+    parts = await asyncio.gather(*(layout_chunk(i, chunk) for i, chunk in enumerate(chunks)))
+    return "\n".join(parts)
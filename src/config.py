@@ -118,16 +118,122 @@ class Config:
     # ======== 模型配置 ========
     WRITER_MODEL: str = "anthropic/claude-opus-4.5"
     LAYOUT_MODEL: str = "google/gemini-3-flash-preview"
+    # 排版方式：local 按风格文件本地渲染，llm 交给 LAYOUT_MODEL 排版
+    LAYOUT_MODE: str = "local"
+    # LLM 排版按二级标题分块并行：每块的输出上限、最多尝试次数、最小块长度
+    LAYOUT_CHUNK_MAX_TOKENS: int = 4000
+    LAYOUT_CHUNK_ATTEMPTS: int = 2
+    LAYOUT_CHUNK_MIN_CHARS: int = 300
+    # 写作方式：single 整篇一次生成，sections 先生成大纲再并行写各小节，
+    # structured 一次返回正文、摘要和配图提示词 (JSON)
+    WRITER_MODE: str = "single"
+    # 分节写作的大纲模型，留空使用 WRITER_MODEL
+    WRITER_OUTLINE_MODEL: str = ""
+    WRITER_SECTION_MAX_TOKENS: int = 2000
+    # 摘要方式：llm 全文交给摘要模型，local 本地 TextRank 抽取，polish 只把抽取的关键句交给模型润色
+    DIGEST_MODE: str = "llm"
     IMAGE_GEN_MODEL: str = "qwen/qwen-image(free)"
 
     # ======== 图片生成单独配置 ========
     # 图片生成可能使用不同的 API 地址
     IMAGE_GEN_BASE_URL: str = "https://open.cherryin.ai/v1/images/generations"
+    # 单篇文章同时处理的图片数，也是生成接口自适应并发的初始值
+    IMAGE_CONCURRENCY: int = 4
+    # 生成接口并发上限的自适应范围 (AIMD)：延迟目标内成功则加，429/超时/错误则乘以 DECREASE
+    IMAGE_CONCURRENCY_MIN: int = 1
+    IMAGE_CONCURRENCY_MAX: int = 8
+    IMAGE_LATENCY_TARGET: float = 90.0
+    IMAGE_AIMD_DECREASE: float = 0.5
+    # 图片在内存中缓冲的上限（MB），更大的图片转存临时文件
+    IMAGE_SPOOL_MAX_MB: float = 8
+    # 图片缓存：相同 (模型, 提示词, 尺寸) 复用已生成并上传的图片
+    # never 不缓存（默认）；数字 N 表示每张图最多复用 N 次；always 一直复用
+    IMAGE_CACHE_REUSE: str = "never"
+    IMAGE_CACHE_PATH: Path = BASE_DIR / "image_cache.db"
+    IMAGE_CACHE_MAX_MB: float = 500.0
+    # 上传前本地裁剪、缩放、压缩为渐进式 JPEG（需安装 Pillow，未安装时原样上传）
+    IMAGE_OPTIMIZE: bool = True
+    IMAGE_COVER_WIDTH: int = 900
+    IMAGE_OPTIMIZE_WIDTH: int = 1080
+    IMAGE_JPEG_QUALITY: int = 85
 
     # ======== 超时和限制配置 ========
     HTTP_TIMEOUT: int = 60
     API_MAX_TOKENS: int = 8000
 
+    # ======== 微信 access_token 缓存 ========
+    # 剩余有效期低于该秒数时提前刷新
+    WECHAT_TOKEN_REFRESH_MARGIN: int = 300
+    WECHAT_TOKEN_CACHE: Path = BASE_DIR / "wechat_token_cache.db"
+    # 相同字节的图片不重复上传：按内容哈希登记微信返回的 media_id / url
+    WECHAT_UPLOAD_DEDUP: bool = True
+    WECHAT_UPLOAD_REGISTRY: Path = BASE_DIR / "wechat_uploads.db"
+
+    # ======== LLM 连接池配置 ========
+    LLM_TIMEOUT: float = 600.0
+    LLM_MAX_CONNECTIONS: int = 20
+    LLM_MAX_KEEPALIVE: int = 10
+    LLM_KEEPALIVE_EXPIRY: float = 120.0
+    LLM_HTTP2: bool = False
+    # 写作阶段使用流式输出 (SSE)
+    LLM_STREAM: bool = True
+    # 输出被截断 (finish_reason=length) 时最多续写的轮数，0 表示不续写
+    LLM_CONTINUATION_ROUNDS: int = 2
+
+    # ======== 模型回退链 ========
+    # WRITER_MODEL / LAYOUT_MODEL 可写为 "模型@超时秒数, 备用模型@超时秒数"
+    MODEL_STATS_PATH: Path = BASE_DIR / "model_stats.db"
+    # 每个 (模型, 阶段) 保留的延迟样本数
+    MODEL_STATS_WINDOW: int = 50
+    # 截止时间 = min(配置超时, p95 × 系数)，不低于 MODEL_DEADLINE_MIN；系数为 0 时只用配置超时
+    MODEL_DEADLINE_P95_FACTOR: float = 2.0
+    MODEL_DEADLINE_MIN: float = 30.0
+    # 对冲请求：列出的阶段超过 p95 仍未返回时，向备用模型（或同一模型）再发一次，先返回者胜出
+    LLM_HEDGE_STAGES: str = ""
+    # 样本不足时使用的对冲等待秒数
+    LLM_HEDGE_DELAY: float = 10.0
+    # 每天最多发出的对冲请求数
+    LLM_HEDGE_DAILY_MAX: int = 50
+
+    # ======== 重试 / 熔断 ========
+    # 429、5xx、超时等可重试错误的最大尝试次数（含首次）
+    RETRY_MAX_ATTEMPTS: int = 4
+    # 指数退避基数和上限（秒），实际等待时间在 [0, 上限] 内随机
+    RETRY_BASE_DELAY: float = 1.0
+    RETRY_MAX_DELAY: float = 30.0
+    # 服务端 Retry-After 的最大等待时间（秒）
+    RETRY_AFTER_MAX: float = 120.0
+    # 同一接口连续失败次数达到阈值后熔断，冷却时间（秒）内直接失败
+    CIRCUIT_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_RESET_SECONDS: float = 60.0
+
+    # ======== 按模型限流 ========
+    # 未单独配置的模型每分钟请求数 / token 数上限，0 表示不限
+    RATE_LIMIT_RPM: float = 0
+    RATE_LIMIT_TPM: float = 0
+    # 单独配置：模型=RPM/TPM，多个模型用分号分隔
+    MODEL_RATE_LIMITS: str = ""
+
+    # ======== LLM 响应缓存 ========
+    # 相同请求直接返回缓存结果；--no-cache 或 LLM_CACHE=false 跳过
+    LLM_CACHE: bool = True
+    LLM_CACHE_PATH: Path = BASE_DIR / "llm_cache.db"
+    LLM_CACHE_MAX_MB: float = 200.0
+    # 各阶段缓存有效期（小时），0 表示不缓存
+    LLM_CACHE_TTL_WRITER: float = 24.0
+    LLM_CACHE_TTL_DIGEST: float = 168.0
+    LLM_CACHE_TTL_LAYOUT: float = 168.0
+    LLM_CACHE_TTL_DEFAULT: float = 24.0
+
+    # ======== 批量写作 ========
+    # execute_test_run.py --batch 同时处理的计划数
+    BATCH_CONCURRENCY: int = 2
+
+    # ======== 断点续写 / 计划租约 ========
+    # 领取计划后持有的租约时长（分钟），每完成一个阶段自动续租；
+    # 租约过期的 writing 计划视为中断，可被任意工作进程领取续写
+    PLAN_LEASE_MINUTES: int = 30
+
     # ======== 日志配置 ========
     LOG_LEVEL: str = "INFO"
 
@@ -137,6 +243,16 @@ class Config:
     UPLOAD_DIR: Path = BASE_DIR / "images"
     CONFIG_DIR: Path = BASE_DIR / "config"
 
+    # 命令行参数等运行时覆盖，reload() 后仍然生效
+    _overrides: Dict[str, object] = {}
+
+    @classmethod
+    def override(cls, **values):
+        """覆盖配置项（如 --no-cache、--layout），不受之后的 reload() 影响"""
+        cls._overrides.update(values)
+        for key, value in values.items():
+            setattr(cls, key, value)
+
     @classmethod
     def reload(cls):
         """重新加载配置"""
@@ -149,12 +265,71 @@ class Config:
         cls.CHERRY_API_KEY = get_config_value("CHERRY_API_KEY", "")
         cls.WRITER_MODEL = get_config_value("WRITER_MODEL", "anthropic/claude-opus-4.5")
         cls.LAYOUT_MODEL = get_config_value("LAYOUT_MODEL", "google/gemini-3-flash-preview")
+        cls.LAYOUT_MODE = get_config_value("LAYOUT_MODE", "local").lower()
+        cls.LAYOUT_CHUNK_MAX_TOKENS = int(get_config_value("LAYOUT_CHUNK_MAX_TOKENS", "4000"))
+        cls.LAYOUT_CHUNK_ATTEMPTS = int(get_config_value("LAYOUT_CHUNK_ATTEMPTS", "2"))
+        cls.LAYOUT_CHUNK_MIN_CHARS = int(get_config_value("LAYOUT_CHUNK_MIN_CHARS", "300"))
+        cls.WRITER_MODE = get_config_value("WRITER_MODE", "single").lower()
+        cls.WRITER_OUTLINE_MODEL = get_config_value("WRITER_OUTLINE_MODEL", "")
+        cls.WRITER_SECTION_MAX_TOKENS = int(get_config_value("WRITER_SECTION_MAX_TOKENS", "2000"))
+        cls.DIGEST_MODE = get_config_value("DIGEST_MODE", "llm").lower()
         cls.IMAGE_GEN_MODEL = get_config_value("IMAGE_GEN_MODEL", "qwen/qwen-image(free)")
         # 图片生成使用独立的 API 地址
         cls.IMAGE_GEN_BASE_URL = get_config_value("IMAGE_GEN_BASE_URL", "https://open.cherryin.ai/v1/images/generations")
+        cls.IMAGE_CONCURRENCY = int(get_config_value("IMAGE_CONCURRENCY", "4"))
+        cls.IMAGE_CONCURRENCY_MIN = int(get_config_value("IMAGE_CONCURRENCY_MIN", "1"))
+        cls.IMAGE_CONCURRENCY_MAX = int(get_config_value("IMAGE_CONCURRENCY_MAX", "8"))
+        cls.IMAGE_LATENCY_TARGET = float(get_config_value("IMAGE_LATENCY_TARGET", "90"))
+        cls.IMAGE_AIMD_DECREASE = float(get_config_value("IMAGE_AIMD_DECREASE", "0.5"))
+        cls.IMAGE_SPOOL_MAX_MB = float(get_config_value("IMAGE_SPOOL_MAX_MB", "8"))
+        cls.IMAGE_CACHE_REUSE = get_config_value("IMAGE_CACHE_REUSE", "never")
+        cls.IMAGE_CACHE_PATH = Path(get_config_value("IMAGE_CACHE_PATH", str(BASE_DIR / "image_cache.db")))
+        cls.IMAGE_CACHE_MAX_MB = float(get_config_value("IMAGE_CACHE_MAX_MB", "500"))
+        cls.IMAGE_OPTIMIZE = get_config_value("IMAGE_OPTIMIZE", "true").lower() in ("1", "true", "yes", "on")
+        cls.IMAGE_COVER_WIDTH = int(get_config_value("IMAGE_COVER_WIDTH", "900"))
+        cls.IMAGE_OPTIMIZE_WIDTH = int(get_config_value("IMAGE_OPTIMIZE_WIDTH", "1080"))
+        cls.IMAGE_JPEG_QUALITY = int(get_config_value("IMAGE_JPEG_QUALITY", "85"))
         cls.HTTP_TIMEOUT = int(get_config_value("HTTP_TIMEOUT", "60"))
         cls.API_MAX_TOKENS = int(get_config_value("API_MAX_TOKENS", "8000"))
+        cls.WECHAT_TOKEN_REFRESH_MARGIN = int(get_config_value("WECHAT_TOKEN_REFRESH_MARGIN", "300"))
+        cls.WECHAT_TOKEN_CACHE = Path(get_config_value("WECHAT_TOKEN_CACHE", str(BASE_DIR / "wechat_token_cache.db")))
+        cls.WECHAT_UPLOAD_DEDUP = get_config_value("WECHAT_UPLOAD_DEDUP", "true").lower() in ("1", "true", "yes", "on")
+        cls.WECHAT_UPLOAD_REGISTRY = Path(get_config_value("WECHAT_UPLOAD_REGISTRY", str(BASE_DIR / "wechat_uploads.db")))
+        cls.LLM_TIMEOUT = float(get_config_value("LLM_TIMEOUT", "600"))
+        cls.LLM_MAX_CONNECTIONS = int(get_config_value("LLM_MAX_CONNECTIONS", "20"))
+        cls.LLM_MAX_KEEPALIVE = int(get_config_value("LLM_MAX_KEEPALIVE", "10"))
+        cls.LLM_KEEPALIVE_EXPIRY = float(get_config_value("LLM_KEEPALIVE_EXPIRY", "120"))
+        cls.LLM_HTTP2 = get_config_value("LLM_HTTP2", "false").lower() in ("1", "true", "yes", "on")
+        cls.LLM_STREAM = get_config_value("LLM_STREAM", "true").lower() in ("1", "true", "yes", "on")
+        cls.LLM_CONTINUATION_ROUNDS = int(get_config_value("LLM_CONTINUATION_ROUNDS", "2"))
+        cls.MODEL_STATS_PATH = Path(get_config_value("MODEL_STATS_PATH", str(BASE_DIR / "model_stats.db")))
+        cls.MODEL_STATS_WINDOW = int(get_config_value("MODEL_STATS_WINDOW", "50"))
+        cls.MODEL_DEADLINE_P95_FACTOR = float(get_config_value("MODEL_DEADLINE_P95_FACTOR", "2"))
+        cls.MODEL_DEADLINE_MIN = float(get_config_value("MODEL_DEADLINE_MIN", "30"))
+        cls.LLM_HEDGE_STAGES = get_config_value("LLM_HEDGE_STAGES", "")
+        cls.LLM_HEDGE_DELAY = float(get_config_value("LLM_HEDGE_DELAY", "10"))
+        cls.LLM_HEDGE_DAILY_MAX = int(get_config_value("LLM_HEDGE_DAILY_MAX", "50"))
+        cls.RETRY_MAX_ATTEMPTS = int(get_config_value("RETRY_MAX_ATTEMPTS", "4"))
+        cls.RETRY_BASE_DELAY = float(get_config_value("RETRY_BASE_DELAY", "1"))
+        cls.RETRY_MAX_DELAY = float(get_config_value("RETRY_MAX_DELAY", "30"))
+        cls.RETRY_AFTER_MAX = float(get_config_value("RETRY_AFTER_MAX", "120"))
+        cls.CIRCUIT_FAILURE_THRESHOLD = int(get_config_value("CIRCUIT_FAILURE_THRESHOLD", "5"))
+        cls.CIRCUIT_RESET_SECONDS = float(get_config_value("CIRCUIT_RESET_SECONDS", "60"))
+        cls.RATE_LIMIT_RPM = float(get_config_value("RATE_LIMIT_RPM", "0"))
+        cls.RATE_LIMIT_TPM = float(get_config_value("RATE_LIMIT_TPM", "0"))
+        cls.MODEL_RATE_LIMITS = get_config_value("MODEL_RATE_LIMITS", "")
+        cls.LLM_CACHE = get_config_value("LLM_CACHE", "true").lower() in ("1", "true", "yes", "on")
+        cls.LLM_CACHE_PATH = Path(get_config_value("LLM_CACHE_PATH", str(BASE_DIR / "llm_cache.db")))
+        cls.LLM_CACHE_MAX_MB = float(get_config_value("LLM_CACHE_MAX_MB", "200"))
+        cls.LLM_CACHE_TTL_WRITER = float(get_config_value("LLM_CACHE_TTL_WRITER", "24"))
+        cls.LLM_CACHE_TTL_DIGEST = float(get_config_value("LLM_CACHE_TTL_DIGEST", "168"))
+        cls.LLM_CACHE_TTL_LAYOUT = float(get_config_value("LLM_CACHE_TTL_LAYOUT", "168"))
+        cls.LLM_CACHE_TTL_DEFAULT = float(get_config_value("LLM_CACHE_TTL_DEFAULT", "24"))
+        cls.BATCH_CONCURRENCY = int(get_config_value("BATCH_CONCURRENCY", "2"))
+        cls.PLAN_LEASE_MINUTES = int(get_config_value("PLAN_LEASE_MINUTES", "30"))
         cls.LOG_LEVEL = get_config_value("LOG_LEVEL", "INFO")
+        for key, value in cls._overrides.items():
+            setattr(cls, key, value)
 
     @classmethod
     def validate(cls) -> bool:
@@ -1,6 +1,11 @@
 import sqlite3
 import os
+import json
 import shutil
+import socket
+import threading
+import uuid
+from functools import wraps
 from datetime import datetime
 from pathlib import Path
 
@@ -38,12 +43,37 @@ def ensure_db_exists():
             conn.close()
 
 
+def default_lease_owner():
+    """当前工作进程的租约标识：主机名:进程号:随机后缀"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class LeaseLostError(Exception):
+    """计划的租约已被其他工作进程接管，当前进程不得继续写作或发布"""
+
+
+def _serialized(method):
+    """同一连接和游标在线程池中被多个计划共用，逐个执行"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
 class DBManager:
+    # 可领取的计划：待写，或写作中但租约已过期（进程崩溃/中断）
+    CLAIMABLE = """(status = 'planned' OR (status = 'writing' AND
+                   (lease_expires_at IS NULL OR lease_expires_at < datetime('now'))))"""
+
     def __init__(self):
         # 确保数据库存在
         ensure_db_exists()
 
-        self.conn = sqlite3.connect(str(db_path))
+        # 多个工作进程共用同一数据库，写锁冲突时等待而不是立即报错
+        # 批量写作时通过 asyncio.to_thread 在工作线程中访问，由 _lock 串行化
+        self.conn = sqlite3.connect(str(db_path), timeout=30, check_same_thread=False)
+        self._lock = threading.RLock()
         self.cursor = self.conn.cursor()
         self._init_db()
 
@@ -60,6 +90,33 @@ class DBManager:
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
         ''')
+        # 旧数据库迁移：状态变更时间和写作租约（多进程领取计划）
+        columns = [row[1] for row in self.cursor.execute("PRAGMA table_info(article_plans)")]
+        for column in ("updated_at", "lease_owner", "lease_expires_at"):
+            if column not in columns:
+                column_type = "TEXT" if column == "lease_owner" else "TIMESTAMP"
+                self.cursor.execute(f"ALTER TABLE article_plans ADD COLUMN {column} {column_type}")
+
+        # 各阶段产出的检查点，中断后从第一个未完成阶段继续
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS article_runs (
+            plan_id INTEGER PRIMARY KEY,
+            markdown TEXT,
+            digest TEXT,
+            thumb_media_id TEXT,
+            cdn_urls TEXT,
+            final_html TEXT,
+            draft_id TEXT,
+            served_models TEXT,
+            article_meta TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+        # 旧数据库迁移：各阶段实际使用的模型、结构化写作的附带产出
+        columns = [row[1] for row in self.cursor.execute("PRAGMA table_info(article_runs)")]
+        for column in ("served_models", "article_meta"):
+            if column not in columns:
+                self.cursor.execute(f"ALTER TABLE article_runs ADD COLUMN {column} TEXT")
         self.conn.commit()
 
     def save_plans(self, plans_json):
@@ -89,12 +146,154 @@ class DBManager:
         self.cursor.execute("SELECT * FROM article_plans")
         return self.cursor.fetchall()
 
+    @_serialized
+    def get_plan(self, plan_id):
+        self.cursor.execute("SELECT id, topic, target_date, status FROM article_plans WHERE id = ?", (plan_id,))
+        return self.cursor.fetchone()
+
+    def claim_next_plan(self, owner, lease_minutes=30):
+        """原子领取下一个计划（优先续写租约过期的 writing 计划）
+
+        Returns:
+            (id, topic, target_date)，没有可领取的计划时返回 None
+        """
+        return self._claim(owner, lease_minutes)
+
+    def claim_plan(self, plan_id, owner, lease_minutes=30):
+        """原子领取指定计划；计划已发布或租约仍被他人持有时返回 None"""
+        return self._claim(owner, lease_minutes, plan_id)
+
+    @_serialized
+    def _claim(self, owner, lease_minutes, plan_id=None):
+        where = self.CLAIMABLE + (" AND id = ?" if plan_id is not None else "")
+        params = (plan_id,) if plan_id is not None else ()
+        lease = f"+{int(lease_minutes)} minutes"
+
+        # BEGIN IMMEDIATE 立即持有写锁，挑选和更新之间不会被其他进程插入
+        self.conn.commit()
+        self.cursor.execute("BEGIN IMMEDIATE")
+        try:
+            if sqlite3.sqlite_version_info >= (3, 35, 0):
+                self.cursor.execute(f'''
+                UPDATE article_plans
+                SET status = 'writing', lease_owner = ?, lease_expires_at = datetime('now', ?),
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = (SELECT id FROM article_plans WHERE {where}
+                            ORDER BY status = 'writing' DESC, target_date ASC LIMIT 1)
+                RETURNING id, topic, target_date
+                ''', (owner, lease, *params))
+                rows = self.cursor.fetchall()
+            else:
+                # SQLite < 3.35 不支持 RETURNING，在同一写事务内先查后改
+                self.cursor.execute(f'''
+                SELECT id, topic, target_date FROM article_plans WHERE {where}
+                ORDER BY status = 'writing' DESC, target_date ASC LIMIT 1
+                ''', params)
+                rows = self.cursor.fetchall()
+                if rows:
+                    self.cursor.execute('''
+                    UPDATE article_plans
+                    SET status = 'writing', lease_owner = ?, lease_expires_at = datetime('now', ?),
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                    ''', (owner, lease, rows[0][0]))
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return rows[0] if rows else None
+
+    @_serialized
+    def renew_lease(self, plan_id, owner, lease_minutes=30):
+        """续租；租约已被其他进程接管时返回 False"""
+        self.cursor.execute('''
+        UPDATE article_plans SET lease_expires_at = datetime('now', ?), updated_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND lease_owner = ? AND status = 'writing'
+        ''', (f"+{int(lease_minutes)} minutes", plan_id, owner))
+        self.conn.commit()
+        return self.cursor.rowcount > 0
+
     def mark_as_writing(self, topic_id):
-        self.cursor.execute("UPDATE article_plans SET status = 'writing' WHERE id = ?", (topic_id,))
+        self.cursor.execute("UPDATE article_plans SET status = 'writing', updated_at = CURRENT_TIMESTAMP WHERE id = ?", (topic_id,))
+        self.conn.commit()
+
+    @_serialized
+    def mark_as_published(self, topic_id, media_id, owner=None):
+        """标记为已发布；传入 owner 时只有仍持有租约才会更新，返回是否更新成功"""
+        sql = "UPDATE article_plans SET status = 'published', media_id = ?, lease_owner = NULL, lease_expires_at = NULL, updated_at = CURRENT_TIMESTAMP WHERE id = ?"
+        params = (media_id, topic_id)
+        if owner is not None:
+            sql += " AND lease_owner = ?"
+            params += (owner,)
+        self.cursor.execute(sql, params)
         self.conn.commit()
+        return self.cursor.rowcount > 0
 
-    def mark_as_published(self, topic_id, media_id):
-        self.cursor.execute("UPDATE article_plans SET status = 'published', media_id = ? WHERE id = ?", (media_id, topic_id))
+    # 流水线字段 -> article_runs 列
+    CHECKPOINT_COLUMNS = {
+        "markdown": "markdown",
+        "digest": "digest",
+        "thumb_media_id": "thumb_media_id",
+        "cdn_urls": "cdn_urls",
+        "html": "final_html",
+        "draft_id": "draft_id",
+        "article_meta": "article_meta",
+    }
+    # 以 JSON 保存的字段
+    JSON_CHECKPOINT_FIELDS = ("cdn_urls", "article_meta")
+
+    @_serialized
+    def get_checkpoint(self, plan_id):
+        """读取检查点，返回已完成的流水线字段（未完成的字段不包含在内）"""
+        columns = list(self.CHECKPOINT_COLUMNS.values())
+        self.cursor.execute(f"SELECT {', '.join(columns)} FROM article_runs WHERE plan_id = ?", (plan_id,))
+        row = self.cursor.fetchone()
+        if not row:
+            return {}
+        checkpoint = {}
+        for key, value in zip(self.CHECKPOINT_COLUMNS, row):
+            if value is None:
+                continue
+            checkpoint[key] = json.loads(value) if key in self.JSON_CHECKPOINT_FIELDS else value
+        return checkpoint
+
+    @_serialized
+    def save_checkpoint(self, plan_id, **fields):
+        """保存阶段产出（字段名与流水线输出一致），同时刷新计划的更新时间"""
+        values = {}
+        for key, value in fields.items():
+            if key not in self.CHECKPOINT_COLUMNS:
+                continue
+            values[self.CHECKPOINT_COLUMNS[key]] = json.dumps(value, ensure_ascii=False) if key in self.JSON_CHECKPOINT_FIELDS else value
+        if not values:
+            return
+        self.cursor.execute("INSERT OR IGNORE INTO article_runs (plan_id) VALUES (?)", (plan_id,))
+        assignments = ", ".join(f"{column} = ?" for column in values)
+        self.cursor.execute(
+            f"UPDATE article_runs SET {assignments}, updated_at = CURRENT_TIMESTAMP WHERE plan_id = ?",
+            (*values.values(), plan_id)
+        )
+        self.cursor.execute("UPDATE article_plans SET updated_at = CURRENT_TIMESTAMP WHERE id = ?", (plan_id,))
+        self.conn.commit()
+
+    @_serialized
+    def get_served_models(self, plan_id):
+        """各阶段实际使用的模型 {阶段: 模型}"""
+        self.cursor.execute("SELECT served_models FROM article_runs WHERE plan_id = ?", (plan_id,))
+        row = self.cursor.fetchone()
+        return json.loads(row[0]) if row and row[0] else {}
+
+    @_serialized
+    def save_served_models(self, plan_id, models):
+        """合并保存各阶段实际使用的模型（续写时保留之前阶段的记录）"""
+        if not models:
+            return
+        merged = {**self.get_served_models(plan_id), **models}
+        self.cursor.execute("INSERT OR IGNORE INTO article_runs (plan_id) VALUES (?)", (plan_id,))
+        self.cursor.execute(
+            "UPDATE article_runs SET served_models = ? WHERE plan_id = ?",
+            (json.dumps(merged, ensure_ascii=False), plan_id)
+        )
         self.conn.commit()
 
     def get_pending_count(self):
@@ -0,0 +1,430 @@
+"""
+本地 Markdown → 微信公众号 HTML 渲染器
+
+排版规范已经写在 prompts/pattern_*.md 里（颜色、字号、行高、金句装饰、图片样式），
+这里把这些规范编译成内联 CSS 规则，再把 Markdown 直接转换成公众号可用的 HTML，
+毫秒级完成，不再依赖 LAYOUT_MODEL，也不会因为输出长度被截断。
+
+使用方式：
+    from src.html_renderer import render_markdown
+
+    html = render_markdown(markdown_text, style="business")
+"""
+
+import html
+import os
+import re
+from typing import Dict, List, Optional
+
+from .style_config import BASE_DIR, BUILTIN_STYLES, get_style_file_path
+
+# 未在风格文件中声明的项使用默认风格 (pattern_editor.md) 的取值
+DEFAULT_SPEC = {
+    "primary": "#007AFF",
+    "secondary": "#6B7280",
+    "text_color": "#333333",
+    "heading_color": "#222222",
+    "font_family": '-apple-system, BlinkMacSystemFont, "PingFang SC", "Helvetica Neue", sans-serif',
+    "font_size": "15px",
+    "line_height": "1.85",
+    "letter_spacing": "1px",
+    "text_align": "justify",
+    "quote_border": "4px",
+    "quote_border_color": None,
+    "quote_background": "#f8f9fa",
+    "quote_radius": "8px",
+    "quote_padding": "16px 20px",
+    "quote_italic": False,
+    "image_radius": "8px",
+    "image_shadow": "0 4px 12px rgba(0,0,0,0.15)",
+    "image_width": "80%",
+    "h2": {"font_size": "18px", "color": None, "border": "4px", "border_color": None},
+    "h3": {"font_size": "16px", "color": None, "border": None, "border_color": None},
+}
+
+HEX_PATTERN = re.compile(r'#[0-9A-Fa-f]{6}\b|#[0-9A-Fa-f]{3}\b')
+SECTION_KEYWORDS = [
+    ("overall", ("整体",)),
+    ("heading", ("标题",)),
+    ("body", ("正文", "段落")),
+    ("quote", ("金句", "引用")),
+    ("image", ("图片",)),
+]
+
+_compiled_cache: Dict[tuple, Dict[str, str]] = {}
+
+
+# ======== 风格编译 ========
+
+def _classify(label: str) -> Optional[str]:
+    for section, keywords in SECTION_KEYWORDS:
+        if any(keyword in label for keyword in keywords):
+            return section
+    return None
+
+
+def _split_sections(text: str) -> Dict[str, List[str]]:
+    """按小标题（### 3. 正文样式）或加粗条目（1. **金句装饰**：...）归类规范行"""
+    sections: Dict[str, List[str]] = {}
+    current = None
+    for raw in text.splitlines():
+        line = raw.strip()
+        if not line:
+            continue
+        if line.startswith("#"):
+            current = _classify(line)
+            continue
+        bold = re.match(r'^(?:\d+\.\s*)?\*\*(.+?)\*\*[：:]?\s*(.*)$', line)
+        if bold:
+            section = _classify(bold.group(1))
+            if section:
+                sections.setdefault(section, []).append(bold.group(2))
+            continue
+        if current:
+            sections.setdefault(current, []).append(line.lstrip("-* ").strip())
+    return sections
+
+
+def _tint(color: str, ratio: float) -> str:
+    """与白色混合得到浅色背景"""
+    value = color.lstrip("#")
+    if len(value) == 3:
+        value = "".join(c * 2 for c in value)
+    r, g, b = (int(value[i:i + 2], 16) for i in (0, 2, 4))
+    r, g, b = (round(c + (255 - c) * ratio) for c in (r, g, b))
+    return f"#{r:02X}{g:02X}{b:02X}"
+
+
+def _is_light(color: str) -> bool:
+    value = color.lstrip("#")
+    if len(value) == 3:
+        value = "".join(c * 2 for c in value)
+    r, g, b = (int(value[i:i + 2], 16) for i in (0, 2, 4))
+    return (0.299 * r + 0.587 * g + 0.114 * b) / 255 > 0.85
+
+
+def _px(pattern: str, text: str) -> Optional[str]:
+    match = re.search(pattern, text)
+    return f"{match.group(1)}px" if match else None
+
+
+def _parse_heading(line: str, spec: dict) -> dict:
+    heading = {}
+    size = _px(r'字号\s*(\d+)\s*px', line)
+    if size:
+        heading["font_size"] = size
+    hex_color = HEX_PATTERN.search(line)
+    border = _px(r'边框\s*(\d+)\s*px', line)
+    if border:
+        heading["border"] = border
+        heading["border_color"] = spec["secondary"] if "灰" in line else spec["primary"]
+    else:
+        heading["border"] = None
+    if hex_color and not border:
+        heading["color"] = hex_color.group(0)
+    elif "灰" in line and not border:
+        heading["color"] = spec["secondary"]
+    elif any(word in line for word in ("文字", "紫色", "粉色", "色，")) and not border:
+        heading["color"] = spec["primary"]
+    return heading
+
+
+def parse_style_spec(text: str) -> dict:
+    """把风格文件中的中文规范解析为样式参数"""
+    spec = {key: (dict(value) if isinstance(value, dict) else value) for key, value in DEFAULT_SPEC.items()}
+    sections = _split_sections(text)
+
+    for line in sections.get("overall", []):
+        if "主色调" in line:
+            colors = HEX_PATTERN.findall(line)
+            if colors:
+                spec["primary"] = colors[0]
+            if len(colors) > 1:
+                spec["secondary"] = colors[1]
+
+    for line in sections.get("heading", []):
+        if "二级标题" in line:
+            spec["h2"].update(_parse_heading(line, spec))
+        elif "三级标题" in line:
+            spec["h3"].update(_parse_heading(line, spec))
+
+    body = "，".join(sections.get("body", []))
+    font = re.search(r'字体[：:]\s*([^，\n]+(?:,\s*[^，\n,]+)*)', body)
+    if font:
+        family = font.group(1).strip()
+        if not family.endswith("serif"):
+            family += ", sans-serif"
+        spec["font_family"] = family
+    spec["font_size"] = _px(r'字号[：:]?\s*(\d+)\s*px', body) or spec["font_size"]
+    line_height = re.search(r'行高[：:]?\s*([\d.]+)', body)
+    if line_height:
+        spec["line_height"] = line_height.group(1)
+    spec["letter_spacing"] = _px(r'字间距[：:]?\s*([\d.]+)\s*px', body) or spec["letter_spacing"]
+    if "两端对齐" in body:
+        spec["text_align"] = "justify"
+    elif "左对齐" in body:
+        spec["text_align"] = "left"
+
+    quote = "，".join(sections.get("quote", []))
+    border = re.search(r'边框\s*(\d+)\s*px\s*(#[0-9A-Fa-f]{3,6})?', quote)
+    if border:
+        spec["quote_border"] = f"{border.group(1)}px"
+        spec["quote_border_color"] = border.group(2)
+    background = re.search(r'背景色?[：:]?\s*[^，#\n]*?(#[0-9A-Fa-f]{3,6}|渐变)', quote)
+    if background:
+        spec["quote_background"] = background.group(1)
+    spec["quote_radius"] = _px(r'圆角\s*(\d+)\s*px', quote) or ("0px" if quote and "圆角" not in quote else spec["quote_radius"])
+    padding = re.search(r'内边距[：:]?\s*((?:\d+px\s*){1,4})', quote)
+    if padding:
+        spec["quote_padding"] = padding.group(1).strip()
+    spec["quote_italic"] = "italic" in quote or "倾斜" in quote
+
+    image = "，".join(sections.get("image", []))
+    spec["image_radius"] = _px(r'圆角\s*(\d+)\s*px', image) or spec["image_radius"]
+    if "无阴影" in image:
+        spec["image_shadow"] = "none"
+    else:
+        shadow = re.search(r'阴影[：:]\s*([^，\n]+)', image)
+        if shadow:
+            spec["image_shadow"] = shadow.group(1).strip()
+    width = re.search(r'(\d+)\s*%\s*宽度|宽度\s*(\d+)\s*%', image)
+    if width:
+        spec["image_width"] = f"{width.group(1) or width.group(2)}%"
+
+    return spec
+
+
+def _css(**rules) -> str:
+    # 内联在 style="..." 中，字体名的双引号改为单引号
+    return "; ".join(
+        f"{key.replace('_', '-')}: {str(value).replace(chr(34), chr(39))}"
+        for key, value in rules.items() if value is not None
+    ) + ";"
+
+
+def compile_spec(spec: dict) -> Dict[str, str]:
+    """样式参数 → 各元素的内联 CSS"""
+    primary = spec["primary"]
+    text_primary = primary if not _is_light(primary) else DEFAULT_SPEC["primary"]
+    quote_color = spec["quote_border_color"] or text_primary
+    if spec["quote_background"] == "渐变":
+        quote_background = f"linear-gradient(135deg, {_tint(primary, 0.9)}, {_tint(spec['secondary'], 0.9)})"
+    else:
+        quote_background = spec["quote_background"]
+
+    def heading_css(level: dict, margin: str) -> str:
+        color = level.get("color") or spec["heading_color"]
+        if _is_light(color):
+            color = text_primary
+        border = level.get("border")
+        return _css(
+            margin=margin,
+            font_size=level["font_size"],
+            font_weight="bold",
+            color=color,
+            line_height="1.5",
+            border_left=f"{border} solid {level.get('border_color') or text_primary}" if border else None,
+            padding_left="10px" if border else None,
+        )
+
+    return {
+        "article": _css(
+            font_family=spec["font_family"],
+            font_size=spec["font_size"],
+            color=spec["text_color"],
+            line_height=spec["line_height"],
+            letter_spacing=spec["letter_spacing"],
+            padding="0 8px",
+        ),
+        "p": _css(margin="0 0 1.2em", text_align=spec["text_align"], line_height=spec["line_height"],
+                  letter_spacing=spec["letter_spacing"]),
+        "h2": heading_css(spec["h2"], "2em 0 1em"),
+        "h3": heading_css(spec["h3"], "1.6em 0 0.8em"),
+        "blockquote": _css(
+            margin="1.5em 0",
+            padding=spec["quote_padding"],
+            border_left=f"{spec['quote_border']} solid {quote_color}",
+            background=quote_background,
+            border_radius=spec["quote_radius"],
+            text_align="left",
+            font_style="italic" if spec["quote_italic"] else None,
+            color="#444444",
+        ),
+        "quote_p": _css(margin="0", line_height=spec["line_height"]),
+        "figure": _css(margin="1.5em 0", text_align="center"),
+        "img": _css(
+            width=spec["image_width"],
+            max_width="100%",
+            border_radius=spec["image_radius"],
+            box_shadow=spec["image_shadow"],
+            display="inline-block",
+        ),
+        "strong": _css(color=text_primary, font_weight="bold"),
+        "em": _css(font_style="italic"),
+        "code": _css(background="#f3f4f6", padding="2px 4px", border_radius="4px", font_size="90%"),
+        "list": _css(margin="0 0 1.2em", padding_left="1.5em"),
+        "li": _css(margin="0.3em 0", line_height=spec["line_height"]),
+        "hr": _css(border="none", border_top="1px solid #e5e7eb", margin="2em 0"),
+    }
+
+
+def compile_style(style: str = "default") -> Dict[str, str]:
+    """编译风格文件（内置或自定义），结果按文件修改时间缓存"""
+    if style in BUILTIN_STYLES:
+        path = str(BASE_DIR / "prompts" / BUILTIN_STYLES[style]["file"])
+    else:
+        path = get_style_file_path(style)
+    mtime = os.path.getmtime(path) if os.path.exists(path) else 0
+    key = (style, path, mtime)
+    if key not in _compiled_cache:
+        text = ""
+        if mtime:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+        _compiled_cache[key] = compile_spec(parse_style_spec(text))
+    return _compiled_cache[key]
+
+
+# ======== Markdown 渲染 ========
+
+IMAGE_MD_PATTERN = re.compile(r'^!\[([^\]]*)\]\((\S+?)\)$')
+BARE_URL_PATTERN = re.compile(r'^https?://\S+$')
+PLACEHOLDER_PATTERN = re.compile(r'\[IMAGE_PLACEHOLDER_\d+\]')
+# 有序列表项："1. " / "1) " 后必须有空白，"1、" 可直接接内容；"3.5亿用户" 这类以小数开头的段落不算
+ORDERED_ITEM = re.compile(r'^\d+(?:[.)]\s+|、\s*)')
+
+
+def _inline(text: str, rules: Dict[str, str]) -> str:
+    """行内格式：加粗、斜体、行内代码、链接（公众号不支持外链，只保留文字）"""
+    text = html.escape(text, quote=False)
+    text = re.sub(r'`([^`]+)`', lambda m: f'<code style="{rules["code"]}">{m.group(1)}</code>', text)
+    text = re.sub(r'\*\*(.+?)\*\*|__(.+?)__',
+                  lambda m: f'<strong style="{rules["strong"]}">{m.group(1) or m.group(2)}</strong>', text)
+    text = re.sub(r'(?<!\*)\*(?![\s*])(.+?)(?<![\s*])\*(?!\*)',
+                  lambda m: f'<em style="{rules["em"]}">{m.group(1)}</em>', text)
+    text = re.sub(r'\[([^\]]+)\]\((?:[^)]+)\)', r'\1', text)
+    return text
+
+
+def _image(url: str, alt: str, rules: Dict[str, str]) -> str:
+    src = html.escape(url, quote=True)
+    return f'<section style="{rules["figure"]}"><img src="{src}" alt="{html.escape(alt, quote=True)}" style="{rules["img"]}"></section>'
+
+
+def render_markdown(markdown: str, style: str = "default", title: Optional[str] = None) -> str:
+    """把 Markdown 渲染为带内联样式的公众号 HTML
+
+    - 与 title 相同的开头标题、开头的一级标题会被去掉（公众号标题单独设置）
+    - 单独一行的图片链接（占位符替换后的 CDN 地址）渲染为图片
+    - 未替换的图片占位符会被丢弃
+    - 图片不会出现在文章开头
+    """
+    rules = compile_style(style)
+    blocks: List[tuple] = []
+    paragraph: List[str] = []
+    quote: List[str] = []
+    items: List[str] = []
+    list_tag = None
+
+    def flush_paragraph():
+        if paragraph:
+            blocks.append(("p", " ".join(paragraph)))
+            paragraph.clear()
+
+    def flush_quote():
+        if quote:
+            blocks.append(("blockquote", list(quote)))
+            quote.clear()
+
+    def flush_list():
+        nonlocal list_tag
+        if items:
+            blocks.append((list_tag, list(items)))
+            items.clear()
+        list_tag = None
+
+    def flush_all():
+        flush_paragraph()
+        flush_quote()
+        flush_list()
+
+    for raw in markdown.replace("\r\n", "\n").split("\n"):
+        line = raw.strip()
+        if line.startswith("```"):
+            continue
+        if PLACEHOLDER_PATTERN.fullmatch(line):
+            flush_all()
+            continue
+        line = PLACEHOLDER_PATTERN.sub("", line).strip() if "[IMAGE_PLACEHOLDER_" in line else line
+        if not line:
+            flush_all()
+            continue
+
+        heading = re.match(r'^(#{1,6})\s+(.+?)\s*#*$', line)
+        image = IMAGE_MD_PATTERN.match(line)
+        if heading:
+            flush_all()
+            blocks.append((f"h{min(len(heading.group(1)), 3)}", heading.group(2)))
+        elif image:
+            flush_all()
+            blocks.append(("img", image.group(2), image.group(1)))
+        elif BARE_URL_PATTERN.match(line):
+            flush_all()
+            blocks.append(("img", line, ""))
+        elif line.startswith(">"):
+            flush_paragraph()
+            flush_list()
+            content = line.lstrip(">").strip()
+            if content:
+                quote.append(content)
+        elif re.match(r'^(-{3,}|\*{3,}|_{3,})$', line):
+            flush_all()
+            blocks.append(("hr",))
+        elif re.match(r'^[-*+]\s+', line) or ORDERED_ITEM.match(line):
+            flush_paragraph()
+            flush_quote()
+            tag = "ul" if re.match(r'^[-*+]\s+', line) else "ol"
+            if list_tag and list_tag != tag:
+                flush_list()
+            list_tag = tag
+            pattern = r'^[-*+]\s+' if tag == "ul" else ORDERED_ITEM
+            items.append(re.sub(pattern, '', line, count=1))
+        else:
+            flush_quote()
+            flush_list()
+            paragraph.append(line)
+    flush_all()
+
+    # 去掉文章标题（公众号标题字段单独设置）
+    if blocks and blocks[0][0] in ("h1", "h2") and (blocks[0][0] == "h1" or (title and blocks[0][1].strip() == title.strip())):
+        blocks.pop(0)
+
+    # 禁止图片放在文章开头：移到第一段正文之后
+    leading = []
+    while blocks and blocks[0][0] == "img":
+        leading.append(blocks.pop(0))
+    if leading:
+        insert_at = next((i + 1 for i, block in enumerate(blocks) if block[0] == "p"), len(blocks))
+        blocks[insert_at:insert_at] = leading
+
+    parts = []
+    for block in blocks:
+        kind = block[0]
+        if kind == "p":
+            parts.append(f'<p style="{rules["p"]}">{_inline(block[1], rules)}</p>')
+        elif kind in ("h1", "h2"):
+            parts.append(f'<h2 style="{rules["h2"]}">{_inline(block[1], rules)}</h2>')
+        elif kind == "h3":
+            parts.append(f'<h3 style="{rules["h3"]}">{_inline(block[1], rules)}</h3>')
+        elif kind == "blockquote":
+            inner = "".join(f'<p style="{rules["quote_p"]}">{_inline(line, rules)}</p>' for line in block[1])
+            parts.append(f'<blockquote style="{rules["blockquote"]}">{inner}</blockquote>')
+        elif kind in ("ul", "ol"):
+            inner = "".join(f'<li style="{rules["li"]}">{_inline(item, rules)}</li>' for item in block[1])
+            parts.append(f'<{kind} style="{rules["list"]}">{inner}</{kind}>')
+        elif kind == "img":
+            parts.append(_image(block[1], block[2], rules))
+        elif kind == "hr":
+            parts.append(f'<hr style="{rules["hr"]}">')
+
+    return f'<section style="{rules["article"]}">{"".join(parts)}</section>'
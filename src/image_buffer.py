@@ -0,0 +1,159 @@
+"""
+图片内存缓冲 - 下载、上传、归档共用同一份字节
+
+生成的图片直接下载到缓冲区，再从缓冲区上传到微信并写入 resources/ 归档，
+不再落盘到 images/ 后重新打开，也不再为归档重复下载。
+超过 IMAGE_SPOOL_MAX_MB 的图片自动转存为临时文件（SpooledTemporaryFile），
+避免大图长期占用内存。
+
+生成接口返回 b64_json 时用 ImageBuffer.from_base64 分段解码进缓冲，不再下载
+（响应 JSON 本身仍整体解析在内存中，分段只是不再额外生成一份完整的解码副本）；
+日志只输出 describe() 给出的大小和 sha256 前缀，不打印图片内容。
+
+使用方式：
+    from src.image_buffer import ImageBuffer
+
+    image = ImageBuffer("cover.png")
+    image.write(chunk)
+    files = {"media": (image.filename, image.getvalue(), image.content_type)}
+    image.save(path)
+    image.close()
+
+    image = ImageBuffer.from_base64(b64_json, "cover.png")
+    print(image.describe())    # 1.2 MB sha256:3f2a9c1d
+"""
+
+import base64
+import hashlib
+import os
+import re
+import tempfile
+from typing import BinaryIO, Optional
+
+from .config import Config
+
+# 按文件头识别图片格式：(魔数, 扩展名, content_type)
+IMAGE_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "png", "image/png"),
+    (b"\xff\xd8\xff", "jpg", "image/jpeg"),
+    (b"GIF87a", "gif", "image/gif"),
+    (b"GIF89a", "gif", "image/gif"),
+)
+
+
+# 分段解码 base64 的片段长度（4 的倍数）；解码出的字节逐段写入缓冲，不在内存里拼出完整副本
+BASE64_CHUNK = 4 * 256 * 1024
+DATA_URI_PREFIX = re.compile(r'^data:[^,]*;base64,')
+
+
+def format_size(size: int) -> str:
+    if size >= 1024 * 1024:
+        return f"{size / 1024 / 1024:.1f} MB"
+    return f"{size / 1024:.0f} KB"
+
+
+def sniff_image_type(head: bytes) -> Optional[tuple]:
+    """根据文件头返回 (扩展名, content_type)，无法识别时返回 None"""
+    for signature, ext, content_type in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return ext, content_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp", "image/webp"
+    return None
+
+
+class ImageBuffer:
+    """一张图片的字节缓冲（小图在内存中，大图转存临时文件）"""
+
+    def __init__(self, filename: str, max_memory: Optional[int] = None):
+        max_memory = max_memory if max_memory is not None else int(Config.IMAGE_SPOOL_MAX_MB * 1024 * 1024)
+        self._file = tempfile.SpooledTemporaryFile(max_size=max_memory)
+        self.name = filename
+        self.size = 0
+
+    @classmethod
+    def from_base64(cls, data: str, filename: str = "image.png", max_memory: Optional[int] = None) -> "ImageBuffer":
+        """把 base64 图片（可带 data:image/...;base64, 前缀）分段解码进缓冲"""
+        match = DATA_URI_PREFIX.match(data[:200])
+        start = match.end() if match else 0
+        if any(c.isspace() for c in data[start:start + 200]):
+            # 带换行的 base64 先去掉空白，才能按 4 字符对齐分段
+            data, start = "".join(data[start:].split()), 0
+        image = cls(filename, max_memory)
+        try:
+            for offset in range(start, len(data), BASE64_CHUNK):
+                chunk = data[offset:offset + BASE64_CHUNK]
+                # 部分接口省略末尾的 = 填充
+                image.write(base64.b64decode(chunk + "=" * (-len(chunk) % 4), validate=True))
+        except Exception as e:
+            image.close()
+            raise ValueError(f"b64_json 解码失败: {e}") from e
+        if not image.size:
+            image.close()
+            raise ValueError("b64_json 为空")
+        return image
+
+    def write(self, data: bytes):
+        self._file.write(data)
+        self.size += len(data)
+
+    @property
+    def head(self) -> bytes:
+        position = self._file.tell()
+        self._file.seek(0)
+        head = self._file.read(16)
+        self._file.seek(position)
+        return head
+
+    @property
+    def content_type(self) -> str:
+        detected = sniff_image_type(self.head)
+        if detected:
+            return detected[1]
+        return "image/png" if self.name.endswith(".png") else "image/jpeg"
+
+    @property
+    def filename(self) -> str:
+        """文件名扩展名与实际格式一致（生成接口常返回 JPEG）"""
+        detected = sniff_image_type(self.head)
+        if not detected:
+            return self.name
+        return f"{os.path.splitext(self.name)[0]}.{detected[0]}"
+
+    def open(self) -> BinaryIO:
+        """回到开头并返回文件对象（可直接作为 multipart 上传的文件）"""
+        self._file.seek(0)
+        return self._file
+
+    def getvalue(self) -> bytes:
+        return self.open().read()
+
+    def save(self, path: str):
+        """写入磁盘（归档）"""
+        source = self.open()
+        with open(path, "wb") as f:
+            while True:
+                chunk = source.read(1024 * 1024)
+                if not chunk:
+                    break
+                f.write(chunk)
+
+    def sha256(self) -> str:
+        digest = hashlib.sha256()
+        source = self.open()
+        while True:
+            chunk = source.read(1024 * 1024)
+            if not chunk:
+                break
+            digest.update(chunk)
+        return digest.hexdigest()
+
+    def describe(self) -> str:
+        """日志用的摘要：大小和 sha256 前缀"""
+        return f"{format_size(self.size)} sha256:{self.sha256()[:8]}"
+
+    def close(self):
+        self._file.close()
+
+    def __repr__(self):
+        return f"ImageBuffer({self.filename!r}, {self.size} bytes)"
@@ -0,0 +1,198 @@
+"""
+图片缓存 - 按 (生成模型, 提示词, 尺寸) 寻址，复用已生成并上传过的图片
+
+默认配图提示词在每篇文章中都相同，每次运行却都重新生成、重新上传。
+缓存条目保存图片字节，以及上传后得到的图文图片 CDN URL 和永久 thumb media_id：
+
+- 命中且已有对应素材（插图的 CDN URL / 封面的 media_id）时，生成和上传都跳过
+- 命中但还没有对应素材时，跳过生成，只上传一次并记下结果
+- 复用策略 IMAGE_CACHE_REUSE：默认 never 不缓存（需显式开启）；数字 N 表示每张图最多复用 N 次，
+  用完后重新生成；always 一直复用
+- 总大小超过 IMAGE_CACHE_MAX_MB 时按最近访问时间淘汰 (LRU)
+
+使用方式：
+    from src.image_cache import get_image_cache
+
+    cache = get_image_cache()
+    cached = cache.get(model, prompt, "1024x1024")
+    if cached is None:
+        key = cache.put(model, prompt, "1024x1024", image)
+    cache.set_assets(key, cdn_url=url)
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from .config import Config
+from .image_buffer import ImageBuffer
+
+
+def make_image_key(model: str, prompt: str, size: str) -> str:
+    payload = json.dumps([model, prompt, size], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CachedImage:
+    key: str
+    data: bytes
+    cdn_url: Optional[str]
+    thumb_media_id: Optional[str]
+    uses: int
+
+    def to_buffer(self, filename: str) -> ImageBuffer:
+        image = ImageBuffer(filename)
+        image.write(self.data)
+        return image
+
+
+class ImageCache:
+    """SQLite 图片缓存（LRU + 复用次数上限）"""
+
+    def __init__(self, path: Optional[Path] = None,
+                 max_bytes: Optional[int] = None,
+                 reuse: Optional[str] = None):
+        self.path = Path(path or Config.IMAGE_CACHE_PATH)
+        self.max_bytes = max_bytes if max_bytes is not None else int(Config.IMAGE_CACHE_MAX_MB * 1024 * 1024)
+        self.reuse = (reuse if reuse is not None else Config.IMAGE_CACHE_REUSE).strip().lower()
+        self._initialized = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.reuse != "never" and self.reuse != "0"
+
+    @property
+    def max_uses(self) -> Optional[int]:
+        """每张图最多复用次数，always 时为 None（不限）"""
+        return int(self.reuse) if self.reuse.isdigit() else None
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path), timeout=30)
+        if not self._initialized:
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS image_cache (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                prompt TEXT NOT NULL,
+                size TEXT NOT NULL,
+                data BLOB NOT NULL,
+                bytes INTEGER NOT NULL,
+                cdn_url TEXT,
+                thumb_media_id TEXT,
+                uses INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_image_cache_accessed ON image_cache (accessed_at)")
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def get(self, model: str, prompt: str, size: str) -> Optional[CachedImage]:
+        """读取缓存图片，命中时记一次复用；复用次数用完的条目删除后视为未命中"""
+        if not self.enabled:
+            return None
+        key = make_image_key(model, prompt, size)
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT data, cdn_url, thumb_media_id, uses FROM image_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if not row:
+                return None
+            max_uses = self.max_uses
+            if max_uses is not None and row[3] >= max_uses:
+                conn.execute("DELETE FROM image_cache WHERE key = ?", (key,))
+                conn.commit()
+                return None
+            conn.execute("UPDATE image_cache SET uses = uses + 1, accessed_at = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+            return CachedImage(key, row[0], row[1], row[2], row[3] + 1)
+        finally:
+            conn.close()
+
+    def put(self, model: str, prompt: str, size: str, image: ImageBuffer) -> Optional[str]:
+        """写入新生成的图片，返回缓存键；超出容量时淘汰最久未访问的条目"""
+        if not self.enabled or image.size > self.max_bytes:
+            return None
+        key = make_image_key(model, prompt, size)
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO image_cache "
+                "(key, model, prompt, size, data, bytes, uses, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?)",
+                (key, model, prompt, size, sqlite3.Binary(image.getvalue()), image.size, now, now)
+            )
+            self._evict(conn)
+            conn.commit()
+            return key
+        finally:
+            conn.close()
+
+    def set_assets(self, key: Optional[str], cdn_url: Optional[str] = None, thumb_media_id: Optional[str] = None):
+        """记录图片上传到微信后得到的 CDN URL / 永久 thumb media_id"""
+        if not key or not (cdn_url or thumb_media_id):
+            return
+        conn = self._connect()
+        try:
+            if cdn_url:
+                conn.execute("UPDATE image_cache SET cdn_url = ? WHERE key = ?", (cdn_url, key))
+            if thumb_media_id:
+                conn.execute("UPDATE image_cache SET thumb_media_id = ? WHERE key = ?", (thumb_media_id, key))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def forget_media(self, media_id: str) -> int:
+        """清除记录的 thumb media_id（素材在微信端已不存在），图片字节保留"""
+        if not media_id:
+            return 0
+        conn = self._connect()
+        try:
+            cursor = conn.execute("UPDATE image_cache SET thumb_media_id = NULL WHERE thumb_media_id = ?", (media_id,))
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    def _evict(self, conn: sqlite3.Connection):
+        total = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM image_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in conn.execute("SELECT key, bytes FROM image_cache ORDER BY accessed_at").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM image_cache WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        print(f"   [CACHE] 图片缓存超出容量，已淘汰 {evicted} 张")
+
+    def clear(self) -> int:
+        conn = self._connect()
+        try:
+            cursor = conn.execute("DELETE FROM image_cache")
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+
+# 全局单例
+_image_cache_instance = None
+
+
+def get_image_cache() -> ImageCache:
+    global _image_cache_instance
+    if _image_cache_instance is None:
+        _image_cache_instance = ImageCache()
+    return _image_cache_instance
@@ -0,0 +1,148 @@
+"""
+本地图片优化 - 上传前裁剪、缩放并重新压缩到微信的尺寸和大小限制
+
+生成接口统一返回 1024x1024 的图片，原样上传既不符合封面 2.35:1 / 插图 4:3 的版式，
+也容易超过接口的大小限制（thumb 素材 64KB，图文图片 1MB）导致上传失败。上传前：
+
+1. 按目标比例居中裁剪
+2. 缩放到公众号显示宽度（封面 IMAGE_COVER_WIDTH，插图 IMAGE_OPTIMIZE_WIDTH）
+3. 编码为渐进式 JPEG，逐步降低质量（仍超限时再缩小尺寸），直到低于该接口的字节上限
+
+处理在线程池中执行，不阻塞事件循环。依赖 Pillow（可选）；未安装或 IMAGE_OPTIMIZE=false 时原样上传。
+
+使用方式：
+    from src.image_optimizer import COVER, ILLUSTRATION, optimize_image
+
+    image = await optimize_image(image, COVER)
+"""
+
+import asyncio
+import io
+from dataclasses import dataclass
+from typing import Optional
+
+from .config import Config
+from .image_buffer import ImageBuffer, format_size
+
+# 质量下限；仍超限时按 SCALE_STEP 缩小尺寸，最小宽度 MIN_WIDTH
+MIN_QUALITY = 40
+QUALITY_STEP = 10
+SCALE_STEP = 0.8
+MIN_WIDTH = 200
+
+
+@dataclass(frozen=True)
+class ImageTarget:
+    aspect: float  # 宽 / 高
+    width_setting: str  # 显示宽度对应的配置项
+    max_bytes: int  # 上传接口的字节上限
+
+    @property
+    def width(self) -> int:
+        return int(getattr(Config, self.width_setting))
+
+
+# 封面上传为 thumb 素材（64KB）；插图走 uploadimg（1MB）
+COVER = ImageTarget(2.35, "IMAGE_COVER_WIDTH", 64 * 1024)
+ILLUSTRATION = ImageTarget(4 / 3, "IMAGE_OPTIMIZE_WIDTH", 1024 * 1024)
+
+_pillow_warned = False
+
+
+def _load_pillow():
+    global _pillow_warned
+    try:
+        from PIL import Image
+        return Image
+    except ImportError:
+        if not _pillow_warned:
+            print("   [图片] 未安装 Pillow，跳过本地图片优化（pip install Pillow 可启用）")
+            _pillow_warned = True
+        return None
+
+
+def _crop_to_aspect(img, aspect: float):
+    """按目标比例居中裁剪"""
+    width, height = img.size
+    if abs(width / height - aspect) < 0.01:
+        return img
+    if width / height > aspect:
+        new_width = round(height * aspect)
+        left = (width - new_width) // 2
+        return img.crop((left, 0, left + new_width, height))
+    new_height = round(width / aspect)
+    top = (height - new_height) // 2
+    return img.crop((0, top, width, top + new_height))
+
+
+def _to_rgb(img, Image):
+    """JPEG 不支持透明通道：透明部分铺白底"""
+    if img.mode in ("RGBA", "LA", "P"):
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel("A"))
+        return background
+    return img.convert("RGB") if img.mode != "RGB" else img
+
+
+def _encode(img, max_bytes: int, Image) -> Optional[tuple]:
+    """渐进式 JPEG 编码，返回 (字节, 质量, 尺寸)；最小尺寸最低质量仍超限时返回 None"""
+    resample = getattr(Image, "Resampling", Image).LANCZOS
+    while True:
+        quality = Config.IMAGE_JPEG_QUALITY
+        while quality >= MIN_QUALITY:
+            out = io.BytesIO()
+            img.save(out, "JPEG", quality=quality, optimize=True, progressive=True)
+            if out.tell() <= max_bytes:
+                return out.getvalue(), quality, img.size
+            quality -= QUALITY_STEP
+        width = int(img.width * SCALE_STEP)
+        if width < MIN_WIDTH:
+            return None
+        img = img.resize((width, round(width * img.height / img.width)), resample)
+
+
+def optimize_image_sync(image: ImageBuffer, target: ImageTarget) -> ImageBuffer:
+    """裁剪、缩放、压缩；返回新的缓冲（原缓冲由调用方释放），无法处理时返回原缓冲"""
+    Image = _load_pillow()
+    if Image is None:
+        return image
+
+    img = Image.open(image.open())
+    img.load()
+    already_fits = (image.content_type == "image/jpeg" and image.size <= target.max_bytes
+                    and abs(img.width / img.height - target.aspect) < 0.01 and img.width <= target.width)
+    if already_fits:
+        return image
+
+    img = _to_rgb(_crop_to_aspect(img, target.aspect), Image)
+    if img.width > target.width:
+        resample = getattr(Image, "Resampling", Image).LANCZOS
+        img = img.resize((target.width, round(target.width / target.aspect)), resample)
+
+    encoded = _encode(img, target.max_bytes, Image)
+    if encoded is None:
+        print(f"   [WARN] {image.filename} 压缩后仍超过 {format_size(target.max_bytes)}，原样上传")
+        return image
+    data, quality, size = encoded
+
+    optimized = ImageBuffer(image.name)
+    optimized.write(data)
+    print(f"   [图片] 优化 {image.filename}：{format_size(image.size)} → {format_size(optimized.size)}"
+          f"（{size[0]}x{size[1]} JPEG q{quality}）")
+    return optimized
+
+
+async def optimize_image(image: ImageBuffer, target: ImageTarget) -> ImageBuffer:
+    """在线程池中优化图片；返回新缓冲时原缓冲已释放，失败时原样返回"""
+    # 在事件循环线程里检查 Pillow，未安装的提示只打印一次
+    if not Config.IMAGE_OPTIMIZE or _load_pillow() is None:
+        return image
+    try:
+        optimized = await asyncio.to_thread(optimize_image_sync, image, target)
+    except Exception as e:
+        print(f"   [WARN] 图片优化失败，原样上传: {e}")
+        return image
+    if optimized is not image:
+        image.close()
+    return optimized
@@ -0,0 +1,121 @@
+"""
+模型延迟统计 - 按 (模型, 阶段) 保存最近的请求耗时
+
+LLMClient 在每次实际请求（未命中缓存）完成后记录耗时，
+ModelRouter 据此估算滚动 p50 / p95，决定截止时间和模型顺序。
+样本保存在 SQLite 中，多次运行、多个进程之间共享。
+同一个库还记录每天已发出的对冲请求数（见 ModelRouter 的对冲模式）。
+"""
+
+import sqlite3
+import time
+from datetime import date
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from .config import Config
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class LatencyStats:
+    """(模型, 阶段) 的滚动延迟样本（SQLite）"""
+
+    def __init__(self, path: Optional[Path] = None, window: Optional[int] = None):
+        self.path = Path(path or Config.MODEL_STATS_PATH)
+        self.window = window or Config.MODEL_STATS_WINDOW
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path), timeout=30)
+        if not self._initialized:
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS model_latency (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                model TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                latency REAL NOT NULL,
+                ok INTEGER NOT NULL,
+                created_at REAL NOT NULL
+            )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_model_latency ON model_latency (model, stage, id)")
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS hedge_usage (
+                day TEXT PRIMARY KEY,
+                count INTEGER NOT NULL
+            )
+            ''')
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def record(self, model: str, stage: str, latency: float, ok: bool = True):
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT INTO model_latency (model, stage, latency, ok, created_at) VALUES (?, ?, ?, ?, ?)",
+                (model, stage, latency, int(ok), time.time())
+            )
+            conn.execute('''
+            DELETE FROM model_latency WHERE model = ? AND stage = ? AND id NOT IN (
+                SELECT id FROM model_latency WHERE model = ? AND stage = ? ORDER BY id DESC LIMIT ?
+            )
+            ''', (model, stage, model, stage, self.window))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def percentiles(self, model: str, stage: str) -> Tuple[Optional[float], Optional[float], int]:
+        """返回 (p50, p95, 样本数)；超时样本按截止时间计入"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT latency FROM model_latency WHERE model = ? AND stage = ?", (model, stage)
+            ).fetchall()
+        finally:
+            conn.close()
+        values = [row[0] for row in rows]
+        if not values:
+            return None, None, 0
+        return _percentile(values, 0.5), _percentile(values, 0.95), len(values)
+
+    def take_hedge(self, daily_max: int) -> bool:
+        """占用一次当天的对冲额度，额度用完返回 False"""
+        if daily_max <= 0:
+            return False
+        today = date.today().isoformat()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT count FROM hedge_usage WHERE day = ?", (today,)).fetchone()
+            used = row[0] if row else 0
+            if used >= daily_max:
+                conn.rollback()
+                return False
+            conn.execute(
+                "INSERT INTO hedge_usage (day, count) VALUES (?, 1) "
+                "ON CONFLICT(day) DO UPDATE SET count = count + 1",
+                (today,)
+            )
+            conn.execute("DELETE FROM hedge_usage WHERE day < ?", (today,))
+            conn.commit()
+            return True
+        finally:
+            conn.close()
+
+
+# 全局单例
+_latency_stats_instance = None
+
+
+def get_latency_stats() -> LatencyStats:
+    global _latency_stats_instance
+    if _latency_stats_instance is None:
+        _latency_stats_instance = LatencyStats()
+    return _latency_stats_instance
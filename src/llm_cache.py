@@ -0,0 +1,156 @@
+"""
+LLM 响应缓存 - 按请求内容寻址的磁盘缓存
+
+调整提示词或重跑失败任务时，相同的
+(model, system_prompt, user_prompt, max_tokens, temperature) 请求直接返回缓存结果，
+不再重复请求和计费。
+
+- 键为请求内容的 SHA-256，缓存保存在 SQLite 中
+- 每个阶段 (writer / digest / layout) 有独立的有效期，设为 0 表示该阶段不缓存
+- 总大小超过 LLM_CACHE_MAX_MB 时按最近访问时间淘汰 (LRU)
+- LLM_CACHE=false 或命令行 --no-cache 跳过缓存
+
+使用方式：
+    from src.llm_cache import get_llm_cache, make_cache_key
+
+    key = make_cache_key(model, system, user, max_tokens, temperature)
+    text = get_llm_cache().get(key, "digest")
+    ...
+    get_llm_cache().put(key, "digest", model, text)
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from .config import Config
+
+
+def make_cache_key(model: str, system_prompt: str, user_prompt: str,
+                   max_tokens: int, temperature: float) -> str:
+    """请求内容的 SHA-256"""
+    payload = json.dumps(
+        [model, system_prompt, user_prompt, max_tokens, temperature],
+        ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """SQLite 响应缓存（LRU + 分阶段有效期）"""
+
+    def __init__(self, path: Optional[Path] = None,
+                 max_bytes: Optional[int] = None,
+                 ttls: Optional[Dict[str, float]] = None):
+        self.path = Path(path or Config.LLM_CACHE_PATH)
+        self.max_bytes = max_bytes if max_bytes is not None else int(Config.LLM_CACHE_MAX_MB * 1024 * 1024)
+        # 有效期（秒）；未列出的阶段使用 default
+        self.ttls = ttls if ttls is not None else {
+            "writer": Config.LLM_CACHE_TTL_WRITER * 3600,
+            "digest": Config.LLM_CACHE_TTL_DIGEST * 3600,
+            "layout": Config.LLM_CACHE_TTL_LAYOUT * 3600,
+            "default": Config.LLM_CACHE_TTL_DEFAULT * 3600,
+        }
+        self._initialized = False
+
+    def ttl(self, stage: str) -> float:
+        return self.ttls.get(stage, self.ttls.get("default", 0))
+
+    def enabled_for(self, stage: Optional[str]) -> bool:
+        return bool(stage) and Config.LLM_CACHE and self.ttl(stage) > 0
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path), timeout=30)
+        if not self._initialized:
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                stage TEXT NOT NULL,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache (accessed_at)")
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def get(self, key: str, stage: str) -> Optional[str]:
+        """读取未过期的缓存，命中时更新访问时间"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if not row:
+                return None
+            if now - row[1] > self.ttl(stage):
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                conn.commit()
+                return None
+            conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            conn.commit()
+            return row[0]
+        finally:
+            conn.close()
+
+    def put(self, key: str, stage: str, model: str, response: str):
+        """写入缓存，超出容量时淘汰最久未访问的条目"""
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, stage, model, response, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, stage, model, response, size, now, now)
+            )
+            self._evict(conn)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _evict(self, conn: sqlite3.Connection):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in conn.execute("SELECT key, size FROM llm_cache ORDER BY accessed_at").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        print(f"   [CACHE] 缓存超出容量，已淘汰 {evicted} 条")
+
+    def clear(self, stage: Optional[str] = None) -> int:
+        """清空缓存（可只清空某个阶段），返回删除条数"""
+        conn = self._connect()
+        try:
+            if stage:
+                cursor = conn.execute("DELETE FROM llm_cache WHERE stage = ?", (stage,))
+            else:
+                cursor = conn.execute("DELETE FROM llm_cache")
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+
+# 全局单例
+_llm_cache_instance = None
+
+
+def get_llm_cache() -> LLMCache:
+    global _llm_cache_instance
+    if _llm_cache_instance is None:
+        _llm_cache_instance = LLMCache()
+    return _llm_cache_instance
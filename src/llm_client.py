@@ -0,0 +1,435 @@
+"""
+LLM 客户端 - 进程级共享连接池
+
+写作、摘要、排版三个阶段共用同一个 httpx.AsyncClient，
+批量写作时复用已建立的 TCP/TLS 连接，避免每次请求都重新握手。
+429 / 5xx / 超时按 resilience.py 的退避策略重试，接口持续故障时熔断；
+请求发出前按模型限流排队（见 rate_limiter.py），完成后记录耗时（见 latency_stats.py）。
+输出因 max_tokens 被截断 (finish_reason=length) 时，以已输出内容为上下文自动续写，
+最多 LLM_CONTINUATION_ROUNDS 轮，拼接后返回；complete() 和 ChatStream.rounds 提供每轮 token 用量。
+
+使用方式：
+    from src.llm_client import get_llm_client, close_llm_client
+
+    content = await get_llm_client().chat(base_url, api_key, model, system, user)
+
+    # 流式输出
+    stream = get_llm_client().stream_chat(base_url, api_key, model, system, user)
+    async for delta in stream:
+        ...
+
+    # 拼接结果与每轮用量
+    result = await get_llm_client().complete(base_url, api_key, model, system, user)
+    print(result.text, result.finish_reason, result.rounds)
+
+    # 指定 stage 时使用响应缓存（见 llm_cache.py）
+    content = await get_llm_client().chat(base_url, api_key, model, system, user, stage="digest")
+    ...
+    await close_llm_client()
+"""
+
+import asyncio
+import importlib.util
+import json
+import re
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, List, Optional
+
+import httpx
+
+from .config import Config
+from .latency_stats import get_latency_stats
+from .llm_cache import get_llm_cache, make_cache_key
+from .rate_limiter import estimate_tokens, get_rate_limiter
+from .resilience import Retrier, call_with_retry, counts_as_failure
+
+
+CONTINUE_PROMPT = "你的输出因长度限制被截断了。请从中断处直接接着输出剩余内容，不要重复已输出的部分，不要添加任何说明。"
+
+# 续写时在前一轮末尾与新一轮开头之间查找重复内容的最大长度
+STITCH_WINDOW = 200
+CODE_FENCE_OPEN = re.compile(r'^\s*```[\w-]*[ \t]*\n')
+
+
+def stitch(text: str, more: str) -> str:
+    """拼接续写内容：去掉模型重复输出的衔接部分和重新打开的代码块"""
+    if text.count("```") % 2 == 1:
+        more = CODE_FENCE_OPEN.sub("", more, count=1)
+    for size in range(min(len(text), len(more), STITCH_WINDOW), 9, -1):
+        if text.endswith(more[:size]):
+            return text + more[size:]
+    return text + more
+
+
+def continuation_messages(messages: List[dict], partial: str) -> List[dict]:
+    """在原始对话后追加已输出内容和续写指令"""
+    return messages + [
+        {"role": "assistant", "content": partial},
+        {"role": "user", "content": CONTINUE_PROMPT},
+    ]
+
+
+@dataclass
+class ChatCompletion:
+    """一次 chat 调用的结果（含续写）
+
+    rounds 为每轮请求的 token 用量（接口未返回时为估算值），命中缓存时为空。
+    """
+    text: str
+    finish_reason: Optional[str] = None
+    rounds: List[dict] = field(default_factory=list)
+    cached: bool = False
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(r.get("total_tokens") or 0 for r in self.rounds)
+
+
+def _round_usage(usage: Optional[dict], prompt_tokens: int, content: str) -> dict:
+    if usage and usage.get("total_tokens") is not None:
+        return usage
+    completion = estimate_tokens(content)
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion,
+            "total_tokens": prompt_tokens + completion, "estimated": True}
+
+
+def _log_continuation(model: str, completion: "ChatCompletion"):
+    usage = "，".join(f"第 {i} 轮 {r['total_tokens']}" for i, r in enumerate(completion.rounds, 1))
+    truncated = "，仍被截断" if completion.finish_reason == "length" else ""
+    print(f"   [LLM] {model} 续写 {len(completion.rounds) - 1} 轮{truncated}（token：{usage}）")
+
+
+class ChatStream:
+    """流式 Chat Completions 响应 (SSE)
+
+    逐个产出 token 增量；迭代结束后 text / finish_reason / usage / rounds 可用。
+    输出被截断时自动发起续写请求，续写内容接着产出（usage 为最后一轮，rounds 为每轮）。
+    指定 stage 时先查响应缓存，命中则一次性产出完整文本（cached 为 True）。
+    """
+
+    def __init__(self, client: httpx.AsyncClient, url: str, headers: dict, payload: dict,
+                 stage: Optional[str] = None):
+        self._client = client
+        self._url = url
+        self._headers = headers
+        self._payload = payload
+        self._stage = stage
+        self._parts = []
+        self.finish_reason: Optional[str] = None
+        self.usage: Optional[dict] = None
+        self.rounds: List[dict] = []
+        self.cached = False
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        payload = self._payload
+        cache_key = None
+        if get_llm_cache().enabled_for(self._stage):
+            cache_key = make_cache_key(
+                payload["model"], payload["messages"][0]["content"], payload["messages"][1]["content"],
+                payload["max_tokens"], payload["temperature"]
+            )
+            cached = await asyncio.to_thread(get_llm_cache().get, cache_key, self._stage)
+            if cached is not None:
+                print(f"   [CACHE] {self._stage} 命中缓存")
+                self.cached = True
+                self.finish_reason = "stop"
+                self._parts.append(cached)
+                yield cached
+                return
+
+        started = time.monotonic()
+        messages = payload["messages"]
+        for round_index in range(Config.LLM_CONTINUATION_ROUNDS + 1):
+            if round_index:
+                payload = dict(self._payload, messages=continuation_messages(messages, self.text))
+            async for delta in self._stream_round(payload, continuation=bool(round_index)):
+                yield delta
+            if self.finish_reason != "length":
+                break
+        if len(self.rounds) > 1:
+            _log_continuation(payload["model"], ChatCompletion(self.text, self.finish_reason, self.rounds))
+
+        await asyncio.to_thread(get_latency_stats().record, payload["model"], self._stage or "default",
+                                time.monotonic() - started)
+
+        # 被截断的响应不缓存
+        if cache_key and self.finish_reason != "length" and self.text:
+            await asyncio.to_thread(get_llm_cache().put, cache_key, self._stage, payload["model"], self.text)
+
+    async def _stream_round(self, payload: dict, continuation: bool = False) -> AsyncIterator[str]:
+        """一轮流式请求（含重试）
+
+        尚未输出任何内容时可透明重试；输出中途断开则直接抛出。
+        续写轮先缓冲开头一段，去掉与前文重复的部分后再产出。
+        """
+        limiter = get_rate_limiter(payload["model"])
+        prompt_tokens = sum(estimate_tokens(m["content"]) for m in payload["messages"])
+        retrier = Retrier(self._url, model=payload["model"])
+        before = self.text
+        produced = []
+        while True:
+            retrier.before_call()
+            self.usage = None
+            self.finish_reason = None
+            buffer = "" if continuation else None
+            reserved = 0
+            try:
+                # 限流排队也在 try 内：排队时被取消同样要释放试探名额
+                reserved = await limiter.acquire(prompt_tokens + payload["max_tokens"])
+                async for delta in self._stream_once(payload):
+                    produced.append(delta)
+                    if buffer is not None:
+                        buffer += delta
+                        if len(buffer) <= STITCH_WINDOW:
+                            continue
+                        delta = stitch(before, buffer)[len(before):]
+                        buffer = None
+                        if not delta:
+                            continue
+                    self._parts.append(delta)
+                    yield delta
+            except (asyncio.CancelledError, GeneratorExit):
+                # 被取消或调用方提前关闭流：释放试探名额，否则半开的熔断器会一直拒绝请求
+                retrier.on_cancel()
+                raise
+            except Exception as e:
+                limiter.observe(e)
+                limiter.settle(reserved, prompt_tokens + estimate_tokens("".join(produced)))
+                if produced:
+                    if counts_as_failure(e):
+                        retrier.breaker.record_failure()
+                    raise
+                await retrier.on_error(e)
+                continue
+            retrier.on_success()
+            if buffer:
+                delta = stitch(before, buffer)[len(before):]
+                if delta:
+                    self._parts.append(delta)
+                    yield delta
+            usage = _round_usage(self.usage, prompt_tokens, "".join(produced))
+            limiter.settle(reserved, usage["total_tokens"])
+            self.rounds.append(usage)
+            return
+
+    async def _stream_once(self, payload: dict) -> AsyncIterator[str]:
+        async with self._client.stream("POST", self._url, headers=self._headers, json=payload) as resp:
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    chunk = json.loads(data)
+                except ValueError:
+                    continue
+                if chunk.get("usage"):
+                    self.usage = chunk["usage"]
+                for choice in chunk.get("choices") or []:
+                    if choice.get("finish_reason"):
+                        self.finish_reason = choice["finish_reason"]
+                    delta = (choice.get("delta") or {}).get("content")
+                    if delta:
+                        yield delta
+
+    async def read(self) -> str:
+        """读取完整响应"""
+        async for _ in self:
+            pass
+        return self.text
+
+
+class LLMClient:
+    """Chat Completions 客户端（keep-alive 连接池，可选 HTTP/2）"""
+
+    def __init__(self,
+                 timeout: Optional[float] = None,
+                 max_connections: Optional[int] = None,
+                 max_keepalive: Optional[int] = None,
+                 keepalive_expiry: Optional[float] = None,
+                 http2: Optional[bool] = None):
+        self.timeout = timeout if timeout is not None else Config.LLM_TIMEOUT
+        self.max_connections = max_connections if max_connections is not None else Config.LLM_MAX_CONNECTIONS
+        self.max_keepalive = max_keepalive if max_keepalive is not None else Config.LLM_MAX_KEEPALIVE
+        self.keepalive_expiry = keepalive_expiry if keepalive_expiry is not None else Config.LLM_KEEPALIVE_EXPIRY
+        self.http2 = http2 if http2 is not None else Config.LLM_HTTP2
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _http2_available(self) -> bool:
+        """HTTP/2 需要额外安装 h2 (pip install httpx[http2])"""
+        if not self.http2:
+            return False
+        if importlib.util.find_spec("h2") is None:
+            print("   [LLM] 未安装 h2，HTTP/2 已回退为 HTTP/1.1")
+            self.http2 = False
+            return False
+        return True
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """懒加载连接池
+
+        httpx 的连接绑定在创建时的事件循环上，
+        若在新的 asyncio.run() 中使用则重新创建。
+        """
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            limits = httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive,
+                keepalive_expiry=self.keepalive_expiry,
+            )
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=limits,
+                http2=self._http2_available(),
+            )
+            self._loop = loop
+        return self._client
+
+    async def chat(self, base_url: str, api_key: str, model: str,
+                   system_prompt: str, user_prompt: str,
+                   max_tokens: int = 4000, temperature: float = 0.7,
+                   stage: Optional[str] = None) -> str:
+        """调用 /chat/completions，返回回复文本（被截断时为续写拼接后的全文）
+
+        stage 为 writer / digest / layout 等阶段名，指定时使用响应缓存。
+        """
+        completion = await self.complete(base_url, api_key, model, system_prompt, user_prompt,
+                                         max_tokens=max_tokens, temperature=temperature, stage=stage)
+        return completion.text
+
+    async def complete(self, base_url: str, api_key: str, model: str,
+                       system_prompt: str, user_prompt: str,
+                       max_tokens: int = 4000, temperature: float = 0.7,
+                       stage: Optional[str] = None) -> ChatCompletion:
+        """同 chat()，返回 ChatCompletion（拼接文本、最终 finish_reason、每轮 token 用量）"""
+        cache = get_llm_cache()
+        cache_key = None
+        if cache.enabled_for(stage):
+            cache_key = make_cache_key(model, system_prompt, user_prompt, max_tokens, temperature)
+            cached = await asyncio.to_thread(cache.get, cache_key, stage)
+            if cached is not None:
+                print(f"   [CACHE] {stage} 命中缓存")
+                return ChatCompletion(cached, "stop", cached=True)
+
+        url = f"{base_url}/chat/completions"
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+
+        started = time.monotonic()
+        completion = ChatCompletion("")
+        for round_index in range(Config.LLM_CONTINUATION_ROUNDS + 1):
+            round_messages = continuation_messages(messages, completion.text) if round_index else messages
+            content, finish_reason, usage = await self._request(url, api_key, model, round_messages,
+                                                                max_tokens, temperature)
+            completion.text = stitch(completion.text, content) if round_index else content
+            completion.finish_reason = finish_reason
+            completion.rounds.append(usage)
+            if finish_reason != "length" or not content:
+                break
+        if len(completion.rounds) > 1:
+            _log_continuation(model, completion)
+        await asyncio.to_thread(get_latency_stats().record, model, stage or "default", time.monotonic() - started)
+
+        # 续写后仍被截断的响应不缓存
+        if cache_key and completion.finish_reason != "length" and completion.text:
+            await asyncio.to_thread(cache.put, cache_key, stage, model, completion.text)
+        return completion
+
+    async def _request(self, url: str, api_key: str, model: str, messages: List[dict],
+                       max_tokens: int, temperature: float):
+        """单轮请求，返回 (回复文本, finish_reason, token 用量)"""
+        limiter = get_rate_limiter(model)
+        prompt_tokens = sum(estimate_tokens(m["content"]) for m in messages)
+
+        async def request():
+            # 每次尝试（含重试）都按模型限流排队
+            reserved = await limiter.acquire(prompt_tokens + max_tokens)
+            try:
+                resp = await self.client.post(
+                    url,
+                    headers={"Authorization": f"Bearer {api_key}"},
+                    json={
+                        "model": model,
+                        "messages": messages,
+                        "temperature": temperature,
+                        "max_tokens": max_tokens
+                    }
+                )
+                resp.raise_for_status()
+            except Exception as e:
+                limiter.observe(e)
+                limiter.settle(reserved, 0)
+                raise
+            data = resp.json()
+            choice = data["choices"][0]
+            content = choice["message"]["content"] or ""
+            usage = _round_usage(data.get("usage"), prompt_tokens, content)
+            limiter.settle(reserved, usage["total_tokens"])
+            return content, choice.get("finish_reason"), usage
+
+        # 429 / 5xx / 超时按退避策略重试，接口持续故障时熔断
+        return await call_with_retry(url, request, model=model)
+
+    def stream_chat(self, base_url: str, api_key: str, model: str,
+                    system_prompt: str, user_prompt: str,
+                    max_tokens: int = 4000, temperature: float = 0.7,
+                    stage: Optional[str] = None) -> ChatStream:
+        """以 stream=true 调用 /chat/completions，返回可异步迭代的 ChatStream"""
+        return ChatStream(
+            self.client,
+            f"{base_url}/chat/completions",
+            {"Authorization": f"Bearer {api_key}"},
+            {
+                "model": model,
+                "messages": [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt}
+                ],
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+                "stream": True
+            },
+            stage=stage
+        )
+
+    async def aclose(self):
+        """关闭连接池"""
+        if self._client is not None and not self._client.is_closed:
+            try:
+                await self._client.aclose()
+            except RuntimeError:
+                # 所属事件循环已关闭，连接随进程释放
+                pass
+        self._client = None
+        self._loop = None
+
+
+# 全局单例
+_llm_client_instance = None
+
+
+def get_llm_client() -> LLMClient:
+    global _llm_client_instance
+    if _llm_client_instance is None:
+        _llm_client_instance = LLMClient()
+    return _llm_client_instance
+
+
+async def close_llm_client():
+    global _llm_client_instance
+    if _llm_client_instance is not None:
+        await _llm_client_instance.aclose()
+        _llm_client_instance = None
@@ -0,0 +1,196 @@
+"""
+本地抽取式摘要 - TextRank 选句，毫秒级生成 50-100 字摘要
+
+- 按中文句末标点（。！？；…）及换行切句，去掉配图占位符、链接和 Markdown 符号
+- 句子表示为字符二元组 (bigram) 集合，相似度按 TextRank 原文：
+  共同 n-gram 数 / (log|A| + log|B|)
+- 在相似度图上迭代 PageRank 得到句子得分
+- 加权：金句（> 引用）、与各小节标题用词重合的句子、与文章标题重合的句子、开头段落
+- 按得分挑句（跳过与已选句高度重复的句子）、按原文顺序拼接，长度控制在 50-100 字
+
+DIGEST_MODE=polish 时只把抽取出的候选句（而不是全文）交给摘要模型润色，
+输入 token 减少九成以上。
+
+使用方式：
+    from src.local_digest import extract_digest, polish_prompt
+
+    digest = extract_digest(markdown, title=topic)
+    digest = await call_llm(..., polish_prompt(markdown, topic), ...)
+"""
+
+import math
+import re
+from typing import List, Optional, Set
+
+SENTENCE_END = re.compile(r'(?<=[。！？!?；;…])')
+PLACEHOLDER_PATTERN = re.compile(r'\[IMAGE_PLACEHOLDER_\d+\]')
+LINK_PATTERN = re.compile(r'!?\[([^\]]*)\]\([^)]*\)|https?://\S+')
+WORD_CHARS = re.compile(r'[一-鿿A-Za-z0-9]')
+
+QUOTE_BOOST = 1.5
+# 句子 n-gram 中出现在小节标题里的比例 × 该系数
+HEADING_BOOST = 0.5
+LEAD_BOOST = 1.1
+DAMPING = 0.85
+ITERATIONS = 30
+
+
+class Sentence:
+    __slots__ = ("text", "index", "kind", "grams", "score")
+
+    def __init__(self, text: str, index: int, kind: str):
+        self.text = text
+        self.index = index
+        self.kind = kind  # text / quote / heading / lead
+        self.grams = ngrams(text)
+        self.score = 0.0
+
+
+def ngrams(text: str, n: int = 2) -> Set[str]:
+    chars = "".join(WORD_CHARS.findall(text.lower()))
+    if len(chars) < n:
+        return {chars} if chars else set()
+    return {chars[i:i + n] for i in range(len(chars) - n + 1)}
+
+
+def _clean(line: str) -> str:
+    line = PLACEHOLDER_PATTERN.sub("", line)
+    line = LINK_PATTERN.sub(lambda m: m.group(1) or "", line)
+    line = re.sub(r'[*_`~]', '', line)
+    return line.strip()
+
+
+def split_sentences(markdown: str) -> List[Sentence]:
+    """切句并标注来源（正文 / 金句 / 标题 / 开头段落）"""
+    sentences: List[Sentence] = []
+    paragraph_index = 0
+    in_code = False
+    for raw in markdown.splitlines():
+        line = raw.strip()
+        if line.startswith("```"):
+            in_code = not in_code
+            continue
+        if in_code or not line:
+            if not line:
+                paragraph_index += 1
+            continue
+        if re.match(r'^#{1,6}\s', line):
+            kind, line = "heading", line.lstrip("#")
+        elif line.startswith(">"):
+            kind, line = "quote", line.lstrip("> ")
+        else:
+            kind = "lead" if paragraph_index <= 1 and not any(s.kind == "heading" for s in sentences) else "text"
+            line = re.sub(r'^([-*+]|\d+\.)\s+', '', line)
+        line = _clean(line)
+        for part in SENTENCE_END.split(line):
+            part = part.strip()
+            if len(WORD_CHARS.findall(part)) >= 4:
+                sentences.append(Sentence(part, len(sentences), kind))
+    return sentences
+
+
+def similarity(a: Sentence, b: Sentence) -> float:
+    common = len(a.grams & b.grams)
+    if not common or len(a.grams) < 2 or len(b.grams) < 2:
+        return 0.0
+    return common / (math.log(len(a.grams)) + math.log(len(b.grams)))
+
+
+def rank_sentences(sentences: List[Sentence], title: Optional[str] = None) -> List[Sentence]:
+    """TextRank 打分，返回按得分降序排列的句子（小节标题只参与打分和加权）"""
+    count = len(sentences)
+    if not count:
+        return []
+    weights = [[0.0] * count for _ in range(count)]
+    for i in range(count):
+        for j in range(i + 1, count):
+            weights[i][j] = weights[j][i] = similarity(sentences[i], sentences[j])
+    totals = [sum(row) for row in weights]
+    # 每个句子的入边：(来源句, 归一化权重)
+    incoming = [[(j, weights[j][i] / totals[j]) for j in range(count) if weights[j][i]] for i in range(count)]
+    scores = [1.0] * count
+    for _ in range(ITERATIONS):
+        scores = [(1 - DAMPING) + DAMPING * sum(w * scores[j] for j, w in edges) for edges in incoming]
+
+    title_grams = ngrams(title or "")
+    heading_grams = set().union(*(s.grams for s in sentences if s.kind == "heading"))
+    for sentence, score in zip(sentences, scores):
+        if sentence.kind == "quote":
+            score *= QUOTE_BOOST
+        elif sentence.kind == "lead":
+            score *= LEAD_BOOST
+        if heading_grams and sentence.grams and sentence.kind != "heading":
+            score *= 1 + HEADING_BOOST * len(sentence.grams & heading_grams) / len(sentence.grams)
+        if title_grams and sentence.grams:
+            score *= 1 + len(sentence.grams & title_grams) / len(title_grams)
+        sentence.score = score
+    return sorted(sentences, key=lambda s: s.score, reverse=True)
+
+
+def _redundant(sentence: Sentence, chosen: List[Sentence], threshold: float = 0.6) -> bool:
+    """与已选句子的 n-gram 重合度过高（文章中重复出现的金句等）"""
+    for other in chosen:
+        union = len(sentence.grams | other.grams)
+        if union and len(sentence.grams & other.grams) / union >= threshold:
+            return True
+    return False
+
+
+def candidate_sentences(markdown: str, title: Optional[str] = None, count: int = 6) -> List[str]:
+    """得分最高的 count 个句子（按原文顺序），用于交给摘要模型润色"""
+    ranked = rank_sentences(split_sentences(markdown), title)
+    top: List[Sentence] = []
+    for sentence in ranked:
+        if len(top) >= count:
+            break
+        if sentence.kind != "heading" and not _redundant(sentence, top):
+            top.append(sentence)
+    return [s.text for s in sorted(top, key=lambda s: s.index)]
+
+
+def extract_digest(markdown: str, title: Optional[str] = None,
+                   min_chars: int = 50, max_chars: int = 100) -> str:
+    """抽取式摘要：按得分挑选句子，按原文顺序拼接到 min_chars - max_chars 字"""
+    ranked = rank_sentences(split_sentences(markdown), title)
+    chosen: List[Sentence] = []
+    length = 0
+    # 末尾可能补一个句号，计入长度
+    budget = max_chars - 1
+    for sentence in ranked:
+        if sentence.kind == "heading":
+            continue
+        if length + len(sentence.text) > budget or _redundant(sentence, chosen):
+            continue
+        chosen.append(sentence)
+        length += len(sentence.text)
+        if length >= min_chars:
+            break
+
+    if chosen and length < min_chars:
+        # 放得下的句子不够 min_chars：用排在已选句之后、得分最高的句子截断补足，省略号只出现在末尾
+        last = max(s.index for s in chosen)
+        filler = next((s for s in ranked if s.kind != "heading" and s.index > last
+                       and not _redundant(s, chosen)), None)
+        if filler is not None:
+            room = max_chars - length
+            text = filler.text if len(filler.text) < room else filler.text[:room - 1] + "…"
+            chosen.append(Sentence(text, filler.index, filler.kind))
+
+    if not chosen:
+        # 单句都超过上限时截取得分最高的句子
+        best = next((s for s in ranked if s.kind != "heading"), None)
+        if best is None:
+            return f"深度解析：{title}" if title else ""
+        return best.text[:max_chars - 1] + "…"
+
+    digest = "".join(s.text for s in sorted(chosen, key=lambda s: s.index))
+    if not re.search(r'[。！？!?…]$', digest):
+        digest = digest.rstrip("；;，,、") + "。"
+    return digest
+
+
+def polish_prompt(markdown: str, title: str, count: int = 6) -> str:
+    """润色模式的用户提示词：只包含候选句"""
+    candidates = "\n".join(f"- {text}" for text in candidate_sentences(markdown, title, count))
+    return (f"以下是从文章中抽取的关键句，请据此改写为 50-100 字的微信推送摘要，只输出摘要本身。\n\n"
+            f"【文章标题】：{title}\n【关键句】：\n{candidates}")
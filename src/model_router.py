@@ -0,0 +1,252 @@
+"""
+模型回退链与延迟路由
+
+WRITER_MODEL / LAYOUT_MODEL 可以配置为按优先级排列的模型列表，每个模型带自己的超时：
+    WRITER_MODEL=anthropic/claude-opus-4.5@600, anthropic/claude-sonnet-4.5@300
+（省略 @秒数 时使用 LLM_TIMEOUT）
+
+- 每次成功或超时的耗时按 (模型, 阶段) 记录到磁盘，保留最近 MODEL_STATS_WINDOW 次，
+  据此估算滚动 p50 / p95
+- 截止时间：样本足够时取 min(配置超时, p95 × MODEL_DEADLINE_P95_FACTOR)，
+  不低于 MODEL_DEADLINE_MIN；链上最后一个模型始终使用完整的配置超时
+- p50 已超过配置超时的模型排到链尾
+- 超过截止时间或请求失败时切换到下一个模型
+- 流式请求在收到首个 token 前适用截止时间，开始输出后不再切换
+- 对冲（LLM_HEDGE_STAGES 中的非流式阶段，如 digest）：首选模型超过其 p95 仍未返回时，
+  向链上的下一个模型（没有则同一模型）再发一次请求，先成功者胜出，另一个立即取消；
+  每天的对冲次数受 LLM_HEDGE_DAILY_MAX 限制
+
+实际服务每个阶段的模型记录在 served_models() 中（按文章隔离，见 track_served_models）。
+
+使用方式：
+    from src.model_router import get_model_router
+
+    text = await get_model_router().chat(base_url, api_key, Config.WRITER_MODEL, system, user, stage="writer")
+"""
+
+import asyncio
+import contextvars
+from typing import Dict, List, Optional, Tuple
+
+from .config import Config
+from .latency_stats import get_latency_stats
+from .llm_client import get_llm_client
+
+# 样本少于该数量时不按延迟调整
+MIN_SAMPLES = 5
+
+_served_models: contextvars.ContextVar = contextvars.ContextVar("served_models", default=None)
+
+
+def track_served_models() -> Dict[str, str]:
+    """为当前文章开始记录各阶段实际使用的模型
+
+    在启动流水线之前调用；之后创建的阶段任务继承同一个字典。
+    """
+    served: Dict[str, str] = {}
+    _served_models.set(served)
+    return served
+
+
+def served_models() -> Dict[str, str]:
+    return _served_models.get() or {}
+
+
+def _record_served(stage: Optional[str], model: str):
+    served = _served_models.get()
+    if served is not None and stage:
+        served[stage] = model
+
+
+def parse_model_chain(value: str, default_timeout: Optional[float] = None) -> List[Tuple[str, float]]:
+    """解析 "模型@超时, 模型@超时"，返回 [(模型, 超时秒数)]"""
+    default_timeout = default_timeout or Config.LLM_TIMEOUT
+    chain = []
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        model, _, timeout = item.rpartition("@")
+        if not model:
+            model, timeout = timeout, ""
+        try:
+            chain.append((model.strip(), float(timeout) if timeout else default_timeout))
+        except ValueError:
+            chain.append((item, default_timeout))
+    return chain
+
+
+class ModelRouter:
+    """按延迟估计排序模型链，超时或失败时切换到下一个模型"""
+
+    def __init__(self, stats=None):
+        self.stats = stats or get_latency_stats()
+        self.hedges_fired = 0
+        self.hedges_won = 0
+
+    def plan(self, models: str, stage: str) -> List[Tuple[str, float]]:
+        """返回按尝试顺序排列的 [(模型, 截止秒数)]"""
+        ranked = []
+        for index, (model, timeout) in enumerate(parse_model_chain(models)):
+            p50, p95, samples = self.stats.percentiles(model, stage)
+            deadline = timeout
+            slow = False
+            if samples >= MIN_SAMPLES:
+                if Config.MODEL_DEADLINE_P95_FACTOR > 0:
+                    deadline = min(timeout, max(p95 * Config.MODEL_DEADLINE_P95_FACTOR, Config.MODEL_DEADLINE_MIN))
+                slow = p50 >= timeout
+            ranked.append((slow, index, model, deadline, timeout))
+        ranked.sort()
+        plan = [(model, deadline) for _, _, model, deadline, _ in ranked]
+        if plan:
+            # 最后一个候选没有退路，使用完整超时
+            plan[-1] = (plan[-1][0], ranked[-1][4])
+        return plan
+
+    async def _on_failure(self, model: str, stage: Optional[str], deadline: float,
+                          error: BaseException, last: bool):
+        if isinstance(error, asyncio.TimeoutError):
+            await asyncio.to_thread(self.stats.record, model, stage or "default", deadline, False)
+            reason = f"超过 {deadline:.0f} 秒"
+        else:
+            reason = str(error) or type(error).__name__
+        if not last:
+            print(f"   [模型] {model} {reason}，切换到下一个模型")
+
+    def hedged(self, stage: Optional[str]) -> bool:
+        stages = {item.strip() for item in Config.LLM_HEDGE_STAGES.split(",") if item.strip()}
+        return bool(stage) and stage in stages
+
+    def hedge_delay(self, model: str, stage: str) -> float:
+        """发出对冲请求前的等待时间：该模型在该阶段的 p95"""
+        _, p95, samples = self.stats.percentiles(model, stage)
+        return p95 if samples >= MIN_SAMPLES else Config.LLM_HEDGE_DELAY
+
+    async def _hedged_chat(self, plan: List[Tuple[str, float]], request, stage: str,
+                           tried: set) -> Tuple[str, str]:
+        """首选模型超过 p95 未返回时发出对冲请求，返回 (模型, 回复)"""
+        primary, deadline = plan[0]
+        backup, backup_deadline = plan[1] if len(plan) > 1 else plan[0]
+        delay = await asyncio.to_thread(self.hedge_delay, primary, stage)
+
+        tried.add(primary)
+        first = asyncio.create_task(asyncio.wait_for(request(primary), timeout=deadline))
+        tasks = {first: (primary, deadline)}
+        try:
+            await asyncio.wait({first}, timeout=delay)
+            if not first.done() and await asyncio.to_thread(self.stats.take_hedge, Config.LLM_HEDGE_DAILY_MAX):
+                self.hedges_fired += 1
+                print(f"   [对冲] {primary} {delay:.1f} 秒未返回，向 {backup} 发出对冲请求")
+                tried.add(backup)
+                hedge = asyncio.create_task(asyncio.wait_for(request(backup), timeout=backup_deadline))
+                tasks[hedge] = (backup, backup_deadline)
+
+            error: Optional[BaseException] = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    model, task_deadline = tasks[task]
+                    if task.exception() is None:
+                        if task is not first:
+                            self.hedges_won += 1
+                        return model, task.result()
+                    error = task.exception()
+                    await self._on_failure(model, stage, task_deadline, error, last=False)
+            raise error
+        finally:
+            losers = [task for task in tasks if not task.done()]
+            for task in losers:
+                task.cancel()
+            await asyncio.gather(*losers, return_exceptions=True)
+
+    def hedge_report(self) -> str:
+        if not self.hedges_fired:
+            return ""
+        return f"   对冲请求 {self.hedges_fired} 次，其中 {self.hedges_won} 次对冲请求先返回"
+
+    async def chat(self, base_url: str, api_key: str, models: str,
+                   system_prompt: str, user_prompt: str,
+                   max_tokens: int = 4000, temperature: float = 0.7,
+                   stage: Optional[str] = None) -> str:
+        """按模型链调用 chat，返回第一个成功的回复"""
+        def request(model: str):
+            return get_llm_client().chat(base_url, api_key, model, system_prompt, user_prompt,
+                                         max_tokens=max_tokens, temperature=temperature, stage=stage)
+
+        error: Optional[BaseException] = None
+        plan = await asyncio.to_thread(self.plan, models, stage or "default")
+        tried: set = set()
+        if plan and self.hedged(stage):
+            try:
+                model, text = await self._hedged_chat(plan, request, stage, tried)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error = e
+            else:
+                _record_served(stage, model)
+                return text
+
+        for position, (model, deadline) in enumerate(plan):
+            if model in tried:
+                continue
+            last = position == len(plan) - 1
+            try:
+                text = await asyncio.wait_for(request(model), timeout=deadline)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error = e
+                await self._on_failure(model, stage, deadline, e, last)
+                continue
+            _record_served(stage, model)
+            return text
+        raise error or ValueError(f"模型列表为空: {models!r}")
+
+    async def stream(self, base_url: str, api_key: str, models: str,
+                     system_prompt: str, user_prompt: str, watcher,
+                     max_tokens: int = 4000, temperature: float = 0.7,
+                     stage: Optional[str] = None) -> str:
+        """按模型链流式调用，增量推送给 watcher，返回完整文本
+
+        首个 token 到达前超时或失败则切换模型；开始输出后由该模型完成。
+        """
+        error: Optional[BaseException] = None
+        plan = await asyncio.to_thread(self.plan, models, stage or "default")
+        for position, (model, deadline) in enumerate(plan):
+            last = position == len(plan) - 1
+            stream = get_llm_client().stream_chat(base_url, api_key, model, system_prompt, user_prompt,
+                                                  max_tokens=max_tokens, temperature=temperature, stage=stage)
+            deltas = stream.__aiter__()
+            try:
+                first = await asyncio.wait_for(deltas.__anext__(), timeout=deadline)
+            except StopAsyncIteration:
+                first = ""
+            except asyncio.CancelledError:
+                await deltas.aclose()
+                raise
+            except Exception as e:
+                await deltas.aclose()
+                error = e
+                await self._on_failure(model, stage, deadline, e, last)
+                continue
+
+            await watcher.feed(first)
+            async for delta in deltas:
+                await watcher.feed(delta)
+            await watcher.close()
+            _record_served(stage, model)
+            return watcher.text
+        raise error or ValueError(f"模型列表为空: {models!r}")
+
+
+# 全局单例
+_model_router_instance = None
+
+
+def get_model_router() -> ModelRouter:
+    global _model_router_instance
+    if _model_router_instance is None:
+        _model_router_instance = ModelRouter()
+    return _model_router_instance
@@ -0,0 +1,169 @@
+"""
+声明式阶段图 (DAG) 执行器
+
+每个阶段声明自己的输入和输出，执行器用 asyncio 并发调度：
+一个阶段的所有输入就绪后立即开始，互不依赖的阶段同时运行，
+整体耗时约等于关键路径而不是所有阶段之和。
+
+使用方式：
+    pipeline = Pipeline([
+        Stage("write", write, inputs=["topic"], outputs=["markdown"]),
+        Stage("images", images, inputs=["topic"], outputs=["thumb_media_id", "cdn_urls"]),
+        Stage("digest", digest, inputs=["markdown"], outputs=["digest"]),
+    ])
+    result = await pipeline.run({"topic": topic})
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+
+class PipelineError(Exception):
+    """阶段执行失败"""
+
+    def __init__(self, stage: str, error: BaseException):
+        self.stage = stage
+        self.error = error
+        super().__init__(f"阶段 {stage} 失败: {error}")
+
+
+@dataclass
+class Stage:
+    """流水线阶段
+
+    func 以输入名为关键字参数调用；单输出阶段直接返回值，
+    多输出阶段返回与 outputs 顺序一致的 tuple，或以输出名为键的 dict。
+    """
+    name: str
+    func: Callable[..., Awaitable[Any]]
+    inputs: List[str] = field(default_factory=list)
+    outputs: List[str] = field(default_factory=list)
+
+
+class Pipeline:
+    """按依赖关系并发执行阶段"""
+
+    def __init__(self, stages: List[Stage]):
+        self.stages = stages
+        self.timings: Dict[str, tuple] = {}
+        self.skipped: List[str] = []
+        self._validate()
+
+    def _validate(self):
+        names = set()
+        producers = {}
+        for stage in self.stages:
+            if stage.name in names:
+                raise ValueError(f"阶段名重复: {stage.name}")
+            names.add(stage.name)
+            for key in stage.outputs:
+                if key in producers:
+                    raise ValueError(f"输出 {key} 同时由 {producers[key]} 和 {stage.name} 产生")
+                producers[key] = stage.name
+
+        # 环检测：沿输入反向遍历
+        visiting, done = set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"阶段依赖存在环: {name}")
+            visiting.add(name)
+            stage = next(s for s in self.stages if s.name == name)
+            for key in stage.inputs:
+                if key in producers:
+                    visit(producers[key])
+            visiting.discard(name)
+            done.add(name)
+
+        for stage in self.stages:
+            visit(stage.name)
+
+    @staticmethod
+    def _unpack(stage: Stage, result: Any) -> Dict[str, Any]:
+        if len(stage.outputs) == 0:
+            return {}
+        if len(stage.outputs) == 1:
+            return {stage.outputs[0]: result}
+        if isinstance(result, dict):
+            return {key: result[key] for key in stage.outputs}
+        if isinstance(result, (tuple, list)) and len(result) == len(stage.outputs):
+            return dict(zip(stage.outputs, result))
+        raise ValueError(f"阶段 {stage.name} 返回值与输出 {stage.outputs} 不匹配")
+
+    async def run(self, initial: Optional[Dict[str, Any]] = None,
+                  on_stage_done: Optional[Callable[[str, Dict[str, Any]], Any]] = None) -> Dict[str, Any]:
+        """执行流水线
+
+        initial 中已提供全部输出的阶段会被跳过（例如外部传入文章、断点续写）；
+        只提供了部分输出的阶段会重跑，其已有输出被丢弃。
+        on_stage_done(stage_name, outputs) 在每个阶段成功后调用，可用于保存检查点。
+        任一阶段失败时取消其余阶段并抛出 PipelineError。
+        """
+        context: Dict[str, Any] = dict(initial or {})
+        loop = asyncio.get_running_loop()
+        futures: Dict[str, asyncio.Future] = {}
+
+        pending = [stage for stage in self.stages
+                   if not (stage.outputs and all(key in context for key in stage.outputs))]
+        # 只提供了部分输出的阶段整体重跑：丢弃已有的部分输出，下游等待重跑结果
+        for stage in pending:
+            for key in stage.outputs:
+                context.pop(key, None)
+
+        for key, value in context.items():
+            futures[key] = loop.create_future()
+            futures[key].set_result(value)
+        for stage in pending:
+            for key in stage.outputs:
+                futures[key] = loop.create_future()
+
+        for stage in pending:
+            missing = [key for key in stage.inputs if key not in futures]
+            if missing:
+                raise ValueError(f"阶段 {stage.name} 缺少输入: {missing}")
+
+        started = time.monotonic()
+
+        async def execute(stage: Stage):
+            kwargs = {key: await futures[key] for key in stage.inputs}
+            begin = time.monotonic() - started
+            try:
+                result = await stage.func(**kwargs)
+                outputs = self._unpack(stage, result)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                raise PipelineError(stage.name, e) from e
+            self.timings[stage.name] = (begin, time.monotonic() - started)
+            if on_stage_done is not None:
+                saved = on_stage_done(stage.name, outputs)
+                if asyncio.iscoroutine(saved):
+                    await saved
+            for key, value in outputs.items():
+                context[key] = value
+                if not futures[key].done():
+                    futures[key].set_result(value)
+
+        self.skipped = [stage.name for stage in self.stages if stage not in pending]
+        tasks = [asyncio.create_task(execute(stage), name=stage.name) for stage in pending]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        return context
+
+    def report(self) -> str:
+        """各阶段起止时间（秒，相对流水线开始）"""
+        lines = []
+        for name, (begin, end) in sorted(self.timings.items(), key=lambda item: item[1][0]):
+            lines.append(f"   {name:<10} {begin:7.1f}s -> {end:7.1f}s ({end - begin:.1f}s)")
+        for name in self.skipped:
+            lines.append(f"   {name:<10} 已跳过（产出已存在）")
+        return "\n".join(lines)
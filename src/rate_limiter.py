@@ -0,0 +1,158 @@
+"""
+按模型限流 - 请求数 (RPM) 与估算 token 数 (TPM) 双令牌桶
+
+批量写作时所有协程共享同一组令牌桶，请求在发出前排队等待令牌，
+整体吞吐稳定在服务商允许的速率，而不是先打满再被 429 打回。
+
+- 令牌按速率连续补充，桶容量为一分钟的额度
+- 等待按先来先到排队，不会有请求一直抢不到
+- TPM 先按提示词长度 + max_tokens 预扣，响应返回后按实际用量多退少补
+- 收到 429 时整个桶暂停 Retry-After 秒，所有等待者一起退让
+
+配置 (config/setting.txt)：
+    RATE_LIMIT_RPM=0             # 未单独配置的模型，0 表示不限
+    RATE_LIMIT_TPM=0
+    MODEL_RATE_LIMITS=anthropic/claude-opus-4.5=50/80000;qwen/qwen-image(free)=10
+
+使用方式：
+    from src.rate_limiter import get_rate_limiter, estimate_tokens
+
+    limiter = get_rate_limiter(model)
+    reserved = await limiter.acquire(estimate_tokens(prompt) + max_tokens)
+    ...
+    limiter.settle(reserved, usage["total_tokens"])
+"""
+
+import asyncio
+import time
+from typing import Dict, Optional, Tuple
+
+from .config import Config
+from .resilience import retry_after_of, status_of
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：中文等非 ASCII 字符约 1 token/字，ASCII 约 4 字符/token"""
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    return (len(text) - ascii_chars) + ascii_chars // 4 + 1
+
+
+def parse_model_limits(value: str) -> Dict[str, Tuple[float, float]]:
+    """解析 MODEL_RATE_LIMITS：模型=RPM/TPM，多个模型用分号分隔，TPM 可省略"""
+    limits = {}
+    for entry in value.split(";"):
+        entry = entry.strip()
+        if not entry or "=" not in entry:
+            continue
+        model, spec = entry.rsplit("=", 1)
+        rpm, _, tpm = spec.partition("/")
+        try:
+            limits[model.strip()] = (float(rpm or 0), float(tpm or 0))
+        except ValueError:
+            print(f"   [限流] 无法解析 MODEL_RATE_LIMITS 项: {entry}")
+    return limits
+
+
+class TokenBucket:
+    """令牌桶（每分钟 rate 个令牌，容量为一分钟额度）"""
+
+    def __init__(self, rate_per_minute: float):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = rate_per_minute
+        self.tokens = rate_per_minute
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def unlimited(self) -> bool:
+        return self.rate <= 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _get_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        return self._lock
+
+    async def acquire(self, amount: float = 1) -> float:
+        """取出 amount 个令牌，返回等待秒数"""
+        if self.unlimited:
+            return 0.0
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        # 锁保证先来先到：队首取到令牌之前，后面的请求不会插队
+        async with self._get_lock():
+            while True:
+                self._refill()
+                delay = max(self.paused_until - time.monotonic(), 0.0)
+                if not delay and self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                delay = delay or (amount - self.tokens) / self.rate
+                waited += delay
+                await asyncio.sleep(delay)
+
+    def adjust(self, amount: float):
+        """按实际用量补扣 (amount > 0) 或退还 (amount < 0)，允许暂时透支"""
+        if self.unlimited:
+            return
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+    def pause(self, seconds: float):
+        """暂停发放令牌（服务端限流时退让）"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class ModelRateLimiter:
+    """单个模型的 RPM + TPM 限流器"""
+
+    def __init__(self, model: str, rpm: float, tpm: float):
+        self.model = model
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+
+    async def acquire(self, estimated_tokens: int = 0) -> int:
+        """等待一个请求名额和预估 token 额度，返回预扣的 token 数"""
+        waited = await self.requests.acquire(1)
+        if estimated_tokens:
+            waited += await self.tokens.acquire(estimated_tokens)
+        if waited >= 1:
+            print(f"   [限流] {self.model} 排队等待 {waited:.1f} 秒")
+        return estimated_tokens
+
+    def settle(self, reserved: int, actual: Optional[int]):
+        """响应返回后按实际 token 用量修正预扣额度"""
+        if actual is not None and reserved:
+            self.tokens.adjust(actual - reserved)
+
+    def observe(self, error: BaseException):
+        """请求失败时调用：429 触发退避"""
+        if status_of(error) == 429:
+            self.throttled(retry_after_of(error))
+
+    def throttled(self, retry_after: Optional[float] = None):
+        """服务端返回 429：所有等待该模型的请求一起退让"""
+        seconds = retry_after if retry_after is not None else 60.0 / max(self.requests.capacity, 1)
+        self.requests.pause(seconds)
+        self.tokens.pause(seconds)
+
+
+# 全局单例（按模型区分）
+_rate_limiters: Dict[str, ModelRateLimiter] = {}
+
+
+def get_rate_limiter(model: str) -> ModelRateLimiter:
+    if model not in _rate_limiters:
+        rpm, tpm = parse_model_limits(Config.MODEL_RATE_LIMITS).get(
+            model, (Config.RATE_LIMIT_RPM, Config.RATE_LIMIT_TPM)
+        )
+        _rate_limiters[model] = ModelRateLimiter(model, rpm, tpm)
+    return _rate_limiters[model]
@@ -0,0 +1,274 @@
+"""
+重试 / 退避 / 熔断 - LLM 与图片接口共用的容错层
+
+- 指数退避 + 随机抖动 (full jitter)，避免并发请求同时重试
+- 尊重服务端返回的 Retry-After
+- 按接口地址熔断：连续失败达到阈值后在冷却期内直接失败，
+  冷却结束放行一个试探请求，成功则恢复
+- 记录每个接口的调用、重试、失败和熔断次数
+
+可重试：429、408、5xx、连接/超时错误、RetryableError；
+其他 4xx 视为请求本身有误，直接抛出且不计入熔断。
+
+使用方式：
+    from src.resilience import call_with_retry
+
+    data = await call_with_retry(url, lambda: post(url, payload))
+"""
+
+import asyncio
+import email.utils
+import random
+import time
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+import httpx
+
+from .config import Config
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class RetryableError(Exception):
+    """可重试的错误（例如接口返回的错误载荷）"""
+
+    def __init__(self, message: str, status: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(Exception):
+    """接口处于熔断状态"""
+
+    def __init__(self, endpoint: str, remaining: float):
+        self.endpoint = endpoint
+        self.remaining = remaining
+        super().__init__(f"{endpoint} 已熔断，{remaining:.0f} 秒后重试")
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After（秒数或 HTTP 日期）"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def status_of(error: BaseException) -> Optional[int]:
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code
+    if isinstance(error, RetryableError):
+        return error.status
+    status = getattr(error, "status", None)  # aiohttp.ClientResponseError
+    return status if isinstance(status, int) else None
+
+
+def retry_after_of(error: BaseException) -> Optional[float]:
+    if isinstance(error, RetryableError):
+        return error.retry_after
+    if isinstance(error, httpx.HTTPStatusError):
+        return parse_retry_after(error.response.headers.get("Retry-After"))
+    headers = getattr(error, "headers", None)  # aiohttp.ClientResponseError
+    if headers:
+        return parse_retry_after(headers.get("Retry-After"))
+    return None
+
+
+def describe(error: BaseException) -> str:
+    status = status_of(error)
+    if status is not None and not isinstance(error, RetryableError):
+        return f"HTTP {status}"
+    return str(error) or type(error).__name__
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, RetryableError):
+        return True
+    status = status_of(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    if isinstance(error, (httpx.TransportError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    try:
+        import aiohttp
+        return isinstance(error, aiohttp.ClientError)
+    except ImportError:
+        return False
+
+
+def counts_as_failure(error: BaseException) -> bool:
+    """是否计入熔断：限流 (429) 说明服务可用，不计入"""
+    return is_retryable(error) and status_of(error) != 429
+
+
+class CircuitBreaker:
+    """单个接口的熔断器"""
+
+    def __init__(self, endpoint: str,
+                 failure_threshold: Optional[int] = None,
+                 reset_timeout: Optional[float] = None):
+        self.endpoint = endpoint
+        self.failure_threshold = failure_threshold or Config.CIRCUIT_FAILURE_THRESHOLD
+        self.reset_timeout = reset_timeout if reset_timeout is not None else Config.CIRCUIT_RESET_SECONDS
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_call(self) -> bool:
+        """放行返回是否为半开状态下的试探请求；熔断中抛出 CircuitOpenError"""
+        state = self.state
+        if state == "open" or (state == "half_open" and self._probing):
+            remaining = max(self.reset_timeout - (time.monotonic() - self.opened_at), 0.0)
+            get_retry_metrics().record(self.endpoint, "rejected")
+            raise CircuitOpenError(self.endpoint, remaining)
+        if state == "half_open":
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self):
+        if self.opened_at is not None:
+            print(f"   [RETRY] {self.endpoint} 已恢复，熔断关闭")
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def release_probe(self):
+        """试探请求以非服务故障结束（如 4xx），允许下一个请求继续试探"""
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                print(f"   [RETRY] {self.endpoint} 连续失败 {self.failures} 次，熔断 {self.reset_timeout:.0f} 秒")
+                get_retry_metrics().record(self.endpoint, "opened")
+            self.opened_at = time.monotonic()
+
+
+class RetryMetrics:
+    """各接口的调用 / 重试 / 失败 / 熔断计数"""
+
+    FIELDS = ("calls", "retries", "failures", "opened", "rejected")
+
+    def __init__(self):
+        self.counters: Dict[str, Dict[str, int]] = {}
+
+    def record(self, endpoint: str, field: str, count: int = 1):
+        counters = self.counters.setdefault(endpoint, dict.fromkeys(self.FIELDS, 0))
+        counters[field] += count
+
+    def report(self) -> str:
+        lines = []
+        for endpoint, c in self.counters.items():
+            lines.append(
+                f"   {endpoint}: 调用 {c['calls']}，重试 {c['retries']}，失败 {c['failures']}，"
+                f"熔断 {c['opened']}，快速失败 {c['rejected']}"
+            )
+        return "\n".join(lines)
+
+    def has_retries(self) -> bool:
+        return any(c["retries"] or c["failures"] or c["rejected"] for c in self.counters.values())
+
+
+class Retrier:
+    """一次调用的重试状态，供无法包装成单个协程的场景（如流式响应）直接使用"""
+
+    def __init__(self, endpoint: str,
+                 max_attempts: Optional[int] = None,
+                 base_delay: Optional[float] = None,
+                 max_delay: Optional[float] = None,
+                 model: Optional[str] = None):
+        # 同一地址后的不同模型各自熔断，首选模型故障不会连带拒绝回退模型
+        self.endpoint = f"{endpoint} [{model}]" if model else endpoint
+        self.max_attempts = max_attempts or Config.RETRY_MAX_ATTEMPTS
+        self.base_delay = base_delay if base_delay is not None else Config.RETRY_BASE_DELAY
+        self.max_delay = max_delay if max_delay is not None else Config.RETRY_MAX_DELAY
+        self.breaker = get_circuit_breaker(self.endpoint)
+        self.attempt = 0
+        self.probing = False
+
+    def before_call(self):
+        self.probing = self.breaker.before_call()
+        self.attempt += 1
+        get_retry_metrics().record(self.endpoint, "calls")
+
+    def on_success(self):
+        self.breaker.record_success()
+
+    def on_cancel(self):
+        """调用被取消（超时、对冲落败）：不计成败，但要释放本次持有的试探名额"""
+        if self.probing:
+            self.breaker.release_probe()
+            self.probing = False
+
+    async def on_error(self, error: BaseException):
+        """失败后等待退避时间；不可重试或次数用尽时重新抛出"""
+        if counts_as_failure(error):
+            self.breaker.record_failure()
+        else:
+            self.breaker.release_probe()
+        if not is_retryable(error) or self.attempt >= self.max_attempts:
+            if is_retryable(error):
+                get_retry_metrics().record(self.endpoint, "failures")
+            raise error
+
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (self.attempt - 1)))
+        retry_after = retry_after_of(error)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, Config.RETRY_AFTER_MAX))
+        get_retry_metrics().record(self.endpoint, "retries")
+        print(f"   [RETRY] {self.endpoint} 第 {self.attempt} 次失败 ({describe(error)})，{delay:.1f} 秒后重试")
+        await asyncio.sleep(delay)
+
+
+async def call_with_retry(endpoint: str, func: Callable[[], Awaitable[T]], **kwargs) -> T:
+    """执行 func()，按策略重试，并经过 endpoint（指定 model 时为 endpoint + 模型）的熔断器"""
+    retrier = Retrier(endpoint, **kwargs)
+    while True:
+        retrier.before_call()
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            retrier.on_cancel()
+            raise
+        except Exception as e:
+            await retrier.on_error(e)
+            continue
+        retrier.on_success()
+        return result
+
+
+# 全局状态（按接口地址 + 模型区分）
+_circuit_breakers: Dict[str, CircuitBreaker] = {}
+_retry_metrics = RetryMetrics()
+
+
+def get_circuit_breaker(endpoint: str) -> CircuitBreaker:
+    if endpoint not in _circuit_breakers:
+        _circuit_breakers[endpoint] = CircuitBreaker(endpoint)
+    return _circuit_breakers[endpoint]
+
+
+def get_retry_metrics() -> RetryMetrics:
+    return _retry_metrics
@@ -0,0 +1,162 @@
+"""
+分节并行写作 - 先生成大纲，再并发写各小节
+
+整篇文章一次生成（8000 token）是流水线上最长的串行步骤。分节模式分两步：
+
+1. 大纲：一次较短的调用，返回 JSON 格式的开头要点、各小节二级标题、要点和配图占位符位置
+2. 小节：以完整大纲为共同上下文，开头和每个小节同时调用写作模型，完成后按大纲顺序拼接
+
+写作耗时约为原来的 1 / 小节数（受限流和并发上限影响）。
+大纲解析失败时抛出 OutlineError，调用方可退回整篇写作。
+
+配置 (config/setting.txt)：
+    WRITER_MODE=sections          # single（默认）整篇写作；sections 分节并行写作
+    WRITER_OUTLINE_MODEL=         # 大纲模型，留空使用 WRITER_MODEL
+
+使用方式：
+    from src.sectioned_writer import write_by_outline
+
+    article = await write_by_outline(base_url, api_key, Config.WRITER_MODEL, system, topic)
+"""
+
+import asyncio
+import json
+import re
+from typing import Callable, Dict, List, Optional
+
+from .config import Config
+from .model_router import get_model_router
+
+PLACEHOLDER_PATTERN = re.compile(r'\[IMAGE_PLACEHOLDER_(\d+)\]')
+HEADING_PATTERN = re.compile(r'^#{1,2}\s+.*$', re.MULTILINE)
+
+OUTLINE_INSTRUCTION = """请先为这篇文章设计大纲，只输出一个 JSON 对象，不要输出其他内容：
+{{
+  "intro": "开头段落要写的内容（不带标题）",
+  "sections": [
+    {{"heading": "二级标题文字", "points": ["要点1", "要点2"], "images": [0]}}
+  ]
+}}
+
+要求：
+1. sections 共 {sections} 个，标题吸引人、逻辑连贯，最后一节收尾
+2. 配图占位符编号为 0 到 {last_image}，每个编号恰好分配到一个小节的 images 中，不要放在第一节
+3. heading 不要带 "##" 和序号"""
+
+SECTION_INSTRUCTION = """全文大纲如下（其他部分由其他作者同时撰写，你只负责其中一部分）：
+{outline}
+
+现在请只写{part}。
+要求：
+1. 约 {chars} 字，与大纲中前后部分自然衔接，不要重复其他部分的内容
+2. {heading_rule}
+3. {image_rule}
+4. 直接输出正文，不要有任何开场白或总结性说明"""
+
+
+class OutlineError(ValueError):
+    """大纲无法解析"""
+
+
+def parse_outline(text: str, images: int) -> Dict:
+    """从模型回复中提取大纲 JSON，并校验小节与配图占位符"""
+    match = re.search(r'\{.*\}', text, re.DOTALL)
+    if not match:
+        raise OutlineError("大纲中没有 JSON")
+    try:
+        outline = json.loads(match.group(0))
+    except json.JSONDecodeError as e:
+        raise OutlineError(f"大纲 JSON 无效: {e}") from e
+
+    sections = []
+    for item in outline.get("sections") or []:
+        if not isinstance(item, dict) or not str(item.get("heading", "")).strip():
+            continue
+        sections.append({
+            "heading": str(item["heading"]).strip().lstrip("#").strip(),
+            "points": [str(p) for p in item.get("points") or []],
+            "images": [],
+        })
+        for index in item.get("images") or []:
+            if isinstance(index, int) and 0 <= index < images:
+                sections[-1]["images"].append(index)
+    if len(sections) < 2:
+        raise OutlineError("大纲小节少于 2 个")
+
+    # 每个占位符只保留第一次出现；缺失的按顺序补到后面的小节
+    seen = set()
+    for section in sections:
+        section["images"] = [i for i in section["images"] if not (i in seen or seen.add(i))]
+    missing = [i for i in range(images) if i not in seen]
+    for offset, index in enumerate(missing):
+        sections[min(1 + offset, len(sections) - 1)]["images"].append(index)
+
+    return {"intro": str(outline.get("intro") or "").strip(), "sections": sections}
+
+
+def format_outline(outline: Dict) -> str:
+    lines = [f"开头：{outline['intro'] or '引出主题'}"]
+    for number, section in enumerate(outline["sections"], 1):
+        points = "；".join(section["points"])
+        lines.append(f"{number}. {section['heading']}" + (f"：{points}" if points else ""))
+    return "\n".join(lines)
+
+
+def clean_section(text: str, heading: Optional[str], images: List[int]) -> str:
+    """去掉模型自带的标题和不属于本节的占位符，补上缺失的占位符"""
+    body = HEADING_PATTERN.sub("", text).strip()
+    body = PLACEHOLDER_PATTERN.sub(lambda m: m.group(0) if int(m.group(1)) in images else "", body)
+    for index in images:
+        if f"[IMAGE_PLACEHOLDER_{index}]" not in body:
+            body += f"\n\n[IMAGE_PLACEHOLDER_{index}]"
+    body = re.sub(r'\n{3,}', '\n\n', body).strip()
+    return f"## {heading}\n\n{body}" if heading else body
+
+
+async def write_by_outline(base_url: str, api_key: str, model: str, system_prompt: str, topic: str,
+                           sections: int = 4, images: int = 3, total_chars: int = 1800,
+                           on_section: Optional[Callable[[str, str], None]] = None) -> str:
+    """分节并行写作，返回拼接后的 Markdown
+
+    Args:
+        system_prompt: 整篇写作使用的系统提示词（写作规范、账号定位、主题）
+        sections: 期望的二级标题数量
+        images: 配图占位符数量（编号 0 到 images - 1）
+        total_chars: 全文目标字数
+        on_section: 每部分写完后调用 on_section(标题, 正文)，开头部分标题为空
+    """
+    router = get_model_router()
+    outline_model = Config.WRITER_OUTLINE_MODEL or model
+
+    outline_user = OUTLINE_INSTRUCTION.format(sections=sections, last_image=images - 1)
+    text = await router.chat(base_url, api_key, outline_model, system_prompt,
+                             f"主题：{topic}\n\n{outline_user}",
+                             max_tokens=1500, temperature=0.5, stage="outline")
+    outline = parse_outline(text, images)
+    outline_text = format_outline(outline)
+    print(f"   [写作] 大纲完成：{len(outline['sections'])} 个小节，开始并行写作")
+
+    chars = max(200, total_chars // (len(outline["sections"]) + 1))
+    parts = [(None, "开头部分（引出主题，不带标题）", [])]
+    for number, section in enumerate(outline["sections"], 1):
+        parts.append((section["heading"], f"第 {number} 节「{section['heading']}」", section["images"]))
+
+    async def write_part(heading: Optional[str], part: str, part_images: List[int]) -> str:
+        heading_rule = "不要输出标题" if heading is None else "不要输出小节标题，标题会自动添加"
+        if part_images:
+            markers = "、".join(f"[IMAGE_PLACEHOLDER_{i}]" for i in part_images)
+            image_rule = f"在合适的段落之间单独一行插入 {markers}"
+        else:
+            image_rule = "不要插入任何配图占位符"
+        user = SECTION_INSTRUCTION.format(outline=outline_text, part=part, chars=chars,
+                                          heading_rule=heading_rule, image_rule=image_rule)
+        text = await router.chat(base_url, api_key, model, system_prompt,
+                                 f"主题：{topic}\n\n{user}",
+                                 max_tokens=Config.WRITER_SECTION_MAX_TOKENS, stage="section")
+        body = clean_section(text, heading, part_images)
+        if on_section:
+            on_section(heading or "", body)
+        return body
+
+    bodies = await asyncio.gather(*(write_part(*part) for part in parts))
+    return "\n\n".join(bodies) + "\n"
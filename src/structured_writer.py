@@ -0,0 +1,139 @@
+"""
+结构化写作 - 一次写作调用同时返回正文、摘要和配图提示词
+
+普通流程中摘要需要把整篇正文再上传一次做第二轮调用，配图提示词则是与文章无关的固定模板。
+结构化模式让写作模型直接输出 JSON：
+
+    {"title": "...", "body": "Markdown 正文", "digest": "50-100 字摘要",
+     "cover_prompt": "封面提示词", "image_prompts": ["占位符 0 的提示词", ...]}
+
+本地校验后拆分为 markdown 与 article_meta：
+- JSON 完好：摘要、配图提示词直接使用，省掉摘要调用
+- JSON 损坏但能取出正文：正文照常使用，摘要退回单独调用，配图使用默认提示词
+- 连正文都取不出：抛出 StructuredOutputError，调用方退回普通写作
+
+配置 (config/setting.txt)：
+    WRITER_MODE=structured
+
+使用方式：
+    from src.structured_writer import write_structured
+
+    markdown, meta = await write_structured(base_url, api_key, Config.WRITER_MODEL, system, topic)
+    meta.get("digest"), meta.get("cover_prompt"), meta.get("image_prompts")
+"""
+
+import json
+import re
+from typing import Dict, List, Optional, Tuple
+
+from .model_router import get_model_router
+
+PLACEHOLDER_PATTERN = re.compile(r'\[IMAGE_PLACEHOLDER_(\d+)\]')
+
+STRUCTURED_INSTRUCTION = """请只输出一个 JSON 对象（不要代码块以外的任何文字），字段如下：
+{{
+  "title": "文章标题",
+  "body": "Markdown 正文（要求同上，含 {placeholders}）",
+  "digest": "50-100 字的微信推送摘要，纯文本",
+  "cover_prompt": "封面图的英文提示词：电影感宽画幅写实摄影，体现文章主题，不含文字",
+  "image_prompts": ["与 [IMAGE_PLACEHOLDER_0] 前后内容对应的英文插图提示词", ...]
+}}
+image_prompts 共 {images} 个，按占位符编号顺序排列，每个都要贴合该占位符所在段落的内容。"""
+
+COVER_SUFFIX = ", photorealistic, no text, --ar 2.35:1"
+IMAGE_SUFFIX = ", photorealistic, no text, --ar 4:3"
+
+
+class StructuredOutputError(ValueError):
+    """结构化输出中取不到正文"""
+
+
+def clean_digest(text: str) -> str:
+    """与摘要阶段相同的清理：去掉 Markdown 符号和占位符，超长截断"""
+    digest = re.sub(r'[#*`>]|\[IMAGE_PLACEHOLDER_\d+\]', '', text)
+    digest = re.sub(r'\s+', ' ', digest).strip()
+    if len(digest) > 120:
+        digest = digest[:117] + "..."
+    return digest
+
+
+def _load_json(text: str) -> Optional[dict]:
+    match = re.search(r'\{.*\}', text, re.DOTALL)
+    if not match:
+        return None
+    try:
+        data = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _salvage_body(text: str) -> Optional[str]:
+    """JSON 损坏时尽量取出 body 字段的字符串"""
+    match = re.search(r'"body"\s*:\s*"((?:[^"\\]|\\.)*)"', text, re.DOTALL)
+    if not match:
+        return None
+    try:
+        return json.loads(f'"{match.group(1)}"')
+    except json.JSONDecodeError:
+        return None
+
+
+def _prompt(value, suffix: str) -> Optional[str]:
+    if not isinstance(value, str) or not value.strip():
+        return None
+    value = value.strip().rstrip(",.")
+    return value if "--ar" in value else value + suffix
+
+
+def parse_structured_article(text: str, images: int = 3) -> Tuple[str, Dict]:
+    """校验结构化输出，返回 (正文, article_meta)
+
+    article_meta 只包含通过校验的字段：title / digest / cover_prompt / image_prompts，
+    另有 structured 标记 JSON 是否完好。
+    """
+    data = _load_json(text)
+    if data is None:
+        body = _salvage_body(text)
+        if not body or len(body) < 100:
+            raise StructuredOutputError("写作结果不是有效的 JSON，且无法取出正文")
+        print("   [写作] 结构化输出 JSON 损坏，已取出正文，摘要将单独生成")
+        return body.strip(), {"structured": False}
+
+    body = data.get("body")
+    if not isinstance(body, str) or len(body.strip()) < 100:
+        raise StructuredOutputError("结构化输出缺少正文")
+    body = body.strip()
+
+    meta: Dict = {"structured": True}
+    if isinstance(data.get("title"), str) and data["title"].strip():
+        meta["title"] = data["title"].strip()
+
+    digest = clean_digest(data["digest"]) if isinstance(data.get("digest"), str) else ""
+    if len(digest) >= 20:
+        meta["digest"] = digest
+
+    cover = _prompt(data.get("cover_prompt"), COVER_SUFFIX)
+    if cover:
+        meta["cover_prompt"] = cover
+
+    prompts: List[Optional[str]] = [_prompt(p, IMAGE_SUFFIX) for p in data.get("image_prompts") or []]
+    if len(prompts) >= images and all(prompts[:images]):
+        meta["image_prompts"] = prompts[:images]
+
+    # 正文缺少的占位符补在末尾，保证每张插图都有位置
+    present = {int(i) for i in PLACEHOLDER_PATTERN.findall(body)}
+    for index in range(images):
+        if index not in present:
+            body += f"\n\n[IMAGE_PLACEHOLDER_{index}]"
+    return body, meta
+
+
+async def write_structured(base_url: str, api_key: str, model: str, system_prompt: str, topic: str,
+                           images: int = 3, max_tokens: int = 8000) -> Tuple[str, Dict]:
+    """一次调用写出正文、摘要与配图提示词，返回 (正文, article_meta)"""
+    placeholders = "、".join(f"[IMAGE_PLACEHOLDER_{i}]" for i in range(images))
+    user = f"主题：{topic}\n\n" + STRUCTURED_INSTRUCTION.format(placeholders=placeholders, images=images)
+    text = await get_model_router().chat(base_url, api_key, model, system_prompt, user,
+                                         max_tokens=max_tokens, stage="writer")
+    return parse_structured_article(text, images)
@@ -0,0 +1,138 @@
+"""
+微信上传去重登记 - 相同字节的图片不重复上传
+
+重试、断点续写、重新发布时图片字节往往完全相同，但每次都会重新上传，
+永久素材（material/add_material）还会占用素材库配额。这里按
+(公众号 AppID, 图片字节 SHA-256, 上传类型) 记录微信返回的 media_id / url：
+
+- 上传前查询，有有效记录时直接返回记录的结果，跳过上传
+- 临时素材（media/upload）3 天后失效，记录同步过期
+- 微信报告素材不存在（40007 无效 media_id）时调用 invalidate_media 作废记录，
+  下次运行会重新上传
+
+配置 (config/setting.txt)：
+    WECHAT_UPLOAD_DEDUP=true
+
+使用方式：
+    from src.upload_registry import get_upload_registry
+
+    registry = get_upload_registry()
+    result = registry.lookup(app_id, sha256, "material:thumb")
+    ...
+    registry.record(app_id, sha256, "material:thumb", result, size)
+"""
+
+import sqlite3
+import time
+from pathlib import Path
+from typing import Optional
+
+from .config import Config
+
+# 临时素材有效期 3 天，提前 1 小时视为过期
+TEMPORARY_TTL = 3 * 24 * 3600 - 3600
+
+# 无效 media_id（素材已删除或临时素材已过期）
+MEDIA_MISSING_CODES = (40007,)
+
+
+def is_media_missing(result) -> bool:
+    return isinstance(result, dict) and result.get("errcode") in MEDIA_MISSING_CODES
+
+
+def upload_kind(image_type: str, is_permanent: bool, is_article_image: bool) -> str:
+    """上传类型：uploadimg / material:<type> / media:<type>"""
+    if is_article_image:
+        return "uploadimg"
+    return f"{'material' if is_permanent else 'media'}:{image_type}"
+
+
+class UploadRegistry:
+    """SQLite 上传登记（内容哈希 → media_id / url）"""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path or Config.WECHAT_UPLOAD_REGISTRY)
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path), timeout=30)
+        if not self._initialized:
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS wechat_uploads (
+                app_id TEXT NOT NULL,
+                sha256 TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                media_id TEXT,
+                url TEXT,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL,
+                PRIMARY KEY (app_id, sha256, kind)
+            )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_wechat_uploads_media ON wechat_uploads (media_id)")
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def lookup(self, app_id: str, sha256: str, kind: str) -> Optional[dict]:
+        """查询有效的上传记录，返回与微信接口相同字段的结果（media_id / url）"""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT media_id, url, expires_at FROM wechat_uploads WHERE app_id = ? AND sha256 = ? AND kind = ?",
+                (app_id, sha256, kind)
+            ).fetchone()
+            if not row:
+                return None
+            if row[2] is not None and row[2] <= time.time():
+                conn.execute("DELETE FROM wechat_uploads WHERE app_id = ? AND sha256 = ? AND kind = ?",
+                             (app_id, sha256, kind))
+                conn.commit()
+                return None
+            return {key: value for key, value in (("media_id", row[0]), ("url", row[1])) if value}
+        finally:
+            conn.close()
+
+    def record(self, app_id: str, sha256: str, kind: str, result: dict, size: int):
+        """登记上传成功的结果（没有 media_id 和 url 的结果忽略）"""
+        media_id, url = result.get("media_id"), result.get("url")
+        if not (media_id or url):
+            return
+        now = time.time()
+        expires_at = now + TEMPORARY_TTL if kind.startswith("media:") else None
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO wechat_uploads "
+                "(app_id, sha256, kind, media_id, url, size, created_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (app_id, sha256, kind, media_id, url, size, now, expires_at)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def invalidate_media(self, media_id: str) -> int:
+        """作废指向某个 media_id 的记录（微信报告素材不存在时调用），返回作废条数"""
+        if not media_id:
+            return 0
+        conn = self._connect()
+        try:
+            cursor = conn.execute("DELETE FROM wechat_uploads WHERE media_id = ?", (media_id,))
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+
+# 全局单例
+_upload_registry_instance = None
+
+
+def get_upload_registry() -> UploadRegistry:
+    global _upload_registry_instance
+    if _upload_registry_instance is None:
+        _upload_registry_instance = UploadRegistry()
+    return _upload_registry_instance
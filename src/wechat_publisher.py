@@ -4,6 +4,9 @@ import os
 import httpx
 from pathlib import Path
 from .config import Config
+from .image_cache import get_image_cache
+from .upload_registry import get_upload_registry, is_media_missing
+from .wechat_token import get_token_manager
 
 
 class WeChatPublisher:
@@ -23,51 +26,12 @@ class WeChatPublisher:
             "LAYOUT_MODEL": Config.LAYOUT_MODEL,
             "IMAGE_GEN_MODEL": Config.IMAGE_GEN_MODEL,
         }
-        self._token = None
-        self._token_expires = 0
+        # access_token 由进程级管理器统一获取和缓存（与图片上传共享）
+        self.token_manager = get_token_manager(Config.WECHAT_APP_ID, Config.WECHAT_APP_SECRET)
 
     async def _get_access_token(self) -> str:
-        """获取微信access_token
-
-        优先使用 httpx，失败则使用 aiohttp 作为备用
-        """
-        import time
-        if self._token and time.time() < self._token_expires:
-            return self._token
-
-        url = "https://api.weixin.qq.com/cgi-bin/token"
-        params = {
-            "grant_type": "client_credential",
-            "appid": self.settings.get("WECHAT_APP_ID"),
-            "secret": self.settings.get("WECHAT_APP_SECRET")
-        }
-
-        # 方法1: 尝试使用 httpx
-        try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                resp = await client.get(url, params=params)
-                data = resp.json()
-                if "access_token" in data:
-                    self._token = data["access_token"]
-                    self._token_expires = time.time() + data["expires_in"] - 300
-                    return self._token
-        except Exception as e:
-            print(f"  [INFO] httpx 获取token失败，尝试 aiohttp: {e}")
-
-        # 方法2: 使用 aiohttp 作为备用
-        try:
-            import aiohttp
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=30)) as resp:
-                    data = await resp.json()
-                    if "access_token" in data:
-                        self._token = data["access_token"]
-                        self._token_expires = time.time() + data["expires_in"] - 300
-                        return self._token
-        except Exception as e:
-            raise Exception(f"获取token失败 (httpx和aiohttp都失败): {e}")
-
-        raise Exception(f"获取token失败: {data}")
+        """获取微信access_token"""
+        return await self.token_manager.get_token()
 
     async def create_draft(self, title: str, content: str, digest: str, thumb_media_id: str = None) -> str:
         """
@@ -82,10 +46,6 @@ class WeChatPublisher:
         Returns:
             草稿ID
         """
-        token = await self._get_access_token()
-
-        url = f"https://api.weixin.qq.com/cgi-bin/draft/add?access_token={token}"
-
         # 构造文章内容
         # 注意：如果没有封面图，不要包含 thumb_media_id 字段
         article = {
@@ -101,29 +61,45 @@ class WeChatPublisher:
 
         articles = [article]
 
+        # access_token 失效时自动刷新并重试一次
+        data = await self.token_manager.call(lambda token: self._post_draft(token, articles))
+        print(f"   [DEBUG] 创建草稿响应: {data}")
+        if "media_id" in data:
+            return data["media_id"]
+        elif "errcode" in data:
+            errcode = data.get("errcode")
+            errmsg = data.get("errmsg", "未知错误")
+            # 常见错误处理
+            if errcode == -1:
+                raise Exception(f"创建草稿失败: 微信服务繁忙 ({errcode})")
+            elif errcode == 615:
+                raise Exception(f"创建草稿失败: 日期格式错误 ({errcode})")
+            elif is_media_missing(data):
+                # 素材已被删除或过期：作废本地登记，下次运行重新上传
+                if thumb_media_id:
+                    forgotten = await asyncio.to_thread(get_upload_registry().invalidate_media, thumb_media_id)
+                    forgotten += await asyncio.to_thread(get_image_cache().forget_media, thumb_media_id)
+                    if forgotten:
+                        print(f"   [上传] 已作废封面 {thumb_media_id[:20]}... 的上传记录")
+                raise Exception(f"创建草稿失败: thumb_media_id无效或已过期 ({errcode})")
+            else:
+                raise Exception(f"创建草稿失败: {errmsg} (错误码: {errcode})")
+
+        raise Exception(f"创建草稿失败: {data}")
+
+    async def _post_draft(self, token: str, articles: list) -> dict:
+        """以指定 token 调用 draft/add
+
+        优先使用 httpx，失败则使用 aiohttp 作为备用
+        """
+        url = f"https://api.weixin.qq.com/cgi-bin/draft/add?access_token={token}"
+
         # 方法1: 尝试使用 httpx
         try:
             async with httpx.AsyncClient(timeout=60.0) as client:
                 resp = await client.post(url, json={"articles": articles})
-                data = resp.json()
-                print(f"   [DEBUG] 创建草稿响应: {data}")
-                if "media_id" in data:
-                    return data["media_id"]
-                elif "errcode" in data:
-                    errcode = data.get("errcode")
-                    errmsg = data.get("errmsg", "未知错误")
-                    # 常见错误处理
-                    if errcode == -1:
-                        raise Exception(f"创建草稿失败: 微信服务繁忙 ({errcode})")
-                    elif errcode == 615:
-                        raise Exception(f"创建草稿失败: 日期格式错误 ({errcode})")
-                    elif errcode == 40007:
-                        raise Exception(f"创建草稿失败: thumb_media_id无效或已过期 ({errcode})")
-                    else:
-                        raise Exception(f"创建草稿失败: {errmsg} (错误码: {errcode})")
+                return resp.json()
         except Exception as e:
-            if "创建草稿失败" in str(e):
-                raise
             print(f"  [INFO] httpx 创建草稿失败，尝试 aiohttp: {e}")
 
         # 方法2: 使用 aiohttp 作为备用
@@ -131,16 +107,6 @@ class WeChatPublisher:
             import aiohttp
             async with aiohttp.ClientSession() as session:
                 async with session.post(url, json={"articles": articles}, timeout=aiohttp.ClientTimeout(total=60)) as resp:
-                    data = await resp.json()
-                    if "media_id" in data:
-                        return data["media_id"]
-                    elif "errcode" in data:
-                        errcode = data.get("errcode")
-                        errmsg = data.get("errmsg", "未知错误")
-                        raise Exception(f"创建草稿失败: {errmsg} (错误码: {errcode})")
+                    return await resp.json()
         except Exception as e:
-            if "创建草稿失败" in str(e):
-                raise
             raise Exception(f"创建草稿失败 (httpx和aiohttp都失败): {e}")
-
-        raise Exception(f"创建草稿失败: {data}")
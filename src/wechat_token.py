@@ -0,0 +1,226 @@
+"""
+微信 access_token 管理器 - 进程内共享、跨进程缓存
+
+- 单飞刷新：并发协程同时发现 token 失效时只发起一次 cgi-bin/token 请求
+- 跨进程缓存：token 保存在 SQLite 中，刷新时持有写锁，
+  其他进程等待后直接复用新 token，不会互相把对方的 token 刷失效
+- 提前刷新：剩余有效期低于 WECHAT_TOKEN_REFRESH_MARGIN 时后台刷新
+- 失效重试：接口返回 40001/40014/42001 时作废当前 token 并重试一次
+
+使用方式：
+    from src.wechat_token import get_token_manager
+
+    token = await get_token_manager().get_token()
+    result = await get_token_manager().call(lambda token: upload(token))
+"""
+
+import asyncio
+import sqlite3
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+from .config import Config
+
+TOKEN_URL = "https://api.weixin.qq.com/cgi-bin/token"
+
+# access_token 无效 / 不是最新 / 已过期
+TOKEN_ERROR_CODES = (40001, 40014, 42001)
+
+
+def is_token_error(result) -> bool:
+    return isinstance(result, dict) and result.get("errcode") in TOKEN_ERROR_CODES
+
+
+class WeChatTokenManager:
+    """access_token 管理器"""
+
+    def __init__(self, app_id: str, app_secret: str,
+                 cache_path: Optional[Path] = None,
+                 refresh_margin: Optional[int] = None):
+        self.app_id = app_id
+        self.app_secret = app_secret
+        self.cache_path = Path(cache_path or Config.WECHAT_TOKEN_CACHE)
+        self.refresh_margin = refresh_margin if refresh_margin is not None else Config.WECHAT_TOKEN_REFRESH_MARGIN
+
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+        self._background: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _bind_loop(self):
+        """锁和后台任务属于当前事件循环，新的 asyncio.run() 中重新创建"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._background = None
+            self._loop = loop
+
+    # ======== 对外接口 ========
+
+    async def get_token(self, force_refresh: bool = False, stale: Optional[str] = None) -> str:
+        """获取有效 token；即将过期时先返回当前 token 并在后台刷新
+
+        stale 为调用方确认已失效的 token：只有当前 token 仍是它时才刷新，
+        其他协程已换成新 token 时直接返回新 token
+        """
+        self._bind_loop()
+        remaining = self._expires_at - time.time()
+        if stale is not None:
+            if self._token and self._token != stale and remaining > self.refresh_margin:
+                return self._token
+            return await self._refresh(stale)
+        if self._token and not force_refresh:
+            if remaining > self.refresh_margin:
+                return self._token
+            if remaining > 0:
+                self._refresh_in_background()
+                return self._token
+
+        stale = self._token if force_refresh else None
+        return await self._refresh(stale)
+
+    async def invalidate(self, token: str):
+        """作废指定 token（接口报 token 失效时调用）"""
+        if self._token == token:
+            self._token = None
+            self._expires_at = 0.0
+        await asyncio.to_thread(self._delete_cached, token)
+
+    async def call(self, request: Callable[[str], Awaitable[dict]]) -> dict:
+        """以当前 token 调用接口，token 失效时刷新并重试一次"""
+        token = await self.get_token()
+        result = await request(token)
+        if is_token_error(result):
+            print(f"   [TOKEN] access_token 失效 ({result.get('errcode')})，刷新后重试")
+            await self.invalidate(token)
+            token = await self.get_token(stale=token)
+            result = await request(token)
+        return result
+
+    # ======== 刷新 ========
+
+    def _refresh_in_background(self):
+        if self._background is None or self._background.done():
+            self._background = asyncio.create_task(self._refresh(None))
+            self._background.add_done_callback(self._log_background_error)
+
+    @staticmethod
+    def _log_background_error(task: asyncio.Task):
+        if not task.cancelled() and task.exception():
+            print(f"   [TOKEN] 后台刷新失败: {task.exception()}")
+
+    async def _refresh(self, stale: Optional[str]) -> str:
+        async with self._lock:
+            # 等锁期间其他协程可能已完成刷新
+            if self._token and self._token != stale and self._expires_at - time.time() > self.refresh_margin:
+                return self._token
+
+            conn = await asyncio.to_thread(self._lock_cache)
+            try:
+                cached = await asyncio.to_thread(self._read_cached, conn)
+                if cached and cached[0] != stale and cached[1] - time.time() > self.refresh_margin:
+                    # 其他进程已刷新，直接复用
+                    conn.rollback()
+                    self._token, self._expires_at = cached
+                    return self._token
+
+                token, expires_in = await self._request_token()
+                self._token = token
+                self._expires_at = time.time() + expires_in
+                await asyncio.to_thread(self._write_cached, conn, token, self._expires_at)
+                print(f"   [TOKEN] 已获取新的 access_token，有效期 {expires_in} 秒")
+                return self._token
+            finally:
+                conn.close()
+
+    async def _request_token(self):
+        """请求 cgi-bin/token
+
+        优先使用 httpx，失败则使用 aiohttp 作为备用
+        """
+        params = {
+            "grant_type": "client_credential",
+            "appid": self.app_id,
+            "secret": self.app_secret
+        }
+
+        data = None
+        # 方法1: 尝试使用 httpx
+        try:
+            async with httpx.AsyncClient(timeout=30.0) as client:
+                resp = await client.get(TOKEN_URL, params=params)
+                data = resp.json()
+        except Exception as e:
+            print(f"  [INFO] httpx 获取token失败，尝试 aiohttp: {e}")
+
+        # 方法2: 使用 aiohttp 作为备用
+        if data is None:
+            try:
+                import aiohttp
+                async with aiohttp.ClientSession() as session:
+                    async with session.get(TOKEN_URL, params=params, timeout=aiohttp.ClientTimeout(total=30)) as resp:
+                        data = await resp.json()
+            except Exception as e:
+                raise Exception(f"获取token失败 (httpx和aiohttp都失败): {e}")
+
+        if "access_token" not in data:
+            raise Exception(f"获取token失败: {data}")
+        return data["access_token"], int(data.get("expires_in", 7200))
+
+    # ======== SQLite 缓存（在线程中执行，避免阻塞事件循环） ========
+
+    def _connect(self) -> sqlite3.Connection:
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.cache_path), timeout=60, check_same_thread=False)
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS wechat_tokens (
+            app_id TEXT PRIMARY KEY,
+            access_token TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )
+        ''')
+        conn.commit()
+        return conn
+
+    def _lock_cache(self) -> sqlite3.Connection:
+        """打开缓存并持有写锁，直到提交或关闭连接"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        return conn
+
+    def _read_cached(self, conn: sqlite3.Connection):
+        row = conn.execute(
+            "SELECT access_token, expires_at FROM wechat_tokens WHERE app_id = ?", (self.app_id,)
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def _write_cached(self, conn: sqlite3.Connection, token: str, expires_at: float):
+        conn.execute(
+            "INSERT OR REPLACE INTO wechat_tokens (app_id, access_token, expires_at) VALUES (?, ?, ?)",
+            (self.app_id, token, expires_at)
+        )
+        conn.commit()
+
+    def _delete_cached(self, token: str):
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM wechat_tokens WHERE app_id = ? AND access_token = ?", (self.app_id, token))
+            conn.commit()
+        finally:
+            conn.close()
+
+
+# 全局单例（按 AppID 区分）
+_token_managers = {}
+
+
+def get_token_manager(app_id: str = None, app_secret: str = None) -> WeChatTokenManager:
+    app_id = app_id or Config.WECHAT_APP_ID
+    app_secret = app_secret or Config.WECHAT_APP_SECRET
+    if app_id not in _token_managers:
+        _token_managers[app_id] = WeChatTokenManager(app_id, app_secret)
+    return _token_managers[app_id]
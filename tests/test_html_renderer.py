@@ -0,0 +1,27 @@
+"""Markdown 列表渲染"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.html_renderer import render_markdown
+
+
+def test_leading_decimal_is_not_a_list():
+    html = render_markdown("3.5亿用户正在使用这项服务。")
+    assert "<ol" not in html
+    assert "3.5亿用户" in html
+
+
+def test_ordered_list_markers():
+    for md in ("1. 第一\n2. 第二", "1) 第一\n2) 第二", "1、第一\n2、第二"):
+        html = render_markdown(md)
+        assert "<ol" in html
+        assert ">第一</li>" in html
+
+
+def test_bullet_item_keeps_leading_number():
+    html = render_markdown("- a\n- 1. b")
+    assert "<ul" in html
+    assert "1. b" in html
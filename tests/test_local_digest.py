@@ -0,0 +1,47 @@
+"""本地抽取式摘要"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.local_digest import extract_digest
+
+ARTICLE = (
+    "人工智能正在重塑每一个行业的工作方式和组织结构。\n\n"
+    "这意味着企业需要在技术投入、人才培养、组织变革以及商业模式创新等多个方面同时发力，"
+    "才能够真正抓住这一轮由人工智能带来的历史性机遇并最终在激烈的市场竞争中脱颖而出获得长期的增长。\n\n"
+    "与此同时管理者必须认识到单纯依靠购买工具或者引入外部顾问并不能解决根本问题，"
+    "真正的挑战在于如何让组织中的每一个人都理解并拥抱变化从而形成持续学习和快速迭代的文化氛围。\n"
+)
+
+
+def test_short_pick_is_filled_to_min_chars():
+    digest = extract_digest(ARTICLE, title="人工智能重塑行业")
+    assert 50 <= len(digest) <= 100
+    assert digest.startswith("人工智能正在重塑每一个行业")
+
+
+
+def test_ellipsis_only_at_end():
+    # 得分最高的短金句在文末，前面只有放不下的长句：不能把截断的长句拼到金句前面
+    markdown = (
+        "这意味着企业需要在技术投入、人才培养、组织变革以及商业模式创新等多个方面同时发力，"
+        "才能够真正抓住这一轮由人工智能带来的历史性机遇并最终在激烈的市场竞争中脱颖而出获得长期的增长。\n\n"
+        "> 人工智能重塑行业，组织必须先重塑自己。\n"
+    )
+    digest = extract_digest(markdown, title="人工智能重塑行业")
+    assert "…" not in digest[:-1]
+    assert len(digest) <= 100
+
+
+def test_length_within_max_chars():
+    for min_chars, max_chars in ((50, 100), (60, 70), (80, 90)):
+        digest = extract_digest(ARTICLE, title="人工智能重塑行业", min_chars=min_chars, max_chars=max_chars)
+        assert len(digest) <= max_chars
+        assert "…" not in digest[:-1]
+
+    # 没有句末标点的整段正好 max_chars 字：补上的句号也要计入长度
+    line = ("人工智能正在重塑每一个行业的工作方式" * 6)[:100]
+    digest = extract_digest(line + "\n\n" + line[:30] + "\n")
+    assert len(digest) <= 100
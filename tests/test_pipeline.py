@@ -0,0 +1,82 @@
+"""Pipeline 调度与断点续写"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.pipeline import Pipeline, Stage
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_skips_stage_whose_outputs_are_present():
+    calls = []
+
+    async def images(topic):
+        calls.append("images")
+        return "thumb", ["url"]
+
+    async def layout(topic, cdn_urls):
+        return f"{topic}:{cdn_urls[0]}"
+
+    pipeline = Pipeline([
+        Stage("images", images, inputs=["topic"], outputs=["thumb_media_id", "cdn_urls"]),
+        Stage("layout", layout, inputs=["topic", "cdn_urls"], outputs=["html"]),
+    ])
+    context = run(pipeline.run({"topic": "t", "thumb_media_id": "old", "cdn_urls": ["cached"]}))
+    assert calls == []
+    assert context["html"] == "t:cached"
+    assert pipeline.skipped == ["images"]
+
+
+def test_resume_with_partial_outputs_reruns_stage():
+    """检查点只有 cdn_urls（thumb_media_id 为 None 未保存）时重跑配图阶段，不报 InvalidStateError"""
+    async def images(topic):
+        return "thumb", ["new"]
+
+    async def layout(topic, cdn_urls):
+        return cdn_urls[0]
+
+    pipeline = Pipeline([
+        Stage("images", images, inputs=["topic"], outputs=["thumb_media_id", "cdn_urls"]),
+        Stage("layout", layout, inputs=["topic", "cdn_urls"], outputs=["html"]),
+    ])
+    context = run(pipeline.run({"topic": "t", "cdn_urls": ["stale"]}))
+    assert context["thumb_media_id"] == "thumb"
+    assert context["cdn_urls"] == ["new"]
+    # 下游使用重跑后的结果，而不是检查点中的部分输出
+    assert context["html"] == "new"
+
+
+def test_independent_stages_run_concurrently():
+    async def slow(topic):
+        await asyncio.sleep(0.1)
+        return topic
+
+    pipeline = Pipeline([
+        Stage("a", slow, inputs=["topic"], outputs=["a"]),
+        Stage("b", slow, inputs=["topic"], outputs=["b"]),
+    ])
+
+    async def timed():
+        loop = asyncio.get_running_loop()
+        begin = loop.time()
+        await pipeline.run({"topic": "t"})
+        return loop.time() - begin
+
+    assert run(timed()) < 0.18
+
+
+def test_on_stage_done_receives_outputs():
+    saved = {}
+
+    async def write(topic):
+        return "# md"
+
+    pipeline = Pipeline([Stage("write", write, inputs=["topic"], outputs=["markdown"])])
+    run(pipeline.run({"topic": "t"}, on_stage_done=lambda name, outputs: saved.update({name: outputs})))
+    assert saved == {"write": {"markdown": "# md"}}
@@ -0,0 +1,87 @@
+"""计划领取与租约：批量领取不超过上限，租约被接管后不得继续写作或发布"""
+
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import execute_test_run
+import src.db_manager as db_manager
+from src.db_manager import DBManager, LeaseLostError
+from src.pipeline import Pipeline, Stage
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_manager, "db_path", tmp_path / "content_wizard.db")
+    monkeypatch.setattr(db_manager, "db_template", tmp_path / "missing.db.empty")
+    manager = DBManager()
+    manager.save_plans(json.dumps([
+        {"topic": f"选题{i}", "reason": "", "summary": "", "target_date": f"2026-01-0{i}", "status": "planned"}
+        for i in range(1, 6)
+    ]))
+    yield manager
+    manager.close()
+
+
+def test_stale_owner_cannot_mark_published(db):
+    topic_id = db.claim_next_plan("old", lease_minutes=0)[0]
+    # 租约过期后被其他工作进程接管
+    db.cursor.execute("UPDATE article_plans SET lease_expires_at = datetime('now', '-1 minutes')")
+    db.conn.commit()
+    assert db.claim_plan(topic_id, "new")[0] == topic_id
+
+    assert db.mark_as_published(topic_id, "draft-old", "old") is False
+    assert db.get_plan(topic_id)[3] == "writing"
+    assert db.mark_as_published(topic_id, "draft-new", "new") is True
+    assert db.get_plan(topic_id)[3] == "published"
+
+
+def test_lost_lease_aborts_pipeline_before_draft(db, monkeypatch):
+    drafts = []
+
+    async def write(topic):
+        return "正文"
+
+    async def draft(markdown):
+        drafts.append(markdown)
+        return "draft-1"
+
+    def build_pipeline(*args, **kwargs):
+        return Pipeline([
+            Stage("write", write, inputs=["topic"], outputs=["markdown"]),
+            Stage("draft", draft, inputs=["markdown"], outputs=["draft_id"]),
+        ])
+
+    monkeypatch.setattr(execute_test_run, "build_pipeline", build_pipeline)
+    topic_id, topic, _ = db.claim_next_plan("old")
+    db.cursor.execute("UPDATE article_plans SET lease_owner = 'new' WHERE id = ?", (topic_id,))
+    db.conn.commit()
+
+    with pytest.raises(LeaseLostError):
+        asyncio.run(execute_test_run.write_plan(db, {}, "", topic_id, topic, "old"))
+    assert drafts == []
+    assert db.get_plan(topic_id)[3] == "writing"
+
+
+@pytest.mark.parametrize("limit", [1, 2])
+def test_batch_never_claims_more_than_limit(db, monkeypatch, limit):
+    written = []
+
+    async def write_plan(db, config, strategy_content, topic_id, topic, owner, orchestrator=None, publisher=None):
+        written.append(topic_id)
+        await asyncio.sleep(0.01)
+        return f"draft-{topic_id}"
+
+    monkeypatch.setattr(execute_test_run, "ArticleOrchestrator", lambda: None)
+    monkeypatch.setattr(execute_test_run, "WeChatPublisher", lambda: None)
+    monkeypatch.setattr(execute_test_run, "write_plan", write_plan)
+
+    results = asyncio.run(execute_test_run.run_batch(db, {}, "", "w", limit=limit, concurrency=3))
+    assert len(results) == len(written) == limit
+    db.cursor.execute("SELECT COUNT(*) FROM article_plans WHERE status = 'writing'")
+    assert db.cursor.fetchone()[0] == limit
@@ -0,0 +1,132 @@
+"""熔断器与重试"""
+
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import resilience
+from src.resilience import CircuitBreaker, CircuitOpenError, RetryableError, call_with_retry
+
+
+@pytest.fixture(autouse=True)
+def fresh_breakers(monkeypatch):
+    monkeypatch.setattr(resilience, "_circuit_breakers", {})
+    monkeypatch.setattr(resilience, "_retry_metrics", resilience.RetryMetrics())
+
+
+def open_breaker(endpoint: str, reset_timeout: float = 60.0) -> CircuitBreaker:
+    breaker = CircuitBreaker(endpoint, failure_threshold=1, reset_timeout=reset_timeout)
+    resilience._circuit_breakers[endpoint] = breaker
+    breaker.record_failure()
+    return breaker
+
+
+def test_breaker_opens_and_rejects():
+    breaker = open_breaker("http://svc")
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_half_open_allows_single_probe():
+    breaker = open_breaker("http://svc")
+    breaker.opened_at = time.monotonic() - 61
+    assert breaker.state == "half_open"
+    assert breaker.before_call() is True
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_cancelled_probe_releases_breaker():
+    """半开状态下的试探被取消（wait_for 超时）后，下一个请求仍可试探"""
+    breaker = open_breaker("http://svc")
+    breaker.opened_at = time.monotonic() - 61
+
+    async def hang():
+        await asyncio.sleep(10)
+
+    async def ok():
+        return "ok"
+
+    async def scenario():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(call_with_retry("http://svc", hang), timeout=0.05)
+        return await call_with_retry("http://svc", ok)
+
+    assert asyncio.run(scenario()) == "ok"
+    assert breaker.state == "closed"
+
+
+def test_cancel_in_closed_state_keeps_other_probe():
+    breaker = open_breaker("http://svc")
+    breaker.opened_at = time.monotonic() - 61
+    breaker.before_call()  # 其他调用持有试探名额
+    retrier = resilience.Retrier("http://svc")
+    retrier.on_cancel()  # 未持有名额的调用被取消
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_retries_retryable_errors(monkeypatch):
+    monkeypatch.setattr(resilience.Config, "RETRY_BASE_DELAY", 0.0)
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RetryableError("busy", status=503)
+        return "done"
+
+    assert asyncio.run(call_with_retry("http://flaky", flaky, max_attempts=3)) == "done"
+    assert len(attempts) == 3
+
+
+def test_breakers_are_separate_per_model(monkeypatch):
+    """首选模型熔断后，同一地址后的回退模型仍可调用"""
+    async def down():
+        raise RetryableError("down", status=503)
+
+    async def ok():
+        return "fallback"
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(RetryableError):
+                await call_with_retry("http://llm/chat/completions", down, max_attempts=1, model="primary")
+        with pytest.raises(CircuitOpenError):
+            await call_with_retry("http://llm/chat/completions", down, max_attempts=1, model="primary")
+        return await call_with_retry("http://llm/chat/completions", ok, max_attempts=1, model="backup")
+
+    monkeypatch.setattr(resilience.Config, "CIRCUIT_FAILURE_THRESHOLD", 2)
+    monkeypatch.setattr(resilience.Config, "RETRY_BASE_DELAY", 0.0)
+    assert asyncio.run(scenario()) == "fallback"
+
+
+def test_stream_cancelled_in_rate_limiter_releases_breaker(monkeypatch):
+    """半开状态下的流式试探在限流排队时被取消，不应一直占着试探名额"""
+    from src import llm_client
+
+    class QueuedLimiter:
+        async def acquire(self, amount=0):
+            await asyncio.sleep(10)
+
+    monkeypatch.setattr(llm_client, "get_rate_limiter", lambda model: QueuedLimiter())
+    breaker = open_breaker("http://llm/chat/completions [m1]")
+    breaker.opened_at = time.monotonic() - 61
+    payload = {"model": "m1", "messages": [{"role": "user", "content": "hi"}], "max_tokens": 10}
+    stream = llm_client.ChatStream(None, "http://llm/chat/completions", {}, payload)
+
+    async def scenario():
+        rounds = stream._stream_round(payload)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(rounds.__anext__(), timeout=0.05)
+
+    asyncio.run(scenario())
+    assert breaker.before_call() is True
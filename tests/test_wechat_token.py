@@ -0,0 +1,72 @@
+"""access_token 单飞刷新"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.wechat_token import WeChatTokenManager
+
+
+class FakeManager(WeChatTokenManager):
+    """token 请求改为本地计数，不访问微信"""
+
+    def __init__(self, cache_path):
+        super().__init__("app", "secret", cache_path=cache_path, refresh_margin=300)
+        self.fetches = 0
+
+    async def _request_token(self):
+        self.fetches += 1
+        await asyncio.sleep(0.01)
+        return f"token-{self.fetches}", 7200
+
+
+def test_concurrent_get_token_fetches_once(tmp_path):
+    manager = FakeManager(tmp_path / "tokens.db")
+
+    async def scenario():
+        return await asyncio.gather(*(manager.get_token() for _ in range(10)))
+
+    tokens = asyncio.run(scenario())
+    assert set(tokens) == {"token-1"}
+    assert manager.fetches == 1
+
+
+def test_token_is_shared_through_cache(tmp_path):
+    first = FakeManager(tmp_path / "tokens.db")
+    second = FakeManager(tmp_path / "tokens.db")
+    assert asyncio.run(first.get_token()) == "token-1"
+    assert asyncio.run(second.get_token()) == "token-1"
+    assert second.fetches == 0
+
+
+def test_late_token_error_does_not_refresh_twice(tmp_path):
+    """多个协程先后收到 40001：只刷新一次，迟到的协程直接使用新 token"""
+    manager = FakeManager(tmp_path / "tokens.db")
+    seen = []
+
+    async def scenario():
+        await manager.get_token()
+        arrived = asyncio.Event()
+        waiting = []
+
+        async def request(token):
+            seen.append(token)
+            if token == "token-1":
+                # 所有请求都带着旧 token 发出后才陆续返回 40001
+                waiting.append(token)
+                order = len(waiting)
+                if order == 5:
+                    arrived.set()
+                await arrived.wait()
+                # 错误先后到达，后到的协程发现 token 已被刷新
+                await asyncio.sleep(0.03 * order)
+                return {"errcode": 40001}
+            return {"ok": True, "token": token}
+
+        return await asyncio.gather(*(manager.call(request) for _ in range(5)))
+
+    results = asyncio.run(scenario())
+    assert all(r == {"ok": True, "token": "token-2"} for r in results)
+    assert manager.fetches == 2